@@ -0,0 +1,73 @@
+# bench/app.py
+"""
+ベンチマーク対象のアプリ。server:app をそのまま使い、上流だけをスタブへ向ける。
+
+    BENCH_STUB_URL=http://127.0.0.1:9100 uvicorn bench.app:app --port 9000
+
+- 共有 httpx クライアントの www.youtube.com / youtube.com 宛てをスタブへ転送
+- yt-dlp の YoutubeDL をスタブの /ytdlp/info を読む偽物に差し替え
+  （子プロセスには差し替えが及ばないので YTDLP_POOL_MODE=thread で動かす）
+"""
+import os
+
+import httpx
+
+import config
+from routers import http_client, ytdlp_handler
+
+STUB_URL = httpx.URL(os.getenv("BENCH_STUB_URL", "http://127.0.0.1:9100"))
+
+
+class StubTransport(httpx.AsyncBaseTransport):
+    """リクエスト先をスタブのホスト・ポートに書き換えて送る"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(scheme=STUB_URL.scheme, host=STUB_URL.host,
+                                            port=STUB_URL.port)
+        request.headers["Host"] = f"{STUB_URL.host}:{STUB_URL.port}"
+        return await self.inner.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+def _new_client() -> httpx.AsyncClient:
+    stub = StubTransport(httpx.AsyncHTTPTransport(limits=http_client.http_limits))
+    return httpx.AsyncClient(
+        limits=http_client.http_limits,
+        timeout=config.HTTP_SETTINGS["timeout"],
+        follow_redirects=True,
+        max_redirects=config.PROXY_SETTINGS["max_redirects"],
+        mounts={"https://www.youtube.com": stub, "https://youtube.com": stub},
+    )
+
+
+class StubYoutubeDL:
+    """YoutubeDL の代わりにスタブから info dict を取得する"""
+
+    def __init__(self, params=None):
+        self.params = params or {}
+        self._client = httpx.Client(base_url=STUB_URL, timeout=60)
+
+    def extract_info(self, url, download=False, process=True, **kwargs):
+        r = self._client.get("/ytdlp/info", params={"url": url})
+        r.raise_for_status()
+        return r.json()
+
+    def close(self):
+        self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+http_client._new_client = _new_client
+ytdlp_handler.YoutubeDL = StubYoutubeDL
+
+from server import app  # noqa: E402  差し替え後に読み込む
@@ -0,0 +1,148 @@
+# bench/m3u8_rewrite.py
+"""
+m3u8 書き換え（compile_m3u8 + render）のマイクロベンチマーク。
+
+    python -m bench.m3u8_rewrite
+    python -m bench.m3u8_rewrite --segments 20000 --repeat 20
+
+従来の行ごと urljoin + quote + URI_RE.sub 実装（reference_rewrite）と
+routers.m3u8_rewriter を同じ入力で比較し、出力が一致することも確認する。
+あわせて PROXY_TOKENS_ENABLED 時（短縮トークン）の本文サイズも表示する。
+"""
+import re
+import time
+import argparse
+import statistics
+from urllib.parse import urljoin, quote
+
+import config
+from routers.m3u8_rewriter import compile_m3u8, rewrite_m3u8, EXT_X_START
+
+PROXY_BASE = "http://127.0.0.1:8000/proxy?url="
+URI_RE = re.compile(config.REGEX_PATTERNS["uri_pattern"])
+
+
+def reference_rewrite(text: str, base_url: str, proxy_base: str) -> str:
+    """書き換え前の実装（比較用）"""
+    safe = config.PROXY_SETTINGS["url_safe_chars"]
+    out = []
+
+    def proxify(u: str) -> str:
+        return proxy_base + quote(urljoin(base_url, u), safe=safe)
+
+    lines = text.splitlines()
+    if "#EXT-X-START" not in text:
+        if lines and lines[0].startswith("#EXTM3U"):
+            out.append(lines.pop(0))
+        out.append(EXT_X_START)
+    for line in lines:
+        if line.startswith("#"):
+            if 'URI="' in line:
+                line = URI_RE.sub(lambda m: f'URI="{proxify(m.group(1))}"', line)
+            out.append(line)
+        elif line.strip():
+            out.append(proxify(line.strip()))
+        else:
+            out.append(line)
+    return "\n".join(out)
+
+
+# ───────────────── 入力 ─────────────────
+def vod_relative(n: int) -> tuple[str, str]:
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:6", "#EXT-X-PLAYLIST-TYPE:VOD",
+             '#EXT-X-KEY:METHOD=AES-128,URI="keys/key1.bin?token=abc&x=1"']
+    for i in range(n):
+        lines += [f"#EXTINF:6.006,", f"seg{i}.ts?expire=1700000000&sq={i}&sig=AOq0QJ8wRQIh"]
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n", "https://cdn.example.com/hls/v1/720p/index.m3u8?token=xyz"
+
+
+def vod_googlevideo(n: int) -> tuple[str, str]:
+    # YouTube の HLS は各セグメントが長い絶対 URL で、sq の数字だけが変わる
+    base = ("https://rr3---sn-oguelnzl.googlevideo.com/videoplayback/id/0123456789abcdef.1/"
+            "itag/96/source/yt_live_broadcast/expire/1700000000/ei/AbCdEfGhIjKl/ip/203.0.113.7/"
+            "requiressl/yes/ratebypass/yes/live/1/sgoap/gir%3Dyes%3Bitag%3D140/"
+            "sgovp/gir%3Dyes%3Bitag%3D136/hls_chunk_host/rr3---sn-oguelnzl.googlevideo.com/"
+            "playlist_duration/30/manifest_duration/30/vprv/1/playlist_type/DVR/"
+            "mh/Ab/mm/44/mn/sn-oguelnzl/ms/lva/mv/m/mvi/3/pl/24/dover/11/pacing/0/"
+            "keepalive/yes/mt/1699990000/sparams/expire,ei,ip,id,itag,source,requiressl/"
+            "sig/AOq0QJ8wRQIhAJ3-Example-Signature-Value-0123456789/lsparams/hls_chunk_host,mh,mm,mn,ms,mv/"
+            "lsig/AG3C_xAwRQIgExampleLsig0123456789")
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:5", "#EXT-X-MEDIA-SEQUENCE:0"]
+    for i in range(n):
+        lines += ["#EXTINF:5.0,", f"{base}/sq/{i}/goap/clen%3D{80000 + i % 97}%3Blmt%3D1699990000/file/seg.ts"]
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines), "https://manifest.googlevideo.com/api/manifest/hls_playlist/expire/1700000000/index.m3u8"
+
+
+def master(_: int) -> tuple[str, str]:
+    text = "\n".join([
+        "#EXTM3U",
+        '#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="a",NAME="en",URI="audio/en.m3u8"',
+        "#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,AUDIO=\"a\"",
+        "360p/index.m3u8",
+        "#EXT-X-STREAM-INF:BANDWIDTH=2500000,RESOLUTION=1280x720",
+        "/abs/720p/index.m3u8",
+        "#EXT-X-STREAM-INF:BANDWIDTH=5000000,RESOLUTION=1920x1080",
+        "https://other.example.com/1080p/index.m3u8?x=1",
+        "",
+        "#EXT-X-STREAM-INF:BANDWIDTH=100000",
+        "../lo/./index.m3u8",
+        "#EXT-X-STREAM-INF:BANDWIDTH=100001",
+        "//cdn2.example.com/p/index.m3u8",
+        "#EXT-X-STREAM-INF:BANDWIDTH=100002",
+        "日本語/インデックス.m3u8",
+    ])
+    return text, "https://cdn.example.com/a/b/../master.m3u8"
+
+
+CASES = {
+    "vod-relative": vod_relative,
+    "vod-googlevideo": vod_googlevideo,
+    "master": master,
+}
+
+
+def _best_of(fn, repeat: int) -> tuple[float, float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times)
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description="m3u8 rewrite micro-benchmark")
+    p.add_argument("--segments", type=int, default=10_000)
+    p.add_argument("--repeat", type=int, default=10)
+    args = p.parse_args(argv)
+
+    # 正しさ: 全ケースで従来実装と同一出力
+    for name, make in CASES.items():
+        for n in (0, 1, 37):
+            text, base = make(n)
+            expected = reference_rewrite(text, base, PROXY_BASE)
+            got = rewrite_m3u8(text, base, PROXY_BASE)
+            assert got == expected, f"{name}({n}) output differs from reference"
+    print("output matches reference implementation")
+
+    print(f"{'case':<17} {'segments':>8} {'reference ms':>13} {'compile ms':>11} {'speedup':>8} "
+          f"{'render ms':>10} {'url KB':>8} {'token KB':>9}")
+    for name, make in CASES.items():
+        if name == "master":
+            continue
+        text, base = make(args.segments)
+        ref_best, _ = _best_of(lambda: reference_rewrite(text, base, PROXY_BASE), args.repeat)
+        new_best, _ = _best_of(lambda: compile_m3u8(text, base), args.repeat)
+        tpl = compile_m3u8(text, base)
+        render_best, _ = _best_of(lambda: PROXY_BASE.join(tpl.parts), args.repeat)
+        url_size = len(tpl.render(PROXY_BASE))
+        token_size = len(compile_m3u8(text, base, tokens=True).render(PROXY_BASE))
+        print(f"{name:<17} {args.segments:>8} {ref_best * 1000:>13.2f} {new_best * 1000:>11.2f} "
+              f"{ref_best / new_best:>7.1f}x {render_best * 1000:>10.2f} "
+              f"{url_size / 1024:>8.0f} {token_size / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# bench/redis_stub.py
+"""
+CACHE_BACKEND=redis を試すための最小の Redis 互換サーバー（RESP2、単一 DB、メモリのみ）。
+
+    python -m bench.redis_stub --port 6390
+    CACHE_BACKEND=redis CACHE_REDIS_PORT=6390 python run.py
+
+aiocache の RedisCache / redis-py が使うコマンドだけを実装する:
+PING ECHO SELECT AUTH CLIENT GET SET(EX/PX/NX/XX) SETEX PSETEX MGET MSET DEL EXISTS
+INCRBY EXPIRE PERSIST TTL KEYS FLUSHDB DBSIZE MULTI EXEC DISCARD
+（EVAL を使う cas / ロックは非対応）
+"""
+import time
+import asyncio
+import fnmatch
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+
+class RespError(Exception):
+    pass
+
+
+class Store:
+    """key → (値, 失効時刻 monotonic または None)"""
+
+    def __init__(self):
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def set(self, key: bytes, value: bytes, ttl: Optional[float] = None) -> None:
+        self.data[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+
+    def keys(self) -> List[bytes]:
+        return [k for k in list(self.data) if self.get(k) is not None]
+
+
+def _encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return b"-" + str(value).encode() + b"\r\n"
+    if isinstance(value, bool):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):  # ステータス応答
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(v) for v in value)
+    raise TypeError(type(value))
+
+
+async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):  # インラインコマンド（redis-cli / telnet）
+        return line.strip().split()
+    args = []
+    for _ in range(int(line[1:])):
+        header = await reader.readline()
+        size = int(header[1:])
+        args.append((await reader.readexactly(size + 2))[:-2])
+    return args
+
+
+class RedisStub:
+    def __init__(self):
+        self.store = Store()
+        self.commands = 0
+
+    def execute(self, args: List[bytes]):
+        self.commands += 1
+        name, rest = args[0].upper().decode(), args[1:]
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            return RespError(f"ERR unknown command '{name}'")
+        try:
+            return handler(*rest)
+        except (TypeError, ValueError, IndexError):
+            return RespError(f"ERR wrong arguments for '{name}'")
+
+    # ── 接続 ──────────────────
+    def cmd_ping(self, *args):
+        return args[0] if args else "PONG"
+
+    def cmd_echo(self, message):
+        return message
+
+    def cmd_select(self, db):
+        return "OK"
+
+    def cmd_auth(self, *args):
+        return "OK"
+
+    def cmd_client(self, *args):
+        return "OK"
+
+    # ── 文字列 ──────────────────
+    def cmd_get(self, key):
+        return self.store.get(key)
+
+    def cmd_set(self, key, value, *options):
+        ttl, nx, xx = None, False, False
+        opts = [o.upper() for o in options]
+        i = 0
+        while i < len(opts):
+            if opts[i] == b"EX":
+                ttl, i = float(options[i + 1]), i + 2
+            elif opts[i] == b"PX":
+                ttl, i = float(options[i + 1]) / 1000, i + 2
+            elif opts[i] == b"NX":
+                nx, i = True, i + 1
+            elif opts[i] == b"XX":
+                xx, i = True, i + 1
+            else:
+                return RespError("ERR syntax error")
+        exists = self.store.get(key) is not None
+        if (nx and exists) or (xx and not exists):
+            return None
+        self.store.set(key, value, ttl)
+        return "OK"
+
+    def cmd_setex(self, key, seconds, value):
+        self.store.set(key, value, float(seconds))
+        return "OK"
+
+    def cmd_psetex(self, key, millis, value):
+        self.store.set(key, value, float(millis) / 1000)
+        return "OK"
+
+    def cmd_mget(self, *keys):
+        return [self.store.get(k) for k in keys]
+
+    def cmd_mset(self, *pairs):
+        for key, value in zip(pairs[0::2], pairs[1::2]):
+            self.store.set(key, value)
+        return "OK"
+
+    def cmd_incrby(self, key, delta):
+        current = self.store.get(key)
+        try:
+            number = int(current or b"0") + int(delta)
+        except ValueError:
+            return RespError("ERR value is not an integer or out of range")
+        expires = self.store.data.get(key, (None, None))[1]
+        self.store.data[key] = (str(number).encode(), expires)
+        return number
+
+    # ── キー ──────────────────
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self.store.get(key) is not None:
+                del self.store.data[key]
+                removed += 1
+        return removed
+
+    def cmd_exists(self, *keys):
+        return sum(self.store.get(k) is not None for k in keys)
+
+    def cmd_expire(self, key, seconds):
+        value = self.store.get(key)
+        if value is None:
+            return 0
+        self.store.set(key, value, float(seconds))
+        return 1
+
+    def cmd_persist(self, key):
+        value = self.store.get(key)
+        if value is None:
+            return 0
+        self.store.set(key, value)
+        return 1
+
+    def cmd_ttl(self, key):
+        if self.store.get(key) is None:
+            return -2
+        expires = self.store.data[key][1]
+        return -1 if expires is None else max(int(expires - time.monotonic()), 0)
+
+    def cmd_keys(self, pattern):
+        return [k for k in self.store.keys() if fnmatch.fnmatchcase(k.decode(), pattern.decode())]
+
+    def cmd_flushdb(self, *args):
+        self.store.data.clear()
+        return "OK"
+
+    def cmd_dbsize(self):
+        return len(self.store.keys())
+
+    # ── 接続ごとの処理 ──────────────────
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        queued: Optional[List[List[bytes]]] = None
+        try:
+            while True:
+                args = await _read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                name = args[0].upper()
+                if name == b"MULTI":
+                    queued, reply = [], "OK"
+                elif name == b"EXEC":
+                    reply = [self.execute(a) for a in queued] if queued is not None else \
+                        RespError("ERR EXEC without MULTI")
+                    queued = None
+                elif name == b"DISCARD":
+                    queued, reply = None, "OK"
+                elif queued is not None:
+                    queued.append(args)
+                    reply = "QUEUED"
+                else:
+                    reply = self.execute(args)
+                writer.write(_encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        """サーバーを起動する（port=0 なら空きポート。実ポートは server.sockets[0] から）"""
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def _main(host: str, port: int) -> None:
+    server = await RedisStub().start(host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description="minimal Redis-compatible server for local testing")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=6390)
+    args = p.parse_args(argv)
+    try:
+        asyncio.run(_main(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
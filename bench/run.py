@@ -0,0 +1,378 @@
+# bench/run.py
+"""
+ローカルスタブに対してアプリを起動し、代表的な負荷をかけて結果を表示する。
+
+    python -m bench.run                          # 全ワークロード
+    python -m bench.run -w live,extract -d 20    # 一部だけ・20 秒
+    python -m bench.run --env CACHE_SWR_WINDOW=600 --json bench_output.json
+    python -m bench.run --redis                  # CACHE_BACKEND=redis（bench/redis_stub.py）で動かす
+
+ワークロード:
+- live    : 同じライブ配信を viewers 人が /proxy 経由で視聴（master → media → セグメント）
+- extract : distinct 本の動画に対する /extract の集中アクセス
+- batch   : POST /batch-extract（NDJSON を最後まで読む）
+- channel : /channel-about の集中アクセス
+
+スタブ・アプリはそれぞれ別プロセスの uvicorn で動かし、
+スループット、p50 / p99 レイテンシ、アプリの RSS、スタブが受けた上流リクエスト数を出す。
+"""
+import os
+import sys
+import json
+import time
+import random
+import signal
+import asyncio
+import argparse
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+WORKLOADS = ("live", "extract", "batch", "channel")
+
+
+# ───────────────── 計測 ─────────────────
+class Recorder:
+    """種別ごとのレイテンシとエラー数"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def add(self, kind: str, seconds: float, ok: bool = True) -> None:
+        self.latencies[kind].append(seconds)
+        if not ok:
+            self.errors[kind] += 1
+
+    async def timed(self, kind: str, coro):
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = await coro
+            ok = True
+            return result
+        except Exception:
+            return None
+        finally:
+            self.add(kind, time.perf_counter() - start, ok)
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class RssSampler:
+    """対象プロセスの RSS を定期的に記録する"""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        self.proc = psutil.Process(pid) if psutil else None
+        self.interval = interval
+        self.samples: List[int] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def _sample(self) -> None:
+        if self.proc is not None:
+            try:
+                self.samples.append(self.proc.memory_info().rss)
+            except psutil.Error:
+                pass
+
+    async def _loop(self) -> None:
+        while True:
+            self._sample()
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        self._task = asyncio.create_task(self._loop())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+        self._sample()
+
+    def summary(self) -> Dict[str, float]:
+        if not self.samples:
+            return {}
+        mb = 1024 * 1024
+        return {"start_mb": round(self.samples[0] / mb, 1),
+                "peak_mb": round(max(self.samples) / mb, 1),
+                "end_mb": round(self.samples[-1] / mb, 1)}
+
+
+# ───────────────── ワークロード ─────────────────
+async def _get(client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+    r = await client.get(url, **kwargs)
+    await r.aread()
+    r.raise_for_status()
+    return r
+
+
+def _video_url(n: int) -> str:
+    return f"https://www.youtube.com/watch?v=bench{n:06d}"
+
+
+async def live_viewers(client, args, rec: Recorder) -> None:
+    master = f"{args.stub_url}/cdn/hls/live-bench/master.m3u8"
+    deadline = time.monotonic() + args.duration
+
+    async def viewer(i: int):
+        await asyncio.sleep(random.random())  # 視聴開始をばらす
+        r = await rec.timed("playlist", _get(client, "/proxy", params={"url": master}))
+        if r is None:
+            return
+        variant = next(l for l in r.text.splitlines() if l and not l.startswith("#"))
+        seen = set()
+        while time.monotonic() < deadline:
+            r = await rec.timed("playlist", _get(client, variant))
+            if r is not None:
+                for line in r.text.splitlines():
+                    if line and not line.startswith("#") and line not in seen:
+                        seen.add(line)
+                        await rec.timed("segment", _get(client, line))
+            await asyncio.sleep(args.segment_seconds)
+
+    await asyncio.gather(*(viewer(i) for i in range(args.viewers)))
+
+
+async def extract_storm(client, args, rec: Recorder) -> None:
+    sem = asyncio.Semaphore(args.concurrency)
+    rnd = random.Random(1)
+
+    async def one(n: int):
+        async with sem:
+            await rec.timed("extract", _get(client, "/extract", params={"url": _video_url(n)}))
+
+    await asyncio.gather(*(one(rnd.randrange(args.extract_videos)) for _ in range(args.extract_requests)))
+
+
+async def batch_extract(client, args, rec: Recorder) -> None:
+    async def one(b: int):
+        # バッチ同士で半分ずつ重なる URL 集合
+        start = b * args.batch_size // 2
+        urls = [_video_url(10_000 + n) for n in range(start, start + args.batch_size)]
+
+        async def run():
+            lines = 0
+            async with client.stream("POST", "/batch-extract", json={"urls": urls}) as r:
+                r.raise_for_status()
+                async for _ in r.aiter_lines():
+                    lines += 1
+            if lines != len(urls):
+                raise RuntimeError(f"expected {len(urls)} lines, got {lines}")
+        await rec.timed("batch", run())
+
+    await asyncio.gather(*(one(b) for b in range(args.batches)))
+
+
+async def channel_pages(client, args, rec: Recorder) -> None:
+    sem = asyncio.Semaphore(args.concurrency)
+    rnd = random.Random(2)
+
+    async def one(n: int):
+        async with sem:
+            channel = f"UCbench{n:017d}"
+            await rec.timed("channel", _get(client, "/channel-about", params={"channel_url": channel}))
+
+    await asyncio.gather(*(one(rnd.randrange(args.channels)) for _ in range(args.channel_requests)))
+
+
+RUNNERS = {
+    "live": live_viewers,
+    "extract": extract_storm,
+    "batch": batch_extract,
+    "channel": channel_pages,
+}
+
+
+# ───────────────── プロセス管理 ─────────────────
+def _spawn(module: str, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1",
+           "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(cmd, env={**os.environ, **env})
+
+
+def _stop(proc: subprocess.Popen) -> None:
+    if proc.poll() is None:
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def _spawn_redis(port: int) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "bench.redis_stub", "--port", str(port)])
+
+
+async def _wait_tcp(port: int, proc: subprocess.Popen, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"redis stub exited with {proc.returncode}")
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"redis stub on port {port} did not become ready")
+
+
+async def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{url} exited with {proc.returncode}")
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+# ───────────────── レポート ─────────────────
+def summarize(name: str, rec: Recorder, wall: float, rss: Dict, upstream: Dict) -> Dict:
+    kinds = {}
+    for kind, values in rec.latencies.items():
+        kinds[kind] = {
+            "requests": len(values),
+            "errors": rec.errors.get(kind, 0),
+            "rps": round(len(values) / wall, 1) if wall else 0,
+            "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+            "max_ms": round(max(values) * 1000, 1),
+        }
+    return {"workload": name, "wall_s": round(wall, 2), "kinds": kinds, "rss": rss, "upstream": upstream}
+
+
+def print_report(results: List[Dict]) -> None:
+    header = f"{'workload':<9} {'kind':<9} {'reqs':>6} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    print()
+    print(header)
+    print("-" * len(header))
+    for res in results:
+        for kind, k in res["kinds"].items():
+            print(f"{res['workload']:<9} {kind:<9} {k['requests']:>6} {k['errors']:>5} {k['rps']:>8} "
+                  f"{k['p50_ms']:>8} {k['p99_ms']:>8} {k['max_ms']:>8}")
+        rss = res["rss"]
+        if rss:
+            print(f"{'':<9} rss      start {rss['start_mb']} MB / peak {rss['peak_mb']} MB / end {rss['end_mb']} MB")
+        upstream = ", ".join(f"{k}={v}" for k, v in sorted(res["upstream"].items())) or "-"
+        print(f"{'':<9} upstream {upstream}")
+    print()
+
+
+# ───────────────── main ─────────────────
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Oculora benchmark harness (local stub)")
+    p.add_argument("-w", "--workloads", default=",".join(WORKLOADS),
+                   help=f"comma separated subset of {','.join(WORKLOADS)}")
+    p.add_argument("--port", type=int, default=9000, help="port for the app under test")
+    p.add_argument("--stub-port", type=int, default=9100)
+    p.add_argument("--redis", action="store_true",
+                   help="run the app with CACHE_BACKEND=redis against bench/redis_stub.py")
+    p.add_argument("--redis-port", type=int, default=6390)
+    p.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                   help="extra environment for the app under test (repeatable)")
+    p.add_argument("--json", help="write results as JSON to this path")
+    # スタブ
+    p.add_argument("--latency-ms", type=int, default=20, help="stub latency per upstream request")
+    p.add_argument("--extract-latency-ms", type=int, default=800, help="stub latency per extraction")
+    p.add_argument("--segment-bytes", type=int, default=256 * 1024)
+    p.add_argument("--page-bytes", type=int, default=600 * 1024, help="HTML padding before ytInitialData")
+    p.add_argument("--segment-seconds", type=int, default=2)
+    # ワークロード
+    p.add_argument("-d", "--duration", type=int, default=15, help="live workload duration (s)")
+    p.add_argument("--viewers", type=int, default=50)
+    p.add_argument("-c", "--concurrency", type=int, default=32)
+    p.add_argument("--extract-requests", type=int, default=200)
+    p.add_argument("--extract-videos", type=int, default=20)
+    p.add_argument("--batches", type=int, default=4)
+    p.add_argument("--batch-size", type=int, default=50)
+    p.add_argument("--channels", type=int, default=10)
+    p.add_argument("--channel-requests", type=int, default=200)
+    return p.parse_args(argv)
+
+
+async def main_async(args: argparse.Namespace) -> List[Dict]:
+    workloads = [w.strip() for w in args.workloads.split(",") if w.strip()]
+    unknown = set(workloads) - set(WORKLOADS)
+    if unknown:
+        raise SystemExit(f"unknown workloads: {', '.join(sorted(unknown))}")
+
+    args.stub_url = f"http://127.0.0.1:{args.stub_port}"
+    app_url = f"http://127.0.0.1:{args.port}"
+    stub_env = {
+        "STUB_LATENCY_MS": str(args.latency_ms),
+        "STUB_EXTRACT_LATENCY_MS": str(args.extract_latency_ms),
+        "STUB_SEGMENT_BYTES": str(args.segment_bytes),
+        "STUB_PAGE_BYTES": str(args.page_bytes),
+        "STUB_SEGMENT_SECONDS": str(args.segment_seconds),
+    }
+    app_env = {
+        "BENCH_STUB_URL": args.stub_url,
+        "YTDLP_POOL_MODE": "thread",
+        "COMMENTS_YOUTUBE_BASE_URL": args.stub_url,
+        "LOG_LEVEL": "WARNING",
+    }
+    if args.redis:
+        app_env.update(CACHE_BACKEND="redis", CACHE_REDIS_HOST="127.0.0.1",
+                       CACHE_REDIS_PORT=str(args.redis_port))
+    app_env.update(kv.split("=", 1) for kv in args.env)
+
+    stub = _spawn("bench.stub:app", args.stub_port, stub_env)
+    redis = _spawn_redis(args.redis_port) if args.redis else None
+    target = None
+    results = []
+    try:
+        await _wait_ready(f"{args.stub_url}/_stats", stub)
+        if redis is not None:
+            await _wait_tcp(args.redis_port, redis)
+        target = _spawn("bench.app:app", args.port, app_env)
+        await _wait_ready(f"{app_url}/health", target)
+
+        limits = httpx.Limits(max_connections=1000, max_keepalive_connections=1000)
+        async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=120) as client, \
+                httpx.AsyncClient(base_url=args.stub_url) as stub_client:
+            for name in workloads:
+                await stub_client.post("/_reset")
+                rec = Recorder()
+                print(f"running {name} ...", flush=True)
+                with RssSampler(target.pid) as rss:
+                    start = time.perf_counter()
+                    await RUNNERS[name](client, args, rec)
+                    wall = time.perf_counter() - start
+                upstream = (await stub_client.get("/_stats")).json()
+                results.append(summarize(name, rec, wall, rss.summary(), upstream))
+    finally:
+        if target is not None:
+            _stop(target)
+        if redis is not None:
+            _stop(redis)
+        _stop(stub)
+    return results
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    results = asyncio.run(main_async(args))
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# bench/stub.py
+"""
+ベンチマーク用の偽 YouTube + CDN。
+
+    uvicorn bench.stub:app --port 9100
+
+- /watch, /channel/<id>/{about,videos}, /@<handle>/{about,videos} : ytInitialData 入り HTML
+- /youtubei/v1/next                 : コメントの continuation 応答
+- /ytdlp/info?url=...               : yt-dlp の info dict 相当（bench/app.py の偽 YoutubeDL が呼ぶ）
+- /cdn/hls/<id>/master.m3u8         : マスタープレイリスト
+- /cdn/hls/<id>/<variant>/index.m3u8: メディアプレイリスト（id が live- で始まればライブ）
+- /cdn/hls/<id>/<variant>/seg<n>.ts : 合成 TS セグメント
+- /_stats, /_reset                  : 種別ごとの上流リクエスト数
+
+遅延・サイズは環境変数 STUB_* で変える（run.py がまとめて渡す）。
+"""
+import os
+import json
+import time
+import asyncio
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+
+LATENCY = int(os.getenv("STUB_LATENCY_MS", "20")) / 1000
+EXTRACT_LATENCY = int(os.getenv("STUB_EXTRACT_LATENCY_MS", "800")) / 1000
+SEGMENT_BYTES = int(os.getenv("STUB_SEGMENT_BYTES", str(256 * 1024)))
+PAGE_BYTES = int(os.getenv("STUB_PAGE_BYTES", str(600 * 1024)))
+VOD_SEGMENTS = int(os.getenv("STUB_VOD_SEGMENTS", "600"))
+SEGMENT_SECONDS = int(os.getenv("STUB_SEGMENT_SECONDS", "2"))
+LIVE_WINDOW = 6
+SIGNED_URL_LIFETIME = 6 * 3600
+
+app = FastAPI(title="Oculora bench stub")
+counts: Counter = Counter()
+
+# TS パケット (188 byte) の繰り返しで作る合成セグメント
+_TS_PACKET = b"\x47" + bytes(187)
+SEGMENT = (_TS_PACKET * (SEGMENT_BYTES // 188 + 1))[:SEGMENT_BYTES]
+_PADDING = "<!-- " + "x" * max(PAGE_BYTES - 10, 0) + " -->"
+
+
+async def _upstream(kind: str, latency: float = LATENCY) -> None:
+    counts[kind] += 1
+    if latency:
+        await asyncio.sleep(latency)
+
+
+def _page(initial_data: dict, ytcfg: dict | None = None) -> HTMLResponse:
+    # 実ページと同様、ytInitialData の前に大きな本文を置く
+    cfg = f"<script>ytcfg.set({json.dumps(ytcfg)});</script>" if ytcfg else ""
+    return HTMLResponse(
+        f"<!DOCTYPE html><html><head>{cfg}</head><body>{_PADDING}"
+        f"<script>var ytInitialData = {json.dumps(initial_data)};</script></body></html>"
+    )
+
+
+# ───────────────── ページ ─────────────────
+@app.get("/watch")
+async def watch(v: str):
+    await _upstream("watch")
+    data = {"contents": {"twoColumnWatchNextResults": {"results": {"results": {"contents": [
+        {"itemSectionRenderer": {"sectionIdentifier": "comment-item-section", "contents": [
+            {"continuationItemRenderer": {"continuationEndpoint": {
+                "continuationCommand": {"token": f"{v}:0"}}}}]}}]}}}}}
+    cfg = {"INNERTUBE_API_KEY": "bench", "INNERTUBE_CONTEXT": {
+        "client": {"clientName": "WEB", "clientVersion": "2.0"}}}
+    return _page(data, cfg)
+
+
+@app.post("/youtubei/v1/next")
+async def innertube_next(request: Request):
+    await _upstream("innertube")
+    body = await request.json()
+    video_id, page = body["continuation"].rsplit(":", 1)
+    page = int(page)
+    items = [{"commentThreadRenderer": {"comment": {"commentRenderer": {
+        "authorText": {"simpleText": f"@user{page}-{i}"},
+        "authorThumbnail": {"thumbnails": [{"url": "https://yt3.example/avatar.jpg"}]},
+        "contentText": {"runs": [{"text": f"comment {i} on {video_id}"}]}}}}} for i in range(20)]
+    if page < 4:
+        items.append({"continuationItemRenderer": {"continuationEndpoint": {
+            "continuationCommand": {"token": f"{video_id}:{page + 1}"}}}})
+    return {"onResponseReceivedEndpoints": [{"appendContinuationItemsAction": {"continuationItems": items}}]}
+
+
+def _channel_page(channel: str, tab: str) -> HTMLResponse:
+    if tab == "about":
+        data = {"metadata": {"channelMetadataRenderer": {
+            "title": f"Channel {channel}",
+            "description": "bench channel",
+            "avatar": {"thumbnails": [{"url": "https://yt3.example/avatar.jpg"}]},
+            "channelUrl": f"https://www.youtube.com/channel/{channel}",
+        }}}
+    else:
+        videos = [{"richItemRenderer": {"content": {"videoRenderer": {
+            "videoId": f"vid{i:08d}",
+            "title": {"runs": [{"text": f"Video {i}"}]},
+            "thumbnail": {"thumbnails": [{"url": f"https://i.ytimg.example/{i}.jpg"}]},
+            "publishedTimeText": {"simpleText": f"{i} days ago"},
+            "viewCountText": {"simpleText": f"{i * 1000} views"},
+        }}}} for i in range(30)]
+        data = {"contents": {"twoColumnBrowseResultsRenderer": {"tabs": [
+            {"tabRenderer": {"title": "Home"}},
+            {"tabRenderer": {"content": {"richGridRenderer": {"contents": videos}}}},
+        ]}}}
+    return _page(data)
+
+
+@app.get("/channel/{channel}/{tab}")
+async def channel_tab(channel: str, tab: str):
+    await _upstream(f"channel_{tab}")
+    return _channel_page(channel, tab)
+
+
+@app.get("/@{handle}/{tab}")
+async def handle_tab(handle: str, tab: str):
+    await _upstream(f"channel_{tab}")
+    return _channel_page(handle, tab)
+
+
+# ───────────────── 抽出（yt-dlp 相当） ─────────────────
+@app.get("/ytdlp/info")
+async def ytdlp_info(request: Request, url: str):
+    await _upstream("extract", EXTRACT_LATENCY)
+    video_id = parse_qs(urlparse(url).query).get("v", ["unknown"])[0]
+    base = str(request.base_url).rstrip("/")
+    expire = int(time.time()) + SIGNED_URL_LIFETIME
+    hls = f"{base}/cdn/hls/{video_id}"
+    formats = [
+        {"format_id": f"hls-{h}", "protocol": "m3u8_native", "vcodec": "avc1", "height": h,
+         "resolution": f"{h}p", "url": f"{hls}/{h}p/index.m3u8", "manifest_url": f"{hls}/master.m3u8"}
+        for h in (360, 720, 1080)
+    ] + [
+        {"format_id": "hls-audio", "protocol": "m3u8_native", "vcodec": "none", "abr": 128,
+         "url": f"{hls}/audio/index.m3u8"},
+        {"format_id": "18", "protocol": "https", "vcodec": "avc1", "height": 360,
+         "url": f"{base}/cdn/videoplayback?id={video_id}&itag=18&expire={expire}"},
+    ]
+    return {
+        "id": video_id,
+        "title": f"Bench video {video_id}",
+        "description": "synthetic video served by bench/stub.py",
+        "uploader": "bench",
+        "channel_id": "UCbenchbenchbenchbench00",
+        "view_count": 12345,
+        "duration": VOD_SEGMENTS * SEGMENT_SECONDS,
+        "url": f"{base}/cdn/videoplayback?id={video_id}&itag=18&expire={expire}",
+        "formats": formats,
+    }
+
+
+# ───────────────── CDN ─────────────────
+@app.get("/cdn/hls/{video_id}/master.m3u8")
+async def master(video_id: str):
+    await _upstream("master")
+    lines = ["#EXTM3U", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    for h, bw in ((360, 800_000), (720, 2_500_000), (1080, 5_000_000)):
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={bw},RESOLUTION={h * 16 // 9}x{h}")
+        lines.append(f"{h}p/index.m3u8")
+    return Response("\n".join(lines) + "\n", media_type="application/vnd.apple.mpegurl")
+
+
+@app.get("/cdn/hls/{video_id}/{variant}/index.m3u8")
+async def media(video_id: str, variant: str):
+    await _upstream("media")
+    expire = int(time.time()) + SIGNED_URL_LIFETIME
+    live = video_id.startswith("live-")
+    if live:
+        head = int(time.time()) // SEGMENT_SECONDS
+        first, last = head - LIVE_WINDOW + 1, head
+    else:
+        first, last = 0, VOD_SEGMENTS - 1
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{SEGMENT_SECONDS}",
+             f"#EXT-X-MEDIA-SEQUENCE:{first}"]
+    for n in range(first, last + 1):
+        lines.append(f"#EXTINF:{SEGMENT_SECONDS}.000,")
+        lines.append(f"seg{n}.ts?expire={expire}&sq={n}")
+    if not live:
+        lines.append("#EXT-X-ENDLIST")
+    return Response("\n".join(lines) + "\n", media_type="application/vnd.apple.mpegurl")
+
+
+@app.get("/cdn/hls/{video_id}/{variant}/{segment}")
+async def segment(video_id: str, variant: str, segment: str):
+    await _upstream("segment")
+    return Response(SEGMENT, media_type="video/mp2t")
+
+
+@app.get("/cdn/videoplayback")
+async def videoplayback():
+    await _upstream("videoplayback")
+    return Response(SEGMENT, media_type="video/mp4")
+
+
+# ───────────────── 計測用 ─────────────────
+@app.get("/_stats")
+async def stats():
+    return JSONResponse(dict(counts))
+
+
+@app.post("/_reset")
+async def reset():
+    counts.clear()
+    return {"ok": True}
@@ -1,7 +1,6 @@
 import os
 import logging
 from typing import Dict, Any
-from aiocache import SimpleMemoryCache
 
 # 環境変数読み込みヘルパー
 def get_env_bool(key: str, default: bool = False) -> bool:
@@ -15,6 +14,13 @@ def get_env_int(key: str, default: int) -> int:
     except ValueError:
         return default
 
+def get_env_float(key: str, default: float) -> float:
+    """環境変数をfloat型で取得"""
+    try:
+        return float(os.getenv(key, str(default)))
+    except ValueError:
+        return default
+
 def get_env_str(key: str, default: str = "") -> str:
     """環境変数をstr型で取得"""
     return os.getenv(key, default)
@@ -72,6 +78,8 @@ HTTP_SETTINGS = {
     "max_keepalive_connections": get_env_int("MAX_KEEPALIVE_CONNECTIONS", 20),
     "keepalive_expiry": get_env_int("KEEPALIVE_EXPIRY", 5),
     "retries": get_env_int("HTTP_RETRIES", 3),
+    "http2": get_env_bool("HTTP2", True),
+    "max_connections_per_host": get_env_int("MAX_CONNECTIONS_PER_HOST", 20),
 }
 
 # 旧単独定数（互換用）
@@ -83,10 +91,35 @@ MAX_CONNECTIONS = HTTP_SETTINGS["max_connections"]
 # ==================================================================
 
 CACHE_SETTINGS = {
-    "backend": SimpleMemoryCache,  # クラスで保持
-    "ttl_m3u8": get_env_int("CACHE_TTL_M3U8", 60),
+    "backend": get_env_str("CACHE_BACKEND", "memory"),  # memory / redis / disk
+    "redis_host": get_env_str("CACHE_REDIS_HOST", "127.0.0.1"),
+    "redis_port": get_env_int("CACHE_REDIS_PORT", 6379),
+    "redis_db": get_env_int("CACHE_REDIS_DB", 0),
+    "redis_password": get_env_str("CACHE_REDIS_PASSWORD", ""),
+    "disk_path": get_env_str("CACHE_DISK_PATH", "./cache/oculora-cache.sqlite3"),
+    "share_segments": get_env_bool("CACHE_SHARE_SEGMENTS", False),
+    "m3u8_template_cache_size": get_env_int("CACHE_M3U8_TEMPLATES", 256),
+    "m3u8_template_max_bytes": get_env_int("CACHE_M3U8_TEMPLATE_MAX_BYTES", 64 * 1024 * 1024),
+    "m3u8_render_variants": get_env_int("CACHE_M3U8_RENDER_VARIANTS", 8),
+    "ttl_m3u8": get_env_int("CACHE_TTL_M3U8", 60),              # マスター / 判定不能時
+    "ttl_m3u8_vod": get_env_int("CACHE_TTL_M3U8_VOD", 1800),    # EXT-X-ENDLIST / VOD
+    "ttl_m3u8_live_min": get_env_int("CACHE_TTL_M3U8_LIVE_MIN", 1),
+    "m3u8_revalidate_window": get_env_int("CACHE_M3U8_REVALIDATE_WINDOW", 300),
     "ttl_segment": get_env_int("CACHE_TTL_SEGMENT", 300),
+    "segment_max_bytes": get_env_int("CACHE_SEGMENT_MAX_BYTES", 256 * 1024 * 1024),
+    "segment_max_entry_bytes": get_env_int("CACHE_SEGMENT_MAX_ENTRY_BYTES", 16 * 1024 * 1024),
     "namespace": get_env_str("CACHE_NAMESPACE", "proxy"),
+    # 抽出結果の永続化（再起動後もキャッシュを引き継ぐ）
+    "persist_enabled": get_env_bool("CACHE_PERSIST_ENABLED", False),
+    "persist_path": get_env_str("CACHE_PERSIST_PATH", "./cache/oculora-persist.sqlite3"),
+    "persist_max_bytes": get_env_int("CACHE_PERSIST_MAX_BYTES", 512 * 1024 * 1024),
+    "persist_warm_keys": get_env_int("CACHE_PERSIST_WARM_KEYS", 1000),
+    # 署名付き URL (expire=) に合わせた TTL: expire - margin、残り refresh_ahead 秒で再取得
+    "expire_margin": get_env_int("CACHE_EXPIRE_MARGIN", 300),
+    "expire_refresh_ahead": get_env_int("CACHE_EXPIRE_REFRESH_AHEAD", 900),
+    "expire_max_ttl": get_env_int("CACHE_EXPIRE_MAX_TTL", 6 * 3600),
+    # stale-while-revalidate: TTL 経過後この秒数までは古い値を返し裏で再取得（0 で無効）
+    "swr_window": get_env_int("CACHE_SWR_WINDOW", 0),
 }
 
 # ==================================================================
@@ -98,6 +131,19 @@ PROXY_SETTINGS = {
     "url_safe_chars": get_env_str("PROXY_URL_SAFE_CHARS", ""),
     "max_redirects": get_env_int("PROXY_MAX_REDIRECTS", 5),
     "buffer_size": get_env_int("PROXY_BUFFER_SIZE", 8192),
+    "prefetch_enabled": get_env_bool("PROXY_PREFETCH_ENABLED", True),
+    "prefetch_segments": get_env_int("PROXY_PREFETCH_SEGMENTS", 3),
+    "prefetch_concurrency": get_env_int("PROXY_PREFETCH_CONCURRENCY", 4),
+    "prefetch_max_inflight_bytes": get_env_int("PROXY_PREFETCH_MAX_INFLIGHT_BYTES", 64 * 1024 * 1024),
+    "prefetch_max_playlists": get_env_int("PROXY_PREFETCH_MAX_PLAYLISTS", 512),
+    # 上流 URL の代わりに署名付き短縮トークン (~...) を返す。複数ワーカーでは共有バックエンド + 共通 SECRET が必要
+    "tokens_enabled": get_env_bool("PROXY_TOKENS_ENABLED", False),
+    "tokens_required": get_env_bool("PROXY_TOKENS_REQUIRED", False),  # true なら生 URL の /proxy を拒否
+    "token_secret": get_env_str("PROXY_TOKEN_SECRET", ""),
+    "token_ttl": get_env_int("PROXY_TOKEN_TTL", 6 * 3600),
+    "token_local_groups": get_env_int("PROXY_TOKEN_LOCAL_GROUPS", 256),
+    # ライブの m3u8 は更新ごとに別グループになるので、TARGETDURATION × この倍数で失効させる
+    "token_live_ttl_factor": get_env_int("PROXY_TOKEN_LIVE_TTL_FACTOR", 3),
 }
 
 # ==================================================================
@@ -112,6 +158,9 @@ RESPONSE_SETTINGS = {
         "timeout_error": "request timeout",
         "invalid_url": "invalid URL",
         "extraction_failed": "extraction failed",
+        "invalid_token": "invalid proxy token",
+        "token_expired": "proxy token expired",
+        "token_required": "proxy token required",
     },
 }
 
@@ -141,6 +190,7 @@ ENDPOINTS = {
     "transcode": "/transcode",
     "comments": "/comments",
     "search": "/search",
+    "metrics": "/metrics",
 }
 
 # ==================================================================
@@ -177,6 +227,24 @@ YTDLP_EXTRA = {
     "external_downloader_args": get_env_str("YTDLP_EXTERNAL_DOWNLOADER_ARGS") or None,
 }
 
+# yt-dlp 専用スレッドプール（満杯時は 503 で負荷を落とす）
+YTDLP_POOL_SETTINGS = {
+    "workers": get_env_int("YTDLP_WORKERS", 4),
+    "queue_size": get_env_int("YTDLP_QUEUE_SIZE", 32),
+    "timeout": get_env_int("YTDLP_TIMEOUT", 60),  # 0 = 無制限
+    # thread: スレッドのみ / process: process_safe な抽出をプロセスプールで実行（GIL 回避）
+    "mode": get_env_str("YTDLP_POOL_MODE", "thread"),
+    "processes": get_env_int("YTDLP_PROCESSES", os.cpu_count() or 2),
+    # 初期化済み YoutubeDL インスタンスの再利用
+    "reuse_instances": get_env_bool("YTDLP_REUSE_INSTANCES", True),
+    "instance_idle_per_key": get_env_int("YTDLP_INSTANCE_IDLE_PER_KEY", 4),
+    "instance_max_keys": get_env_int("YTDLP_INSTANCE_MAX_KEYS", 16),
+    "instance_max_uses": get_env_int("YTDLP_INSTANCE_MAX_USES", 500),
+    # /download は長時間かかるので抽出とは別の小さいプールで動かす（タイムアウトなし）
+    "download_workers": get_env_int("YTDLP_DOWNLOAD_WORKERS", 2),
+    "download_queue_size": get_env_int("YTDLP_DOWNLOAD_QUEUE_SIZE", 8),
+}
+
 # ==================================================================
 # 11. ストリーム抽出関連
 # ==================================================================
@@ -191,6 +259,30 @@ STREAM_EXTRACTION = {
     "max_streams": get_env_int("STREAM_MAX_STREAMS", 50),
 }
 
+# コメント取得 (/comments) 用ヘッドレスブラウザプール
+COMMENTS_SETTINGS = {
+    # browser: Selenium でスクレイピング / innertube: JSON API でカーソルページング
+    "engine": get_env_str("COMMENTS_ENGINE", "browser"),
+    "youtube_base_url": get_env_str("COMMENTS_YOUTUBE_BASE_URL", "https://www.youtube.com"),
+    "browsers": get_env_int("COMMENTS_BROWSERS", 2),
+    "timeout": get_env_int("COMMENTS_TIMEOUT", 60),
+    "browser_max_uses": get_env_int("COMMENTS_BROWSER_MAX_USES", 50),
+    "max_scrolls": get_env_int("COMMENTS_MAX_SCROLLS", 12),
+    "scroll_wait": get_env_int("COMMENTS_SCROLL_WAIT", 2),
+}
+
+# プレイリスト列挙 (/playlist-info)
+PLAYLIST_SETTINGS = {
+    "page_size": get_env_int("PLAYLIST_PAGE_SIZE", 100),
+    "max_page_size": get_env_int("PLAYLIST_MAX_PAGE_SIZE", 1000),
+}
+
+# 一括抽出 (POST /batch-extract)
+BATCH_SETTINGS = {
+    "max_urls": get_env_int("BATCH_MAX_URLS", 500),
+    "concurrency": get_env_int("BATCH_CONCURRENCY", 8),
+}
+
 # ==================================================================
 # 12. セキュリティ / デバッグ
 # ==================================================================
@@ -210,6 +302,13 @@ DEBUG_SETTINGS = {
     "verbose_errors": get_env_bool("DEBUG_VERBOSE_ERRORS", False),
 }
 
+# 区間計測（Server-Timing ヘッダ + debug ログ）
+TRACING_SETTINGS = {
+    "enabled": get_env_bool("TRACING_ENABLED", False),
+    "sample_rate": get_env_float("TRACING_SAMPLE_RATE", 0.01),
+    "force_header": get_env_str("TRACING_FORCE_HEADER", "X-Oculora-Trace"),  # 値 1 で必ず計測
+}
+
 # ==================================================================
 # 13. 後方互換エイリアス（旧コード用）
 # ==================================================================
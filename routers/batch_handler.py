@@ -1,11 +1,14 @@
 # routers/batch_handler.py
-import asyncio, logging
-from typing import Dict, List
+import json, asyncio, logging
+from typing import Dict, List, Optional
 
 from fastapi import APIRouter, HTTPException, Query
-from yt_dlp import YoutubeDL        # get_stream_infos が内部で使う場合は不要
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 import config
 from routers.extractor_util import get_stream_infos
+from routers.extraction_pool import extraction_pool
+from routers.extract_handler import normalize_youtube_url, extract_cached
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -23,12 +26,103 @@ async def batch_extract(
     if not raw_list or len(raw_list) > 20:
         raise HTTPException(400, "1–20 URLs required")
 
-    loop = asyncio.get_event_loop()
-    tasks = [loop.run_in_executor(None, get_stream_infos, u) for u in raw_list]
+    tasks = [extraction_pool.run(get_stream_infos, u) for u in raw_list]
 
     try:
         results = await asyncio.gather(*tasks)
         return {raw_list[i]: results[i] for i in range(len(raw_list))}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"/batch-extract error: {e}")
         raise HTTPException(500, "batch extract failed")
+
+
+# ── POST /batch-extract（NDJSON ストリーミング） ─────────
+class BatchExtractRequest(BaseModel):
+    urls: List[str] = Field(..., description="動画 URL の配列")
+    concurrency: Optional[int] = Field(None, ge=1, description="同時抽出数（上限は設定値）")
+
+
+def _line(obj: dict) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _error_line(urls: List[str], video_url: Optional[str], e: Exception) -> dict:
+    if isinstance(e, HTTPException):
+        code, detail = e.status_code, e.detail
+    else:
+        code = 500
+        detail = config.RESPONSE_SETTINGS["error_messages"]["extraction_failed"]
+    return {"urls": urls, "video_url": video_url, "status": "error", "code": code, "error": detail}
+
+
+@router.post(config.ENDPOINTS["batch_extract"])
+async def batch_extract_stream(body: BatchExtractRequest):
+    """
+    大量 URL の一括抽出。1 行 1 動画の NDJSON を完了順に返す。
+
+    - URL は動画単位に正規化して重複をまとめる（"urls" に元 URL を列挙）
+    - /extract と同じキャッシュを先に引き、ヒット分は即座に返す
+    - ミス分だけを上限付き並列で抽出し、1 件の失敗は他に影響しない
+    """
+    settings = config.BATCH_SETTINGS
+    raw_list = [u.strip() for u in body.urls if u and u.strip()]
+    if not raw_list or len(raw_list) > settings["max_urls"]:
+        raise HTTPException(400, f"1–{settings['max_urls']} URLs required")
+    concurrency = min(body.concurrency or settings["concurrency"], settings["concurrency"])
+
+    # 正規化 + 重複排除（入力順を維持）
+    groups: Dict[str, List[str]] = {}
+    invalid: List[str] = []
+    for raw in raw_list:
+        try:
+            groups.setdefault(normalize_youtube_url(raw), []).append(raw)
+        except Exception:
+            invalid.append(raw)
+
+    async def generate():
+        for raw in invalid:
+            yield _line({"urls": [raw], "video_url": None, "status": "error", "code": 400,
+                         "error": config.RESPONSE_SETTINGS["error_messages"]["invalid_url"]})
+
+        def ok_line(video_url: str, result) -> bytes:
+            meta, streams, _ = result
+            return _line({"urls": groups[video_url], "video_url": video_url, "status": "ok",
+                          "meta": meta, "streams": streams})
+
+        # 1) キャッシュヒットは即時に返す
+        cached = await asyncio.gather(*(extract_cached.peek(f"extract:{v}") for v in groups),
+                                      return_exceptions=True)
+        misses = []
+        for video_url, hit in zip(groups, cached):
+            if hit is None or isinstance(hit, Exception):
+                misses.append(video_url)
+            else:
+                yield ok_line(video_url, hit)
+
+        # 2) ミス分を上限付き並列で抽出し、終わった順に返す
+        sem = asyncio.Semaphore(concurrency)
+
+        async def run_one(video_url: str):
+            async with sem:
+                try:
+                    return video_url, await extract_cached(None, video_url), None
+                except Exception as e:
+                    return video_url, None, e
+
+        tasks = [asyncio.create_task(run_one(v)) for v in misses]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                video_url, result, error = await fut
+                if error is None:
+                    yield ok_line(video_url, result)
+                else:
+                    logger.info(f"/batch-extract failed: {video_url}: {error}")
+                    yield _line(_error_line(groups[video_url], video_url, error))
+        finally:
+            # クライアント切断時は残りを打ち切る
+            for t in tasks:
+                t.cancel()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
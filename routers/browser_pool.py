@@ -0,0 +1,183 @@
+# routers/browser_pool.py
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def _chrome_options():
+    from selenium import webdriver
+    options = webdriver.ChromeOptions()
+    options.add_argument("--lang=ja-JP")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--headless")
+    options.add_argument("--disable-dev-shm-usage")
+    prefs = {"profile.managed_default_content_settings.images": 2}
+    options.add_experimental_option("prefs", prefs)
+    return options
+
+
+class BrowserPool:
+    """
+    常駐ヘッドレス Chrome のプール。
+
+    - ChromeDriver のパス解決は起動時に 1 回だけ
+    - 同時セッション数は size で上限、各セッションは max_uses 回で作り直す
+    - ジョブはタイムアウト付き。タイムアウト・WebDriver 例外時はそのセッションを quit して破棄
+    """
+
+    def __init__(self, size: int, timeout: float, max_uses: int):
+        self.size = size
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="browser")
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._idle: List[Tuple[Any, int]] = []
+        self._driver_path: Optional[str] = None
+        self._path_lock = threading.Lock()
+        self.created = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.timeouts = 0
+
+    # ── ドライバ管理（スレッド内で実行） ──────────
+    def _resolve_driver_path(self) -> str:
+        with self._path_lock:
+            if self._driver_path is None:
+                from webdriver_manager.chrome import ChromeDriverManager
+                self._driver_path = ChromeDriverManager().install()
+                logger.info(f"chromedriver resolved: {self._driver_path}")
+            return self._driver_path
+
+    def _new_driver(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium_stealth import stealth
+        driver = webdriver.Chrome(service=Service(self._resolve_driver_path()), options=_chrome_options())
+        # Selenium Stealth セットアップ
+        stealth(driver,
+                languages=["ja-JP", "en-US"],
+                vendor="Google Inc.",
+                platform="Win32",
+                webgl_vendor="Intel Inc.",
+                renderer="Intel Iris OpenGL Engine",
+                fix_hairline=True,
+                )
+        driver.set_window_size(1280, 800)
+        self.created += 1
+        return driver
+
+    @staticmethod
+    def _quit(driver) -> None:
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.debug(f"driver quit failed: {e}")
+
+    def _quit_async(self, driver) -> None:
+        # 実行中のジョブを止めるため別スレッドで quit（ブロックしない）
+        threading.Thread(target=self._quit, args=(driver,), daemon=True).start()
+
+    def _run_job(self, driver, job: Callable[[Any], Any]):
+        if driver is None:
+            driver = self._new_driver()
+        try:
+            return driver, job(driver)
+        except BaseException as e:
+            e.driver = driver
+            raise
+
+    # ── 公開 API ─────────────────────────────
+    async def start(self) -> None:
+        """
+        COMMENTS_ENGINE=browser なら起動時に ChromeDriver を解決しておく（失敗しても初回ジョブで再試行）。
+        innertube が既定なら解決（ネットワークアクセス）は engine=browser の初回ジョブまで遅らせる。
+        """
+        if config.COMMENTS_SETTINGS["engine"] != "browser":
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._resolve_driver_path)
+        except Exception as e:
+            logger.warning(f"chromedriver resolution failed at startup: {e}")
+
+    async def run(self, job: Callable[[Any], Any], timeout: Optional[float] = None):
+        """空いているブラウザで job(driver) を実行して結果を返す"""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.size)
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+
+        async with self._sem:
+            driver, uses = self._idle.pop() if self._idle else (None, 0)
+            fut = loop.run_in_executor(self._executor, self._run_job, driver, job)
+            try:
+                driver, result = await asyncio.wait_for(asyncio.shield(fut), timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.crashed += 1
+                # ジョブがまだドライバを作っていなければ完了時に後始末する
+                if driver is not None:
+                    self._quit_async(driver)
+                fut.add_done_callback(self._discard_late)
+                raise HTTPException(504, "browser job timed out")
+            except HTTPException as e:
+                # ページ側の問題（コメント欄なし等）。ブラウザ自体は再利用できる
+                self._checkin(getattr(e, "driver", driver), uses + 1)
+                raise
+            except Exception as e:
+                self.crashed += 1
+                broken = getattr(e, "driver", driver)
+                if broken is not None:
+                    self._quit_async(broken)
+                logger.warning(f"browser job failed, session discarded: {type(e).__name__}: {e}")
+                raise
+            self._checkin(driver, uses + 1)
+            return result
+
+    def _discard_late(self, fut) -> None:
+        if fut.cancelled():
+            return
+        exc = fut.exception()
+        driver = getattr(exc, "driver", None) if exc else fut.result()[0]
+        if driver is not None:
+            self._quit_async(driver)
+
+    def _checkin(self, driver, uses: int) -> None:
+        if driver is None:
+            return
+        if uses >= self.max_uses:
+            self.recycled += 1
+            self._quit_async(driver)
+            return
+        self._idle.append((driver, uses))
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for driver, _ in idle:
+            self._quit(driver)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "created": self.created,
+            "recycled": self.recycled,
+            "crashed": self.crashed,
+            "timeouts": self.timeouts,
+        }
+
+
+browser_pool = BrowserPool(
+    size=config.COMMENTS_SETTINGS["browsers"],
+    timeout=config.COMMENTS_SETTINGS["timeout"],
+    max_uses=config.COMMENTS_SETTINGS["browser_max_uses"],
+)
@@ -0,0 +1,597 @@
+# routers/cache_backend.py
+"""
+キャッシュバックエンドの切り替え層。
+
+CACHE_BACKEND=memory | redis | disk で選択し、@cached デコレータと
+/proxy 等の手動キャッシュはすべてここを経由する。
+
+- memory : aiocache SimpleMemoryCache（ワーカー毎・従来通り）
+- redis  : aiocache RedisCache（Redis プロトコル互換サーバーで全ワーカー共有）
+- disk   : SQLite ファイル（同一ホスト上の全ワーカーで共有）
+
+CACHE_PERSIST_ENABLED=true のときは @shared_cached の結果を永続ファイルにも
+書き込み（L2）、再起動後はそこから読み戻す。起動時には参照回数の多いキーを
+L1 に先読みする。
+
+expiry_aware=True の @shared_cached は、値に含まれる署名付き URL の expire から
+TTL を決め（安全マージンを引く）、期限が近いエントリは参照時にバックグラウンドで
+取り直す。swr=True なら ttl を過ぎても CACHE_SWR_WINDOW 秒までは古い値を即返し、
+裏で 1 本だけ再取得する（stale-while-revalidate）。
+"""
+import os
+import re
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from aiocache import cached, SimpleMemoryCache
+from aiocache.base import BaseCache
+from aiocache.serializers import NullSerializer, PickleSerializer
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+# ───────────────── SQLite バックエンド ─────────────────
+class DiskCache(BaseCache):
+    """
+    SQLite(WAL) を使った単一ホスト共有キャッシュ。
+    複数の uvicorn ワーカーから同じファイルを開いて使う。
+    """
+
+    NAME = "disk"
+    _PURGE_EVERY = 256  # set 何回ごとに期限切れを掃除するか
+
+    def __init__(self, path: Optional[str] = None, serializer=None,
+                 max_bytes: int = 0, track_hits: bool = False, **kwargs):
+        super().__init__(serializer=serializer or PickleSerializer(), **kwargs)
+        self.path = path or config.CACHE_SETTINGS["disk_path"]
+        self.max_bytes = max_bytes      # 0 = 上限なし
+        self.track_hits = track_hits    # 参照回数・最終参照時刻を記録（先読み・追い出し用）
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        self._written_bytes = 0
+        self._pending_hits: Dict[str, int] = {}
+        self._hits_flushed_at = time.monotonic()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " expires_at REAL,"
+            " size INTEGER NOT NULL DEFAULT 0,"
+            " hits INTEGER NOT NULL DEFAULT 0,"
+            " accessed_at REAL NOT NULL DEFAULT 0)"
+        )
+        # 旧スキーマのファイルには列を追加
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(cache)")}
+        for name, ddl in (("size", "INTEGER NOT NULL DEFAULT 0"),
+                          ("hits", "INTEGER NOT NULL DEFAULT 0"),
+                          ("accessed_at", "REAL NOT NULL DEFAULT 0")):
+            if name not in columns:
+                conn.execute(f"ALTER TABLE cache ADD COLUMN {name} {ddl}")
+        if max_bytes:
+            self._evict_sync()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _expiry(ttl) -> Optional[float]:
+        return time.time() + ttl if ttl else None
+
+    # 同期処理（スレッドで実行）
+    def _get_entry_sync(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        """(value, expires_at) を返す。無い / 期限切れなら None"""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        now = time.time()
+        if expires_at is not None and expires_at <= now:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return None
+        if self.track_hits:
+            conn.execute("UPDATE cache SET hits = hits + 1, accessed_at = ? WHERE key = ?",
+                         (now, key))
+        return value, expires_at
+
+    def _get_sync(self, key: str):
+        entry = self._get_entry_sync(key)
+        return entry[0] if entry else None
+
+    def _set_sync(self, pairs, ttl, only_new: bool = False) -> bool:
+        conn = self._conn()
+        now = time.time()
+        expires_at = self._expiry(ttl)
+        verb = "INSERT OR IGNORE" if only_new else "INSERT OR REPLACE"
+        rows = [(k, v, expires_at, len(v) if isinstance(v, (bytes, str)) else 0, now)
+                for k, v in pairs]
+        with conn:
+            if only_new:
+                conn.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?",
+                             (pairs[0][0], now))
+            # 上書き時も参照回数は引き継ぐ（先読み対象の判定に使う）
+            cur = conn.executemany(
+                f"{verb} INTO cache (key, value, expires_at, size, hits, accessed_at) "
+                "VALUES (?, ?, ?, ?, COALESCE((SELECT hits FROM cache WHERE key = ?), 0), ?)",
+                [(k, v, e, size, k, a) for k, v, e, size, a in rows],
+            )
+        self._writes += 1
+        self._written_bytes += sum(r[3] for r in rows)
+        if self.max_bytes and self._written_bytes >= self.max_bytes // 20:
+            self._evict_sync()
+        elif self._writes % self._PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        return cur.rowcount > 0
+
+    def _evict_sync(self) -> None:
+        """期限切れを削除し、max_bytes を超えていれば最終参照の古い順に追い出す"""
+        conn = self._conn()
+        self._written_bytes = 0
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if not self.max_bytes or total <= self.max_bytes:
+            return
+        # 上限の 90% まで下げて、毎回の追い出しを避ける
+        excess = total - self.max_bytes * 9 // 10
+        victims, freed = [], 0
+        for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        with conn:
+            conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+        logger.info(f"disk cache evicted {len(victims)} entries ({freed} bytes) from {self.path}")
+
+    def hot_entries_sync(self, limit: int) -> List[Tuple[str, Any, Optional[float]]]:
+        """参照回数の多い有効エントリを (key, value, expires_at) で返す"""
+        rows = self._conn().execute(
+            "SELECT key, value, expires_at FROM cache"
+            " WHERE expires_at IS NULL OR expires_at > ?"
+            " ORDER BY hits DESC, accessed_at DESC LIMIT ?",
+            (time.time(), limit),
+        ).fetchall()
+        return [(k, self.serializer.loads(v), e) for k, v, e in rows]
+
+    def _flush_hits_sync(self, hits: Dict[str, int]) -> None:
+        self._conn().executemany(
+            "UPDATE cache SET hits = hits + ?, accessed_at = ? WHERE key = ?",
+            [(n, time.time(), k) for k, n in hits.items()],
+        )
+
+    def note_hit(self, key: str) -> None:
+        """
+        上位層（L1）でのヒットを記録する。まとめて書き込むので呼び出しは軽い。
+        """
+        self._pending_hits[key] = self._pending_hits.get(key, 0) + 1
+        if len(self._pending_hits) < 64 and time.monotonic() - self._hits_flushed_at < 30:
+            return
+        hits, self._pending_hits = self._pending_hits, {}
+        self._hits_flushed_at = time.monotonic()
+        task = asyncio.get_running_loop().run_in_executor(None, self._flush_hits_sync, hits)
+        task.add_done_callback(lambda t: t.exception() and logger.warning(
+            f"disk cache hit flush failed: {t.exception()}"))
+
+    async def get_entry(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        """値と残り TTL（秒, 無期限なら None）を返す"""
+        entry = await asyncio.to_thread(self._get_entry_sync, self.build_key(key))
+        if entry is None:
+            return None
+        value, expires_at = entry
+        ttl = max(expires_at - time.time(), 1) if expires_at is not None else None
+        return self.serializer.loads(value), ttl
+
+    async def _get(self, key, encoding="utf-8", _conn=None):
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def _gets(self, key, encoding="utf-8", _conn=None):
+        return await self._get(key, encoding=encoding, _conn=_conn)
+
+    async def _multi_get(self, keys, encoding="utf-8", _conn=None):
+        return [await self._get(k) for k in keys]
+
+    async def _set(self, key, value, ttl=None, _cas_token=None, _conn=None):
+        await asyncio.to_thread(self._set_sync, [(key, value)], ttl)
+        return True
+
+    async def _multi_set(self, pairs, ttl=None, _conn=None):
+        await asyncio.to_thread(self._set_sync, list(pairs), ttl)
+        return True
+
+    async def _add(self, key, value, ttl=None, _conn=None):
+        added = await asyncio.to_thread(self._set_sync, [(key, value)], ttl, True)
+        if not added:
+            raise ValueError(f"Key {key} already exists, use .set to update the value")
+        return True
+
+    async def _exists(self, key, _conn=None):
+        return await self._get(key) is not None
+
+    async def _increment(self, key, delta, _conn=None):
+        def run():
+            conn = self._conn()
+            with conn:
+                row = conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+                value = int(self.serializer.loads(row[0])) + delta if row else delta
+                conn.execute("INSERT OR REPLACE INTO cache (key, value, expires_at) "
+                             "VALUES (?, ?, (SELECT expires_at FROM cache WHERE key = ?))",
+                             (key, self.serializer.dumps(value), key))
+            return value
+        return await asyncio.to_thread(run)
+
+    async def _expire(self, key, ttl, _conn=None):
+        def run():
+            cur = self._conn().execute("UPDATE cache SET expires_at = ? WHERE key = ?",
+                                       (self._expiry(ttl), key))
+            return cur.rowcount > 0
+        return await asyncio.to_thread(run)
+
+    async def _delete(self, key, _conn=None):
+        def run():
+            return self._conn().execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount
+        return await asyncio.to_thread(run)
+
+    async def _clear(self, namespace=None, _conn=None):
+        def run():
+            if namespace:
+                self._conn().execute("DELETE FROM cache WHERE key LIKE ?", (f"{namespace}%",))
+            else:
+                self._conn().execute("DELETE FROM cache")
+            return True
+        return await asyncio.to_thread(run)
+
+    async def _raw(self, command, *args, encoding="utf-8", _conn=None, **kwargs):
+        return await asyncio.to_thread(lambda: self._conn().execute(command, args).fetchall())
+
+    async def _redlock_release(self, key, value):
+        def run():
+            row = self._get_sync(key)
+            if row is not None and row == value:
+                return self._conn().execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount
+            return 0
+        return await asyncio.to_thread(run)
+
+    async def _close(self, *args, _conn=None, **kwargs):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# ───────────────── 永続化層（L1 + ディスク L2） ─────────────────
+# googlevideo の署名付き URL: ?expire=1700000000 / .../expire/1700000000/...
+_EXPIRE_RE = re.compile(r"[?&/]expire[=/](\d{9,11})")
+
+
+def value_expiry(value: Any) -> Optional[float]:
+    """キャッシュ値に含まれる署名付き URL のうち、最も早い expire を返す"""
+    earliest: Optional[float] = None
+    stack = [value]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, (bytes, bytearray)):
+            cur = cur.decode("utf-8", "ignore")
+        if isinstance(cur, str):
+            for m in _EXPIRE_RE.finditer(cur):
+                t = float(m.group(1))
+                if earliest is None or t < earliest:
+                    earliest = t
+        elif isinstance(cur, dict):
+            stack.extend(cur.values())
+        elif isinstance(cur, (list, tuple)):
+            stack.extend(cur)
+        elif hasattr(cur, "body"):  # JSONResponse などをそのままキャッシュしている場合
+            stack.append(cur.body)
+    return earliest
+
+
+_persistent_store: Optional[DiskCache] = None
+
+
+def persistence_enabled() -> bool:
+    # disk バックエンドはそれ自体が永続なので二重には持たない
+    return config.CACHE_SETTINGS["persist_enabled"] and backend_name() != "disk"
+
+
+def get_persistent_store() -> DiskCache:
+    global _persistent_store
+    if _persistent_store is None:
+        settings = config.CACHE_SETTINGS
+        _persistent_store = DiskCache(
+            path=settings["persist_path"],
+            max_bytes=settings["persist_max_bytes"],
+            track_hits=True,
+        )
+    return _persistent_store
+
+
+class TieredCache(BaseCache):
+    """
+    L1（memory / redis）の後ろに永続ディスク L2 を置くキャッシュ。
+    読み出しは L1 → L2（ヒットしたら L1 に戻す）、書き込みは両方へ。
+    L2 の TTL は値に含まれる署名付き URL の expire を超えない。
+    """
+
+    NAME = "tiered"
+
+    def __init__(self, serializer=None, namespace=None, **kwargs):
+        # シリアライズは各層に任せる
+        super().__init__(serializer=NullSerializer(), **kwargs)
+        self.l1 = get_cache()
+        self.l2 = get_persistent_store()
+
+    @staticmethod
+    def persist_ttl(value, ttl) -> Optional[float]:
+        """L2 に書く TTL（0 以下なら書かない）"""
+        expiry = value_expiry(value)
+        if expiry is None:
+            return ttl
+        remaining = expiry - time.time()
+        return min(ttl, remaining) if ttl else remaining
+
+    async def _get(self, key, encoding="utf-8", _conn=None):
+        value = await self.l1.get(key)
+        if value is not None:
+            self.l2.note_hit(key)
+            return value
+        try:
+            entry = await self.l2.get_entry(key)
+        except Exception as e:
+            logger.warning(f"persistent cache read failed: {e}")
+            return None
+        if entry is None:
+            return None
+        value, ttl = entry
+        await self.l1.set(key, value, ttl=ttl)
+        return value
+
+    async def _gets(self, key, encoding="utf-8", _conn=None):
+        return await self._get(key)
+
+    async def _multi_get(self, keys, encoding="utf-8", _conn=None):
+        return [await self._get(k) for k in keys]
+
+    async def _set(self, key, value, ttl=None, _cas_token=None, _conn=None):
+        await self.l1.set(key, value, ttl=ttl)
+        l2_ttl = self.persist_ttl(value, ttl)
+        if l2_ttl is None or l2_ttl > 0:
+            try:
+                await self.l2.set(key, value, ttl=l2_ttl)
+            except Exception as e:
+                logger.warning(f"persistent cache write failed: {e}")
+        return True
+
+    async def _multi_set(self, pairs, ttl=None, _conn=None):
+        for key, value in pairs:
+            await self._set(key, value, ttl=ttl)
+        return True
+
+    async def _add(self, key, value, ttl=None, _conn=None):
+        if await self._get(key) is not None:
+            raise ValueError(f"Key {key} already exists, use .set to update the value")
+        return await self._set(key, value, ttl=ttl)
+
+    async def _exists(self, key, _conn=None):
+        return await self._get(key) is not None
+
+    async def _increment(self, key, delta, _conn=None):
+        return await self.l1.increment(key, delta)
+
+    async def _expire(self, key, ttl, _conn=None):
+        await self.l2.expire(key, ttl)
+        return await self.l1.expire(key, ttl)
+
+    async def _delete(self, key, _conn=None):
+        deleted = await self.l1.delete(key)
+        return await self.l2.delete(key) or deleted
+
+    async def _clear(self, namespace=None, _conn=None):
+        await self.l1.clear(namespace)
+        return await self.l2.clear(namespace)
+
+    async def _raw(self, command, *args, encoding="utf-8", _conn=None, **kwargs):
+        return await self.l1.raw(command, *args, **kwargs)
+
+    async def _redlock_release(self, key, value):
+        return await self.l1._redlock_release(key, value)
+
+    async def _close(self, *args, _conn=None, **kwargs):
+        pass
+
+
+async def warm_persistent_cache() -> int:
+    """起動時に永続層から参照回数の多いキーを L1 へ読み戻す"""
+    if not persistence_enabled():
+        return 0
+    limit = config.CACHE_SETTINGS["persist_warm_keys"]
+    if limit <= 0:
+        return 0
+    entries = await asyncio.to_thread(get_persistent_store().hot_entries_sync, limit)
+    l1 = get_cache()
+    now = time.time()
+    for key, value, expires_at in entries:
+        ttl = max(expires_at - now, 1) if expires_at is not None else None
+        await l1.set(key, value, ttl=ttl)
+    logger.info(f"warmed {len(entries)} cache entries from {get_persistent_store().path}")
+    return len(entries)
+
+
+# ───────────────── バックエンド選択 ─────────────────
+def _redis_class():
+    try:
+        from aiocache import RedisCache
+    except ImportError as e:  # redis パッケージ未導入
+        raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+    return RedisCache
+
+
+def backend_name() -> str:
+    return config.CACHE_SETTINGS["backend"].lower()
+
+
+def cache_options() -> Dict[str, Any]:
+    """
+    aiocache の cached(...) / Cache クラスに渡す cache + コンストラクタ引数
+    """
+    name = backend_name()
+    if name == "redis":
+        return {
+            "cache": _redis_class(),
+            "serializer": PickleSerializer(),
+            "endpoint": config.CACHE_SETTINGS["redis_host"],
+            "port": config.CACHE_SETTINGS["redis_port"],
+            "db": config.CACHE_SETTINGS["redis_db"],
+            "password": config.CACHE_SETTINGS["redis_password"] or None,
+            "namespace": config.CACHE_SETTINGS["namespace"],
+        }
+    if name == "disk":
+        return {
+            "cache": DiskCache,
+            "serializer": PickleSerializer(),
+            "namespace": config.CACHE_SETTINGS["namespace"],
+        }
+    if name != "memory":
+        logger.warning(f"unknown CACHE_BACKEND={name!r}; falling back to memory")
+    return {"cache": SimpleMemoryCache}
+
+
+class CachedEntry(NamedTuple):
+    """refreshing_cached が保存する値。fresh_until を過ぎたら裏で取り直す"""
+    value: Any
+    fresh_until: Optional[float]  # None = 取り直さない
+
+
+class refreshing_cached(cached):
+    """
+    期限前にバックグラウンドで取り直す @cached。
+
+    - expiry_aware: 署名付き URL の expire から TTL を決める
+      （TTL = expire - マージン, 上限 expire_max_ttl。残り expire_refresh_ahead 秒で再取得）
+    - swr: ttl を過ぎてから swr_window 秒間は古い値を返しつつ再取得する
+    どちらの場合も同一キーの再取得は 1 本だけ。値を直接読みたいときは
+    ``<function>.peek(key)`` を使う。
+    """
+
+    def __init__(self, *args, expiry_aware: bool = False, swr: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        settings = config.CACHE_SETTINGS
+        self.expiry_aware = expiry_aware
+        self.stale_window = settings["swr_window"] if swr else 0
+        self.margin = settings["expire_margin"]
+        self.refresh_ahead = settings["expire_refresh_ahead"]
+        self.max_ttl = settings["expire_max_ttl"]
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    def __call__(self, f):
+        wrapper = super().__call__(f)
+        wrapper.peek = self.peek
+        return wrapper
+
+    def lifetimes(self, value) -> Tuple[Optional[float], Optional[float]]:
+        """(新鮮な秒数, 保存 TTL) を返す。新鮮な秒数が None なら取り直さない"""
+        expiry = value_expiry(value) if self.expiry_aware else None
+        if expiry is not None:
+            ttl = min(expiry - self.margin - time.time(), self.max_ttl)
+            return ttl - self.refresh_ahead, ttl
+        if self.ttl is None or not self.stale_window:
+            return None, self.ttl
+        return self.ttl, self.ttl + self.stale_window
+
+    async def peek(self, key: str):
+        """キャッシュ上の値だけを返す（再取得はしない）"""
+        entry = await self.get_from_cache(key)
+        return entry.value if isinstance(entry, CachedEntry) else entry
+
+    async def decorator(self, f, *args, cache_read=True, cache_write=True,
+                        aiocache_wait_for_write=True, **kwargs):
+        if cache_read:
+            key = self.get_cache_key(f, args, kwargs)
+            entry = await self.get_from_cache(key)
+            if isinstance(entry, CachedEntry):
+                if entry.fresh_until is not None and time.time() >= entry.fresh_until:
+                    self._schedule_refresh(key, f, args, kwargs)
+                return entry.value
+            if entry is not None:
+                return entry
+        return await super().decorator(
+            f, *args, cache_read=False, cache_write=cache_write,
+            aiocache_wait_for_write=aiocache_wait_for_write, **kwargs)
+
+    async def set_in_cache(self, key, value):
+        fresh_for, ttl = self.lifetimes(value)
+        if ttl is not None and ttl <= 0:
+            logger.debug(f"skip caching {key}: signed URL expires within the safety margin")
+            return
+        fresh_until = time.time() + fresh_for if fresh_for is not None else None
+        try:
+            await self.cache.set(key, CachedEntry(value, fresh_until), ttl=ttl)
+        except Exception:
+            logger.exception("Couldn't set %s in key %s, unexpected error", value, key)
+
+    def _schedule_refresh(self, key, f, args, kwargs) -> None:
+        if key not in self._refreshing:
+            self._refreshing[key] = asyncio.create_task(self._refresh(key, f, args, kwargs))
+
+    async def _refresh(self, key, f, args, kwargs) -> None:
+        try:
+            result = await f(*args, **kwargs)
+            await self.set_in_cache(key, result)
+            logger.info(f"refreshed {key} in background")
+        except Exception as e:
+            logger.warning(f"background refresh failed for {key}: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+
+def shared_cached(ttl: int, key_builder: Callable[..., str],
+                  expiry_aware: bool = False, swr: bool = False, **kwargs):
+    """
+    @cached の置き換え。選択中のバックエンドで結果をキャッシュする。
+    永続化が有効なら L1 + ディスク L2 の TieredCache を使う。
+    expiry_aware=True なら署名付き URL の expire に合わせて TTL を決める（ttl は URL を
+    含まない値のときの既定値）。swr=True なら ttl 経過後も古い値を返しつつ裏で取り直す。
+    """
+    if expiry_aware or swr:
+        kwargs.update(expiry_aware=expiry_aware, swr=swr)
+        decorator = refreshing_cached
+    else:
+        decorator = cached
+    if persistence_enabled():
+        return decorator(ttl=ttl, key_builder=key_builder, cache=TieredCache, **kwargs)
+    return decorator(ttl=ttl, key_builder=key_builder, **cache_options(), **kwargs)
+
+
+_shared_cache: Optional[BaseCache] = None
+
+
+def get_cache() -> BaseCache:
+    """手動 get/set 用の共有キャッシュインスタンス"""
+    global _shared_cache
+    if _shared_cache is None:
+        opts = cache_options()
+        cache_cls = opts.pop("cache")
+        _shared_cache = cache_cls(**opts)
+    return _shared_cache
+
+
+def is_shared() -> bool:
+    """プロセス外（ワーカー間共有）のバックエンドかどうか"""
+    return backend_name() in ("redis", "disk")
@@ -1,48 +1,51 @@
 # routers/channel_handler.py
-import re, json, logging, httpx
+import re, asyncio, logging
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import JSONResponse
 import config
-from aiocache import cached, SimpleMemoryCache
+from routers.http_client import send
+from routers.cache_backend import shared_cached
+from routers.initial_data import find_initial_data
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+_PARSED_TTL = 1800  # ページ単位の解析結果キャッシュ（レスポンスキャッシュとは別）
+
 # ── 内部 util（ytInitialData 取得） ─────────
 async def _fetch_initial_data(page_url: str) -> dict:
-    async with httpx.AsyncClient() as c:
-        r = await c.get(page_url)
+    r = await send("GET", page_url)
     if r.status_code != 200:
         raise HTTPException(r.status_code, "upstream error")
-    import re
-    m = re.search(r"var ytInitialData\s*=\s*(\{.*?\});", r.text, re.S)
-    if not m:
+    data = find_initial_data(r.text)
+    if data is None:
         raise HTTPException(500, "parse error")
-    return json.loads(m.group(1))
+    return data
 
-# ── /channel-about ────────────────────────
-@router.get(config.ENDPOINTS["channel_about"])
-@cached(ttl=1800, cache=SimpleMemoryCache, key_builder=lambda f, channel_url: f"about:{channel_url}")
-async def channel_about(
-    channel_url: str = Query(..., description="https://www.youtube.com/@<handle> or UCxxxx")
-):
-    # channel_url がハンドル or チャンネルIDかを判定
-    if channel_url.startswith("UC") and len(channel_url) >= 20:
-        base_url = f"https://www.youtube.com/channel/{channel_url}"
-    elif re.match(r"^https://(www\.)?youtube\.com/@.+", channel_url):
-        base_url = channel_url
-    else:
-        raise HTTPException(400, "invalid channel url or id")
 
-    # about データ
+@shared_cached(ttl=_PARSED_TTL, key_builder=lambda f, base_url: f"about-meta:{base_url}", swr=True)
+async def _load_channel_meta(base_url: str) -> dict:
+    """/about ページからチャンネル情報を抽出"""
     about_data = await _fetch_initial_data(base_url + "/about")
-    # video データ
-    video_data = await _fetch_initial_data(base_url + "/videos")
-
     try:
         meta = about_data["metadata"]["channelMetadataRenderer"]
+        return {
+            "title":       meta["title"],
+            "description": meta.get("description"),
+            "subscriber":  meta.get("subscriberCountText", {}).get("simpleText"),
+            "avatar":      meta["avatar"]["thumbnails"][-1]["url"],
+            "channel_url": meta["channelUrl"],
+        }
+    except Exception as e:
+        logger.error(f"/channel-about parse error: {e}")
+        raise HTTPException(500, "structure changed")
 
-        # 最近の動画5本を抽出
+
+@shared_cached(ttl=_PARSED_TTL, key_builder=lambda f, base_url: f"about-videos:{base_url}", swr=True)
+async def _load_latest_videos(base_url: str) -> list:
+    """/videos ページから最近の動画5本を抽出"""
+    video_data = await _fetch_initial_data(base_url + "/videos")
+    try:
         videos = []
         contents = (
             video_data
@@ -68,18 +71,28 @@ async def channel_about(
             })
             if len(videos) >= 5:
                 break
-
-        return JSONResponse({
-            "title":       meta["title"],
-            "description": meta.get("description"),
-            "subscriber":  meta.get("subscriberCountText", {}).get("simpleText"),
-            "avatar":      meta["avatar"]["thumbnails"][-1]["url"],
-            "channel_url": meta["channelUrl"],
-            "latest_videos": videos
-        })
-
+        return videos
     except Exception as e:
         logger.error(f"/channel-about parse error: {e}")
         raise HTTPException(500, "structure changed")
 
+# ── /channel-about ────────────────────────
+@router.get(config.ENDPOINTS["channel_about"])
+@shared_cached(ttl=1800, key_builder=lambda f, channel_url: f"about:{channel_url}", swr=True)
+async def channel_about(
+    channel_url: str = Query(..., description="https://www.youtube.com/@<handle> or UCxxxx")
+):
+    # channel_url がハンドル or チャンネルIDかを判定
+    if channel_url.startswith("UC") and len(channel_url) >= 20:
+        base_url = f"https://www.youtube.com/channel/{channel_url}"
+    elif re.match(r"^https://(www\.)?youtube\.com/@.+", channel_url):
+        base_url = channel_url
+    else:
+        raise HTTPException(400, "invalid channel url or id")
 
+    # about / videos を並行取得（それぞれ解析結果単位でキャッシュ）
+    meta, videos = await asyncio.gather(
+        _load_channel_meta(base_url),
+        _load_latest_videos(base_url),
+    )
+    return JSONResponse({**meta, "latest_videos": videos})
@@ -1,22 +1,24 @@
-import os
 import time
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 from fastapi import APIRouter, Query, HTTPException
 from fastapi.responses import JSONResponse
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium_stealth import stealth
+from selenium.common.exceptions import TimeoutException
 from threading import Lock
 
+import config
+from routers.browser_pool import browser_pool
+from routers.cache_backend import shared_cached
+from routers.innertube_comments import fetch_comments_page
+
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 YOUTUBE_URL_TEMPLATE = "https://www.youtube.com/watch?v={}"
+THREAD_XPATH = '//*[@id="contents"]/ytd-comment-thread-renderer'
 
 # ── キャッシュ構造 ─────────────
 _comments_cache: Dict[str, Dict] = {}
@@ -41,59 +43,32 @@ def set_cached_comments(video_id: str, data):
         _comments_cache[video_id] = {"time": time.time(), "data": data}
 
 
-@router.get("/comments")
-def get_youtube_comments(v: str = Query(..., description="YouTube動画ID")):
-    if not v or len(v) < 5:
-        raise HTTPException(400, "invalid video id")
-    video_id = v.strip()
-
-    # キャッシュ確認
-    cached = get_cached_comments(video_id)
-    if cached is not None:
-        logger.info(f"[cache hit] /comments?video_id={video_id}")
-        return JSONResponse(content=cached)
-
-    url = YOUTUBE_URL_TEMPLATE.format(video_id)
-
-    options = webdriver.ChromeOptions()
-    options.add_argument("--lang=ja-JP")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--headless")
-    prefs = {"profile.managed_default_content_settings.images": 2}
-    options.add_experimental_option("prefs", prefs)
-
+def _scrape_comments(driver, video_id: str) -> List[Dict]:
+    """プール済みブラウザでコメントを取得（ブラウザスレッドで実行）"""
+    settings = config.COMMENTS_SETTINGS
+    driver.get(YOUTUBE_URL_TEMPLATE.format(video_id))
     try:
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-        # Selenium Stealth セットアップ
-        stealth(driver,
-                languages=["ja-JP", "en-US"],
-                vendor="Google Inc.",
-                platform="Win32",
-                webgl_vendor="Intel Inc.",
-                renderer="Intel Iris OpenGL Engine",
-                fix_hairline=True,
-                )
-
-        driver.set_window_size(1280, 800)
-        driver.get(url)
-
         # コメントセクション読み込み待ち
         try:
             WebDriverWait(driver, 15).until(
                 EC.presence_of_element_located((By.XPATH, '//*[@id="comments"]'))
             )
-        except Exception:
-            driver.quit()
+        except TimeoutException:
             logger.info("コメントセクションが読み込めませんでした")
             raise HTTPException(502, "failed to load comments")
 
-        # 最大限スクロールしてコメント取得
+        # 件数が増えなくなるまでスクロール（固定 sleep ではなく増加を待つ）
         prev_count = 0
-        for _ in range(12):  # 状況に合わせて回数調整可
+        comment_threads = []
+        for _ in range(settings["max_scrolls"]):
             driver.execute_script("window.scrollBy(0, 4000);")
-            time.sleep(2)
-            comment_threads = driver.find_elements(By.XPATH, '//*[@id="contents"]/ytd-comment-thread-renderer')
+            try:
+                WebDriverWait(driver, settings["scroll_wait"], poll_frequency=0.2).until(
+                    lambda d: len(d.find_elements(By.XPATH, THREAD_XPATH)) > prev_count
+                )
+            except TimeoutException:
+                pass
+            comment_threads = driver.find_elements(By.XPATH, THREAD_XPATH)
             curr_count = len(comment_threads)
             if curr_count == prev_count:
                 break
@@ -126,14 +101,67 @@ def get_youtube_comments(v: str = Query(..., description="YouTube動画ID")):
                     })
             except Exception:
                 continue  # エラーはスキップ
+        return results
+    finally:
+        # 次のジョブのためにページを解放
+        try:
+            driver.get("about:blank")
+        except Exception:
+            pass
 
-        driver.quit()
+
+@router.get("/comments")
+async def get_youtube_comments(
+    v: str = Query(..., description="YouTube動画ID"),
+    engine: Optional[str] = Query(None, description="browser / innertube（省略時は設定値）"),
+    cursor: Optional[str] = Query(None, description="次ページのカーソル（innertube のみ）"),
+):
+    if not v or len(v) < 5:
+        raise HTTPException(400, "invalid video id")
+    video_id = v.strip()
+    engine = engine or config.COMMENTS_SETTINGS["engine"]
+    if cursor and engine != "innertube":
+        raise HTTPException(400, "cursor requires engine=innertube")
+
+    if engine == "innertube":
+        return await _innertube_comments(video_id, cursor)
+    if engine != "browser":
+        raise HTTPException(400, "invalid engine")
+
+    # キャッシュ確認
+    cached = get_cached_comments(video_id)
+    if cached is not None:
+        logger.info(f"[cache hit] /comments?video_id={video_id}")
+        return JSONResponse(content=cached)
+
+    try:
+        results = await browser_pool.run(lambda driver: _scrape_comments(driver, video_id))
 
         # キャッシュ保存
         set_cached_comments(video_id, results)
 
         return JSONResponse(content=results)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"/comments error: {e}")
         raise HTTPException(500, "comments extraction failed")
+
+
+# カーソルごとにキーが増えるので、TTL で消える共有キャッシュに置く
+@shared_cached(ttl=_CACHE_TTL, key_builder=lambda f, video_id, cursor: f"innertube:{video_id}:{cursor or ''}")
+async def _innertube_page(video_id: str, cursor: Optional[str]) -> dict:
+    return await fetch_comments_page(video_id, cursor)
+
+
+async def _innertube_comments(video_id: str, cursor: Optional[str]):
+    """InnerTube 経由で 1 ページ分を返す: {"comments": [...], "next_cursor": ...}"""
+    try:
+        page = await _innertube_page(video_id, cursor)
+        return JSONResponse(content=page)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"/comments (innertube) error: {e}")
+        raise HTTPException(500, "comments extraction failed")
@@ -6,7 +6,8 @@ from typing import List, Optional
 from fastapi import APIRouter, Query, HTTPException
 from fastapi.responses import FileResponse, JSONResponse
 
-import yt_dlp
+from routers.extraction_pool import download_pool
+from routers.ytdlp_handler import ydl_pool
 
 router = APIRouter()
 
@@ -30,13 +31,13 @@ async def ytdl_download(url: str) -> Path:
     }
 
     def run_sync():
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with ydl_pool.checkout(ydl_opts) as ydl:
             info = ydl.extract_info(url)
             filename = ydl.prepare_filename(info)
             return Path(filename)
 
-    loop = asyncio.get_event_loop()
-    path = await loop.run_in_executor(None, run_sync)
+    # ダウンロードは長時間かかるため、抽出とは別のタイムアウトなしのプールに載せる
+    path = await download_pool.run(run_sync)
     return path
 
 
@@ -1,18 +1,26 @@
 import re
 import logging
+from contextvars import ContextVar
 from urllib.parse import urlparse, parse_qs, urlunparse, urlencode, quote
 
 from fastapi import APIRouter, Request, Query, HTTPException
 from fastapi.responses import JSONResponse
-from aiocache import cached, SimpleMemoryCache
+from routers.cache_backend import shared_cached
 
 import config
-from routers.ytdlp_handler import run_ydl
-from routers.extractor_util import get_stream_infos
+from routers.extractor_util import extract_video
+from routers.singleflight import inflight
+from routers.extraction_pool import extraction_pool
+from routers.metrics import CACHE_LOOKUPS
+from routers.tracing import span
+from routers import proxy_tokens
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# extract_cached の本体が走った（= キャッシュミス）かどうか
+_cache_missed: ContextVar[bool] = ContextVar("extract_cache_missed", default=False)
+
 def normalize_youtube_url(url: str) -> str:
     """
     YouTube動画URLからv=動画IDだけを残した正規URLに変換
@@ -44,39 +52,28 @@ def normalize_youtube_url(url: str) -> str:
         logger.error(f"URL正規化失敗: {e}")
         raise
 
-@cached(
+# キーは正規化後の URL（youtu.be / embed / 余分なクエリ違いで同じ動画を別々に抽出しない。
+# /batch-extract の peek も同じキーを引く）
+@shared_cached(
     ttl=600,
-    cache=SimpleMemoryCache,
-    key_builder=lambda f, request, url: f"extract:{url}"
+    key_builder=lambda f, request, url: f"extract:{normalize_youtube_url(url)}",
+    expiry_aware=True,
+    swr=True,
 )
 async def extract_cached(request: Request, url: str):
+    _cache_missed.set(True)
     normalized_url = normalize_youtube_url(url)
     if not re.match(config.REGEX_PATTERNS["url_validation"], normalized_url):
         raise HTTPException(
             400, config.RESPONSE_SETTINGS["error_messages"]["invalid_url"])
 
-    # yt-dlpは同期コードなのでto_threadで非同期化
-    import asyncio
-    info = await asyncio.to_thread(run_ydl, normalized_url, {"skip_download": True, "quiet": True})
-
-    meta = {
-        "title":       info.get("title", "unknown"),
-        "description": info.get("description"),
-        "channel": {
-            "name": info.get("uploader"),
-            "id":   info.get("channel_id"),
-            "url":  info.get("channel_url")
-                     or (f"https://www.youtube.com/channel/{info.get('channel_id')}"
-                        if info.get("channel_id") else None)
-        },
-        "view_count":  info.get("view_count"),
-        "like_count":  info.get("like_count"),
-        "upload_date": info.get("upload_date"),
-        "duration":    info.get("duration"),
-        "thumbnail":   info.get("thumbnail"),
-    }
-
-    streams = await asyncio.to_thread(get_stream_infos, normalized_url)
+    # yt-dlpは同期コードなので専用プールで実行（抽出は 1 回のみ）
+    # 同一動画への同時ミスは single-flight で 1 本にまとめる
+    with span("extract"):
+        meta, streams = await inflight.do(
+            f"extract:{normalized_url}",
+            lambda: extraction_pool.run(extract_video, normalized_url),
+        )
     if not streams:
         raise HTTPException(
             404, config.RESPONSE_SETTINGS["error_messages"]["extraction_failed"])
@@ -100,7 +97,10 @@ async def extract(
     """
     logger.info(f"[extract] request(original): {url}")
     try:
-        meta, streams, normalized_url = await extract_cached(request, url)
+        _cache_missed.set(False)
+        with span("cache"):
+            meta, streams, normalized_url = await extract_cached(request, url)
+        CACHE_LOOKUPS.inc(cache="extract", result="miss" if _cache_missed.get() else "hit")
         logger.info(f"[extract] request(normalized): {normalized_url}")
 
         # プロキシURL書き換え
@@ -109,8 +109,16 @@ async def extract(
         # safe_charsがconfigに存在しない場合は空文字列をデフォルトに
         safe_chars = config.PROXY_SETTINGS.get("url_safe_chars", "")
 
-        for s in streams:
-            s["url"] = proxy_base + quote(s["url"], safe=safe_chars)
+        # キャッシュ上の streams を書き換えないようコピーして返す
+        with span("rewrite"):
+            if proxy_tokens.enabled():
+                token = proxy_base + await proxy_tokens.register([s["url"] for s in streams])
+                streams = [{**s, "url": f"{token}{i}"} for i, s in enumerate(streams)]
+            else:
+                streams = [
+                    {**s, "url": proxy_base + quote(s["url"], safe=safe_chars)}
+                    for s in streams
+                ]
 
         return JSONResponse({"meta": meta, "streams": streams}, media_type="application/json")
 
@@ -0,0 +1,229 @@
+# routers/extraction_pool.py
+import sys
+import asyncio
+import functools
+import logging
+import contextvars
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict
+
+from fastapi import HTTPException
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT = object()
+
+
+def process_safe(fn: Callable) -> Callable:
+    """
+    プロセスプールに送ってよい関数の印。
+    モジュールトップレベルで定義され、引数と戻り値が pickle 可能で小さいこと。
+    """
+    fn.process_safe = True
+    return fn
+
+
+_child_running = None  # ワーカープロセス内: 親と共有する実行中ジョブ数
+
+
+def _worker_init(log_level: int, log_format: str, running=None) -> None:
+    """抽出ワーカープロセスの初期化（YoutubeDL を先に読み込んでおく）"""
+    global _child_running
+    _child_running = running
+    logging.basicConfig(level=log_level, format=log_format)
+    import routers.ytdlp_handler  # noqa: F401
+
+
+def _counted_call(fn: Callable, args, kwargs):
+    """ワーカープロセス側で fn を実行し、その間だけ共有カウンタを上げる"""
+    if _child_running is None:
+        return fn(*args, **kwargs)
+    with _child_running.get_lock():
+        _child_running.value += 1
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        with _child_running.get_lock():
+            _child_running.value -= 1
+
+
+def _ping() -> bool:
+    return True
+
+
+class _Job:
+    __slots__ = ("abandoned",)
+
+    def __init__(self):
+        self.abandoned = False
+
+
+class ExtractionExecutor:
+    """
+    yt-dlp 等のブロッキング処理専用のスレッドプール。
+
+    - 同時実行数は workers、待ち行列は queue_size までで、溢れたら 503 を返す
+    - ジョブごとにタイムアウト（504）。開始前にタイムアウトしたジョブは実行しない
+    - 実行中スレッドは止められないため、枠は実際に終了した時点で返却する
+    - mode="process" のときは process_safe な関数を常駐ワーカープロセスで実行する
+      （各プロセス内でも ydl_pool により YoutubeDL が温まったまま再利用される）
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout: float | None,
+                 mode: str = "thread", processes: int = 2, name: str = "ytdlp"):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.mode = mode
+        self.processes = processes
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._process_pool: ProcessPoolExecutor | None = None
+        # プロセスプールのジョブは _call を通らないので、実行中の数は子プロセスに数えてもらう
+        self._process_running = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    # ── プロセスプール ──────────────────────
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            # asyncio / スレッドを抱えた親を fork しないよう forkserver / spawn を使う
+            method = "forkserver" if sys.platform.startswith("linux") else "spawn"
+            ctx = multiprocessing.get_context(method)
+            self._process_running = ctx.Value("i", 0)
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=ctx,
+                initializer=_worker_init,
+                initargs=(config.LOGGING_SETTINGS["level"], config.LOGGING_SETTINGS["format"],
+                          self._process_running),
+            )
+            logger.info(f"extraction process pool started ({self.processes} processes)")
+        return self._process_pool
+
+    async def start(self) -> None:
+        """process モードならワーカーを先に起動しておく（初回リクエストの遅延回避）"""
+        if self.mode != "process":
+            return
+        pool = self._get_process_pool()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(pool, _ping) for _ in range(self.processes)))
+
+    def _release(self, cfut) -> None:
+        with self._lock:
+            self._pending -= 1
+            if cfut.cancelled():
+                return
+            if cfut.exception() is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def _call(self, job: _Job, fn: Callable, args, kwargs):
+        with self._lock:
+            if job.abandoned:
+                self._pending -= 1
+                return None
+            self._running += 1
+        try:
+            result = fn(*args, **kwargs)
+            with self._lock:
+                self.completed += 1
+            return result
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+
+    async def run(self, fn: Callable, *args, timeout: Any = _DEFAULT, **kwargs):
+        """fn(*args, **kwargs) をプールで実行して結果を返す"""
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                self.rejected += 1
+                logger.warning(f"{self.name} queue full ({self._pending} pending); shedding")
+                raise HTTPException(503, "extraction queue full", headers={"Retry-After": "5"})
+            self._pending += 1
+
+        job = _Job()
+        cfut = None
+        try:
+            if self.mode == "process" and getattr(fn, "process_safe", False):
+                # 結果（小さな dict / list）だけがプロセス境界を越える
+                cfut = self._get_process_pool().submit(_counted_call, fn, args, kwargs)
+                cfut.add_done_callback(self._release)
+                fut = asyncio.wrap_future(cfut)
+            else:
+                ctx = contextvars.copy_context()
+                call = functools.partial(ctx.run, self._call, job, fn, args, kwargs)
+                fut = asyncio.get_running_loop().run_in_executor(self._pool, call)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+        timeout = self.timeout if timeout is _DEFAULT else timeout
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                job.abandoned = True
+                self.timeouts += 1
+            if cfut is not None:
+                cfut.cancel()  # 未開始なら取り消せる
+            # 結果は捨てるが、例外が未回収のまま残らないようにする
+            fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+            logger.warning(f"extraction timed out after {timeout}s: {getattr(fn, '__name__', fn)}")
+            raise HTTPException(504, "extraction timed out")
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            running = self._running
+            if self._process_running is not None:
+                running += self._process_running.value
+            return {
+                "mode": self.mode,
+                "workers": self.workers,
+                "running": running,
+                "queued": self._pending - running,
+                "queue_size": self.queue_size,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+
+extraction_pool = ExtractionExecutor(
+    workers=config.YTDLP_POOL_SETTINGS["workers"],
+    queue_size=config.YTDLP_POOL_SETTINGS["queue_size"],
+    timeout=config.YTDLP_POOL_SETTINGS["timeout"] or None,
+    mode=config.YTDLP_POOL_SETTINGS["mode"].lower(),
+    processes=config.YTDLP_POOL_SETTINGS["processes"],
+)
+
+# /download 専用。長時間のダウンロードが抽出ワーカーを塞がないよう別枠にする
+download_pool = ExtractionExecutor(
+    workers=config.YTDLP_POOL_SETTINGS["download_workers"],
+    queue_size=config.YTDLP_POOL_SETTINGS["download_queue_size"],
+    timeout=None,
+    name="ytdlp-download",
+)
@@ -1,8 +1,10 @@
 # extractor.py
 
-from yt_dlp import YoutubeDL
 import config
 import logging
+from routers.ytdlp_handler import run_ydl
+from routers.tracing import span
+from routers.extraction_pool import process_safe
 
 # ログ設定
 logger = logging.getLogger(__name__)
@@ -11,8 +13,31 @@ logging.basicConfig(
     format=config.LOGGING_SETTINGS["format"]
 )
 
-def get_stream_infos(page_url: str) -> list[dict]:
+def build_meta(info: dict) -> dict:
+    """
+    yt-dlp の info dict から /extract の meta ブロックを組み立てる
+    """
+    return {
+        "title":       info.get("title", "unknown"),
+        "description": info.get("description"),
+        "channel": {
+            "name": info.get("uploader"),
+            "id":   info.get("channel_id"),
+            "url":  info.get("channel_url")
+                     or (f"https://www.youtube.com/channel/{info.get('channel_id')}"
+                        if info.get("channel_id") else None)
+        },
+        "view_count":  info.get("view_count"),
+        "like_count":  info.get("like_count"),
+        "upload_date": info.get("upload_date"),
+        "duration":    info.get("duration"),
+        "thumbnail":   info.get("thumbnail"),
+    }
+
+def build_streams(info: dict) -> list[dict]:
     """
+    yt-dlp の info dict からストリーム一覧を組み立てる（再抽出はしない）
+
     戻り値:
         [
           {
@@ -23,81 +48,110 @@ def get_stream_infos(page_url: str) -> list[dict]:
           …
         ]
     """
-    logger.info(f"Extracting stream info from: {page_url}")
-    
-    # 設定から yt-dlp オプションを取得
-    ydl_opts = config.YTDLP_OPTIONS.copy()
-    
     streams: list[dict] = []
+    if not info:
+        return streams
+
+    supported_protocols = config.STREAM_EXTRACTION["supported_protocols"]
+    m3u8_check = config.STREAM_EXTRACTION["m3u8_check_string"]
+    video_codec_none = config.STREAM_EXTRACTION["video_codec_none"]
+    max_streams = config.STREAM_EXTRACTION["max_streams"]
+
+    formats = info.get("formats") or []
+    logger.debug(f"Found {len(formats)} formats")
+
+    for f in formats:
+        # m3u8 が絡むフォーマットのみ
+        protocol_check = f.get("protocol") not in supported_protocols
+        url_check = m3u8_check not in (f.get("url") or "")
+
+        if protocol_check and url_check:
+            continue
+
+        # 種別判定
+        stream_type = "audio" if f.get("vcodec") == video_codec_none else "video"
+
+        # 画質／音質ラベル
+        if stream_type == "video":
+            # 例: 1920x1080 → 1080p
+            unknown_label = config.STREAM_EXTRACTION["unknown_height_label"]
+            res = f.get("resolution") or f"{f.get('height', unknown_label)}p"
+            quality = res
+        else:
+            # 例: 128k, 50k …
+            abr = f.get("abr")
+            prefix = config.STREAM_EXTRACTION["audio_quality_prefix"]
+            quality = f"{prefix}-{int(abr)}k" if abr else prefix
+
+        # m3u8 URL は url / manifest_url のどちらかにある
+        m3u8_url = f.get("manifest_url") or f.get("url")
+        if not m3u8_url:
+            continue
+
+        streams.append({
+            "type": stream_type,
+            "quality": quality,
+            "url": m3u8_url
+        })
 
+        # 最大ストリーム数制限
+        if len(streams) >= max_streams:
+            logger.warning(f"Reached maximum stream limit ({max_streams})")
+            break
+
+    # YouTube ライブ等、info["url"] 自体が m3u8 のケース
+    top_url = info.get("url")
+    if isinstance(top_url, str) and m3u8_check in top_url:
+        default_quality = config.STREAM_EXTRACTION["default_video_quality"]
+        streams.append({
+            "type": "video",
+            "quality": default_quality,
+            "url": top_url
+        })
+
+    logger.info(f"Extracted {len(streams)} streams")
+    return streams
+
+@process_safe
+def extract_video(page_url: str) -> tuple[dict, list[dict]]:
+    """
+    yt-dlp を 1 回だけ実行し、(meta, streams) をまとめて返す
+    """
+    logger.info(f"Extracting video info from: {page_url}")
+    with span("ydl"):
+        info = run_ydl(page_url, {"skip_download": True, "quiet": True})
+    if not info:
+        logger.error("Failed to extract info from URL")
+        return {}, []
+    with span("streams"):
+        return build_meta(info), build_streams(info)
+
+@process_safe
+def extract_hls_manifest(page_url: str) -> str | None:
+    """
+    最初に見つかった HLS マニフェスト (.m3u8) URL だけを返す（/stream-direct 用）
+    """
+    info = run_ydl(page_url, {
+        "skip_download": True,
+        "quiet": True,
+        "allow_unplayable_formats": True
+    })
+    m3u8_check = config.STREAM_EXTRACTION["m3u8_check_string"]
+    for fmt in (info or {}).get("formats", []):
+        m3u8_url = fmt.get("url") or ""
+        if m3u8_check in m3u8_url:
+            return m3u8_url
+    return None
+
+@process_safe
+def get_stream_infos(page_url: str) -> list[dict]:
+    """
+    ストリーム一覧のみを返す（/batch-extract 等の旧呼び出し用）
+    """
+    logger.info(f"Extracting stream info from: {page_url}")
     try:
-        with YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(page_url, download=False)
-
-            if not info:
-                logger.error("Failed to extract info from URL")
-                return streams
-
-            formats = info.get("formats", [])
-            logger.debug(f"Found {len(formats)} formats")
-
-            for f in formats:
-                # m3u8 が絡むフォーマットのみ
-                supported_protocols = config.STREAM_EXTRACTION["supported_protocols"]
-                m3u8_check = config.STREAM_EXTRACTION["m3u8_check_string"]
-                
-                protocol_check = f.get("protocol") not in supported_protocols
-                url_check = m3u8_check not in (f.get("url") or "")
-                
-                if protocol_check and url_check:
-                    continue
-
-                # 種別判定
-                video_codec_none = config.STREAM_EXTRACTION["video_codec_none"]
-                stream_type = "audio" if f.get("vcodec") == video_codec_none else "video"
-
-                # 画質／音質ラベル
-                if stream_type == "video":
-                    # 例: 1920x1080 → 1080p
-                    unknown_label = config.STREAM_EXTRACTION["unknown_height_label"]
-                    res = f.get("resolution") or f"{f.get('height', unknown_label)}p"
-                    quality = res
-                else:
-                    # 例: 128k, 50k …
-                    abr = f.get("abr")
-                    prefix = config.STREAM_EXTRACTION["audio_quality_prefix"]
-                    quality = f"{prefix}-{int(abr)}k" if abr else prefix
-
-                # m3u8 URL は url / manifest_url のどちらかにある
-                m3u8_url = f.get("manifest_url") or f.get("url")
-                if not m3u8_url:
-                    continue
-
-                streams.append({
-                    "type": stream_type, 
-                    "quality": quality, 
-                    "url": m3u8_url
-                })
-
-                # 最大ストリーム数制限
-                max_streams = config.STREAM_EXTRACTION["max_streams"]
-                if len(streams) >= max_streams:
-                    logger.warning(f"Reached maximum stream limit ({max_streams})")
-                    break
-
-            # YouTube ライブ等、info["url"] 自体が m3u8 のケース
-            top_url = info.get("url")
-            if isinstance(top_url, str) and m3u8_check in top_url:
-                default_quality = config.STREAM_EXTRACTION["default_video_quality"]
-                streams.append({
-                    "type": "video", 
-                    "quality": default_quality, 
-                    "url": top_url
-                })
-
-            logger.info(f"Extracted {len(streams)} streams")
-            
+        _, streams = extract_video(page_url)
     except Exception as e:
         logger.error(f"Error extracting streams: {str(e)}")
-        
-    return streams
\ No newline at end of file
+        return []
+    return streams
@@ -5,6 +5,13 @@ from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
 import config
+from routers.segment_cache import segment_cache
+from routers.m3u8_rewriter import m3u8_templates
+from routers.singleflight import inflight
+from routers.prefetcher import prefetcher
+from routers.extraction_pool import extraction_pool, download_pool
+from routers.ytdlp_handler import ydl_pool
+from routers.browser_pool import browser_pool
 
 try:
     import psutil
@@ -54,6 +61,14 @@ def health_check():
         "process": _process_info(),
         "insecure_flags": _insecure_flags(),
         "cache_backend": backend,
+        "segment_cache": segment_cache.stats(),
+        "m3u8_templates": m3u8_templates.stats(),
+        "single_flight": inflight.stats(),
+        "prefetch": prefetcher.stats(),
+        "extraction_pool": extraction_pool.stats(),
+        "download_pool": download_pool.stats(),
+        "ydl_instances": ydl_pool.stats(),
+        "browser_pool": browser_pool.stats(),
     }
 
     # jsonable_encoder で全てシリアライズ可能な型に変換
@@ -0,0 +1,101 @@
+# routers/http_client.py
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 は h2 が入っている場合のみ有効化（httpx[http2]）
+try:
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+http_limits = httpx.Limits(max_connections=config.HTTP_SETTINGS["max_connections"],
+                           max_keepalive_connections=config.HTTP_SETTINGS["max_keepalive_connections"],
+                           keepalive_expiry=config.HTTP_SETTINGS["keepalive_expiry"])
+
+_client: httpx.AsyncClient | None = None
+_host_slots: dict[str, asyncio.Semaphore] = {}
+
+
+def _new_client() -> httpx.AsyncClient:
+    http2 = config.HTTP_SETTINGS["http2"] and _HTTP2_AVAILABLE
+    if config.HTTP_SETTINGS["http2"] and not _HTTP2_AVAILABLE:
+        logger.warning("HTTP2=True but 'h2' is not installed; falling back to HTTP/1.1")
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=http_limits,
+        timeout=config.HTTP_SETTINGS["timeout"],
+        follow_redirects=True,
+        max_redirects=config.PROXY_SETTINGS["max_redirects"],
+    )
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """lifespan 開始時に共有クライアントを生成"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _new_client()
+        logger.info("shared http client started")
+    return _client
+
+
+async def close_http_client() -> None:
+    """lifespan 終了時に共有クライアントを破棄"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("shared http client closed")
+    _client = None
+    _host_slots.clear()
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    アプリ共通の httpx.AsyncClient を返す。
+    lifespan 外（スクリプト等）から呼ばれた場合は遅延生成する。
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _new_client()
+    return _client
+
+
+@asynccontextmanager
+async def host_slot(url: str):
+    """
+    ホスト単位の同時リクエスト開始数の制限。
+    レスポンスヘッダを受け取るまでの区間だけで使い、本文の転送中は持たない
+    （転送中の接続数は httpx の Limits が抑える。遅いクライアントへの中継が
+    同じホストへのプレイリスト取得などを止めないようにするため）。
+    """
+    host = urlsplit(url).netloc
+    sem = _host_slots.get(host)
+    if sem is None:
+        sem = _host_slots[host] = asyncio.Semaphore(config.HTTP_SETTINGS["max_connections_per_host"])
+    async with sem:
+        yield
+
+
+async def send(method: str, url: str, *, stream: bool = False, **kwargs) -> httpx.Response:
+    """
+    host_slot を取ってリクエストを開始し、ヘッダ受信後に枠を返す。
+    stream=False なら本文を読み切って返す。stream=True なら呼び出し側で読み、aclose() する。
+    """
+    client = get_client()
+    request = client.build_request(method, url, **kwargs)
+    async with host_slot(url):
+        r = await client.send(request, stream=True)
+    if not stream:
+        try:
+            await r.aread()
+        finally:
+            await r.aclose()
+    return r
@@ -0,0 +1,52 @@
+# routers/initial_data.py
+"""
+watch / channel ページの HTML から埋め込み JSON (ytInitialData, ytcfg) を取り出す。
+
+正規表現の非貪欲マッチは数 MB の HTML でバックトラックが重くなるため、
+str.find でマーカー位置まで線形に進め、そこから JSONDecoder.raw_decode で
+オブジェクト 1 個分だけデコードする。
+"""
+import json
+from typing import Optional
+
+_decoder = json.JSONDecoder()
+
+INITIAL_DATA_MARKERS = ("var ytInitialData", 'window["ytInitialData"]', "ytInitialData")
+
+
+def _decode_after(html: str, marker: str, sep: str) -> Optional[dict]:
+    """marker の後ろの sep を越えた最初の '{' から JSON オブジェクトをデコード"""
+    start = 0
+    while True:
+        pos = html.find(marker, start)
+        if pos < 0:
+            return None
+        i = html.find(sep, pos + len(marker))
+        if i < 0:
+            return None
+        j = i + len(sep)
+        # 空白だけを読み飛ばす（それ以外なら別の出現位置を探す）
+        while j < len(html) and html[j] in " \t\r\n":
+            j += 1
+        if j < len(html) and html[j] == "{":
+            try:
+                obj, _ = _decoder.raw_decode(html, j)
+                if isinstance(obj, dict):
+                    return obj
+            except ValueError:
+                pass
+        start = pos + len(marker)
+
+
+def find_initial_data(html: str) -> Optional[dict]:
+    """HTML から ytInitialData を取り出す。見つからなければ None"""
+    for marker in INITIAL_DATA_MARKERS:
+        data = _decode_after(html, marker, "=")
+        if data is not None:
+            return data
+    return None
+
+
+def find_ytcfg(html: str) -> Optional[dict]:
+    """HTML から ytcfg.set({...}) の引数を取り出す。見つからなければ None"""
+    return _decode_after(html, "ytcfg.set", "(")
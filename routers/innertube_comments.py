@@ -0,0 +1,167 @@
+# routers/innertube_comments.py
+"""
+ブラウザを使わないコメント取得エンジン。
+
+watch ページの ytInitialData からコメント欄の continuation token を取り出し、
+以降は InnerTube の /youtubei/v1/next に JSON で問い合わせてページングする。
+"""
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+import config
+from routers.http_client import send
+from routers.initial_data import find_initial_data, find_ytcfg
+
+logger = logging.getLogger(__name__)
+
+# ytcfg が取れなかった場合の既定クライアント
+_DEFAULT_CONTEXT = {"client": {"clientName": "WEB", "clientVersion": "2.20250101.00.00",
+                               "hl": "ja", "gl": "JP"}}
+
+# 最後に観測した InnerTube 設定（カーソルだけで次ページを取るときに使う）
+_innertube_cfg: Dict[str, Any] = {"key": None, "context": _DEFAULT_CONTEXT}
+
+
+def _base_url() -> str:
+    return config.COMMENTS_SETTINGS["youtube_base_url"].rstrip("/")
+
+
+def _walk(node: Any) -> Iterator[dict]:
+    """JSON ツリー内の dict を深さ優先で列挙"""
+    stack = [node]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, dict):
+            yield cur
+            stack.extend(cur.values())
+        elif isinstance(cur, list):
+            stack.extend(reversed(cur))
+
+
+def _continuation_token(node: Any) -> Optional[str]:
+    for d in _walk(node):
+        cmd = d.get("continuationCommand")
+        if isinstance(cmd, dict) and cmd.get("token"):
+            return cmd["token"]
+    return None
+
+
+def find_comments_token(initial_data: dict) -> Optional[str]:
+    """ytInitialData からコメント欄の最初の continuation token を探す"""
+    for d in _walk(initial_data):
+        section = d.get("itemSectionRenderer")
+        if isinstance(section, dict) and section.get("sectionIdentifier") == "comment-item-section":
+            return _continuation_token(section)
+    return None
+
+
+def _text(obj: Optional[dict]) -> str:
+    if not obj:
+        return ""
+    if "simpleText" in obj:
+        return obj["simpleText"]
+    return "".join(r.get("text", "") for r in obj.get("runs", []))
+
+
+def parse_comments_page(data: dict) -> Tuple[List[Dict], Optional[str]]:
+    """
+    /next のレスポンスからコメントと次ページの token を取り出す。
+    旧形式 (commentRenderer) と新形式 (commentViewModel + entity mutations) の両方に対応。
+    """
+    entities: Dict[str, dict] = {}
+    mutations = (data.get("frameworkUpdates", {})
+                 .get("entityBatchUpdate", {})
+                 .get("mutations", []))
+    for m in mutations:
+        payload = m.get("payload", {}).get("commentEntityPayload")
+        if payload:
+            entities[payload.get("key") or m.get("entityKey")] = payload
+
+    items: List[dict] = []
+    for ep in data.get("onResponseReceivedEndpoints", []):
+        for action_name in ("reloadContinuationItemsCommand", "appendContinuationItemsAction"):
+            action = ep.get(action_name)
+            if action:
+                items.extend(action.get("continuationItems", []))
+
+    comments: List[Dict] = []
+    next_token = None
+    for item in items:
+        if "continuationItemRenderer" in item:
+            next_token = _continuation_token(item["continuationItemRenderer"])
+            continue
+        thread = item.get("commentThreadRenderer")
+        if not thread:
+            continue
+        old = thread.get("comment", {}).get("commentRenderer")
+        if old:
+            thumbs = old.get("authorThumbnail", {}).get("thumbnails") or [{}]
+            comments.append({
+                "user": _text(old.get("authorText")),
+                "icon": thumbs[-1].get("url"),
+                "comment": _text(old.get("contentText")),
+                "is_reply": False,
+            })
+            continue
+        view = thread.get("commentViewModel", {}).get("commentViewModel", {})
+        payload = entities.get(view.get("commentKey"))
+        if payload:
+            props = payload.get("properties", {})
+            author = payload.get("author", {})
+            comments.append({
+                "user": author.get("displayName", ""),
+                "icon": author.get("avatarThumbnailUrl"),
+                "comment": props.get("content", {}).get("content", ""),
+                "is_reply": False,
+            })
+    return comments, next_token
+
+
+async def _get(url: str, **kwargs):
+    return await send("GET", url, **kwargs)
+
+
+async def _post(url: str, **kwargs):
+    return await send("POST", url, **kwargs)
+
+
+async def _first_token(video_id: str) -> str:
+    url = f"{_base_url()}/watch?v={video_id}"
+    r = await _get(url, headers={"Accept-Language": "ja-JP,ja;q=0.9,en;q=0.8"},
+                   cookies={"CONSENT": "YES+1"})
+    if r.status_code != 200:
+        raise HTTPException(r.status_code, "upstream error")
+    html = r.text
+
+    cfg = find_ytcfg(html)
+    if cfg and cfg.get("INNERTUBE_CONTEXT"):
+        _innertube_cfg["key"] = cfg.get("INNERTUBE_API_KEY")
+        _innertube_cfg["context"] = cfg["INNERTUBE_CONTEXT"]
+
+    initial_data = find_initial_data(html)
+    if initial_data is None:
+        raise HTTPException(500, "parse error")
+    token = find_comments_token(initial_data)
+    if not token:
+        raise HTTPException(404, "comments not available")
+    return token
+
+
+async def fetch_comments_page(video_id: str, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    コメント 1 ページ分を返す。cursor 省略時は先頭ページ。
+    戻り値: {"comments": [...], "next_cursor": "..." | None}
+    """
+    token = cursor or await _first_token(video_id)
+    url = f"{_base_url()}/youtubei/v1/next"
+    params = {"prettyPrint": "false"}
+    if _innertube_cfg["key"]:
+        params["key"] = _innertube_cfg["key"]
+    r = await _post(url, params=params,
+                    json={"context": _innertube_cfg["context"], "continuation": token})
+    if r.status_code != 200:
+        raise HTTPException(r.status_code, "upstream error")
+    comments, next_token = parse_comments_page(r.json())
+    return {"comments": comments, "next_cursor": next_token}
@@ -0,0 +1,341 @@
+# routers/m3u8_rewriter.py
+"""
+m3u8 書き換えエンジン。
+
+上流の生プレイリストを一度だけ「テンプレート」にコンパイルし、
+プロキシのベース URL（= アクセスされたホスト名）ごとに
+文字列 join だけでレンダリングする。
+
+コンパイル時もベース URL の分解は 1 回だけ行い、quote は共通プレフィックスと
+URI の「形」（数字列を伏せたもの）ごとに 1 回で済ませる。
+
+PROXY_TOKENS_ENABLED=true のときは URL を埋め込まず、プレイリスト内の URL 一覧を
+1 グループとして登録し、各スロットには短いトークン（共通部分 + 添字）を入れる。
+"""
+import re
+import logging
+from collections import OrderedDict
+from urllib.parse import urljoin, quote
+
+import config
+from routers.tracing import span
+from routers import proxy_tokens
+
+logger = logging.getLogger(__name__)
+
+URI_RE = re.compile(config.REGEX_PATTERNS["uri_pattern"])
+TARGET_DURATION_RE = re.compile(r"^#EXT-X-TARGETDURATION:\s*(\d+(?:\.\d+)?)", re.M)
+PLAYLIST_TYPE_RE = re.compile(r"^#EXT-X-PLAYLIST-TYPE:\s*(\w+)", re.M)
+EXT_X_START = "#EXT-X-START:TIME-OFFSET=0,PRECISE=YES"
+
+
+class M3U8Template:
+    """
+    コンパイル済みプレイリスト。
+    parts を proxy_base (+ slot_prefix) で join すると書き換え後の本文になる。
+    トークン方式では urls / group にスロット順の上流 URL 一覧とそのグループ ID を持つ。
+    token_ttl はそのグループの TTL 上限（ライブのメディアプレイリストのみ。それ以外は None）。
+    nbytes はキャッシュの容量計算用の概算（本文・parts・URL 一覧・レンダリング済み本文の文字数）。
+    """
+
+    __slots__ = ("source", "parts", "segments", "urls", "group", "slot_prefix", "token_ttl",
+                 "_variants", "_max_variants", "_base_bytes", "_variant_bytes")
+
+    def __init__(self, source: str, parts: list[str], segments: list[str], max_variants: int,
+                 urls: list[str] | None = None):
+        self.source = source
+        self.parts = parts
+        self.segments = segments
+        self.urls = urls
+        self.group = proxy_tokens.group_id(urls) if urls is not None else None
+        self.slot_prefix = proxy_tokens.token_prefix(self.group) if urls is not None else ""
+        self.token_ttl = live_token_ttl(source) if urls is not None else None
+        self._variants: "OrderedDict[str, str]" = OrderedDict()
+        self._max_variants = max_variants
+        # トークン方式では segments は urls と同じ文字列を指すので二重に数えない
+        self._base_bytes = len(source) + sum(map(len, parts)) \
+            + sum(map(len, urls if urls is not None else segments))
+        self._variant_bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._base_bytes + self._variant_bytes
+
+    def render(self, proxy_base: str) -> str:
+        body = self._variants.get(proxy_base)
+        if body is None:
+            body = (proxy_base + self.slot_prefix).join(self.parts)
+            self._variants[proxy_base] = body
+            self._variant_bytes += len(body)
+            if len(self._variants) > self._max_variants:
+                _, old = self._variants.popitem(last=False)
+                self._variant_bytes -= len(old)
+        else:
+            self._variants.move_to_end(proxy_base)
+        return body
+
+
+class _BaseResolver:
+    """
+    プレイリスト URL を一度だけ分解し、URI を (プレフィックス, 残り) に解決する。
+    空白・空セグメント・ドットセグメント・フラグメントを含まない素直な形だけ
+    urljoin を呼ばずに連結し、それ以外は urljoin に任せる（結果は常に urljoin と同じ）。
+    """
+
+    __slots__ = ("base_url", "origin", "directory", "fast")
+
+    _ABSOLUTE = re.compile(r"https?://[A-Za-z0-9.:@_~%-]+(?:/[^\x00-\x20?#;]*)*(?:\?[^\x00-\x20#]+)?")
+    _RELATIVE = re.compile(r"/?[^\x00-\x20/?#;:.][^\x00-\x20/?#;:]*"
+                           r"(?:/[^\x00-\x20/?#;:.][^\x00-\x20/?#;:]*)*(?:\?[^\x00-\x20#]+)?")
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        path = base_url.split("#", 1)[0].split("?", 1)[0]
+        host_end = path.find("/", path.find("://") + 3)
+        self.origin = path if host_end < 0 else path[:host_end]
+        self.directory = path[:path.rfind("/") + 1] if host_end >= 0 else path + "/"
+        # ベース側に空セグメントやドットセグメントがあると urljoin が正規化するので、
+        # 連結結果が urljoin と一致するベースでだけ高速経路を使う
+        try:
+            self.fast = base_url.startswith(("https://", "http://")) \
+                and urljoin(base_url, "x") == self.directory + "x" \
+                and urljoin(base_url, "/x") == self.origin + "/x"
+        except ValueError:
+            self.fast = False
+
+    def __call__(self, uri: str) -> tuple[str, str]:
+        if uri.startswith("http") and self._ABSOLUTE.fullmatch(uri):
+            return "", uri
+        if self.fast and self._RELATIVE.fullmatch(uri):
+            return (self.origin if uri[0] == "/" else self.directory), uri
+        return "", urljoin(self.base_url, uri)
+
+
+class _Quoter:
+    """
+    quote() の結果を使い回す。quote は 1 文字ずつの変換なので、
+    "/" で区切った断片ごとに quote して繋いでも結果は変わらない。
+
+    - 断片ごとにメモ化する（署名付きの長い絶対 URL は大半の断片が全セグメント共通）
+    - 初出の断片は数字列を伏せた「形」ごとにメモ化する（seg123.ts?sq=123 のような連番）
+    """
+
+    _DIGITS = re.compile(r"([0-9]+)")
+    _HOLE = "\x01"
+
+    def __init__(self, safe: str):
+        self.safe = safe
+        self.slash = quote("/", safe=safe)
+        # "%" や穴の文字を safe にすると穴埋め位置が区別できないので素直に quote する
+        self.shaped = "%" not in safe and self._HOLE not in safe
+        self._chunks: dict[str, str] = {}
+        self._shapes: dict[str, list[str]] = {}
+        self._prefixes: dict[str, str] = {}
+
+    def prefix(self, prefix: str) -> str:
+        quoted = self._prefixes.get(prefix)
+        if quoted is None:
+            quoted = self._prefixes[prefix] = quote(prefix, safe=self.safe)
+        return quoted
+
+    def __call__(self, text: str) -> str:
+        if not self.shaped or self._HOLE in text:
+            return quote(text, safe=self.safe)
+        if "/" not in text:
+            return self._quote_shape(text)
+        chunks = self._chunks
+        out = []
+        for chunk in text.split("/"):
+            quoted = chunks.get(chunk)
+            if quoted is None:
+                quoted = chunks[chunk] = self._quote_shape(chunk)
+            out.append(quoted)
+        return self.slash.join(out)
+
+    def _quote_shape(self, chunk: str) -> str:
+        pieces = self._DIGITS.split(chunk)
+        if len(pieces) == 1:
+            return quote(chunk, safe=self.safe)
+        shape = self._HOLE.join(pieces[0::2])
+        quoted = self._shapes.get(shape)
+        if quoted is None:
+            quoted = self._shapes[shape] = quote(shape, safe=self.safe).split("%01")
+        out = [quoted[0]]
+        for digits, rest in zip(pieces[1::2], quoted[1:]):
+            out.append(digits)
+            out.append(rest)
+        return "".join(out)
+
+
+def compile_m3u8(text: str, base_url: str, tokens: bool | None = None,
+                 keep_segments: bool = True) -> M3U8Template:
+    """
+    m3u8 内の URL / KEY URI をプロキシ差し込み位置付きに変換 + EXT-X-START 追加。
+    keep_segments=False ならセグメント URL 一覧（先読み用）を作らない。
+    """
+    if tokens is None:
+        tokens = proxy_tokens.enabled()
+    is_master = "#EXT-X-STREAM-INF" in text
+    resolve = _BaseResolver(base_url)
+    quoter = _Quoter(config.PROXY_SETTINGS["url_safe_chars"])
+    segments = []
+    urls: list[str] | None = [] if tokens else None
+    # parts[i] と parts[i+1] の間に proxy_base が入る。literal には直前のスロット以降の本文を貯める
+    parts: list[str] = []
+    literal: list[str] = []
+
+    def slot(uri: str, is_segment: bool) -> None:
+        prefix, rest = resolve(uri)
+        absolute = prefix + rest if urls is not None or (is_segment and keep_segments) else None
+        if is_segment and keep_segments:
+            segments.append(absolute)
+        parts.append("".join(literal))
+        literal.clear()
+        if urls is not None:
+            literal.append(str(len(urls)))
+            urls.append(absolute)
+        else:
+            literal.append(quoter.prefix(prefix) + quoter(rest) if prefix else quoter(rest))
+
+    lines = text.splitlines()
+    # EXT-X-START を挿入（存在しない場合のみ）。#EXTM3U は必ず先頭行に残す
+    if "#EXT-X-START" not in text:
+        lines.insert(1 if lines and lines[0].startswith("#EXTM3U") else 0, EXT_X_START)
+
+    last = len(lines) - 1
+    for i, line in enumerate(lines):
+        nl = "\n" if i < last else ""
+        if line.startswith("#"):
+            if 'URI="' in line:
+                pos = 0
+                for m in URI_RE.finditer(line):
+                    literal.append(line[pos:m.start()] + 'URI="')
+                    slot(m.group(1), False)
+                    literal.append('"')
+                    pos = m.end()
+                literal.append(line[pos:] + nl)
+            else:
+                literal.append(line + nl)
+        elif line.strip():
+            slot(line.strip(), not is_master)
+            literal.append(nl)
+        else:
+            literal.append(line + nl)
+    parts.append("".join(literal))
+    return M3U8Template(text, parts, segments, config.CACHE_SETTINGS["m3u8_render_variants"], urls)
+
+
+def playlist_ttl(text: str) -> int:
+    """
+    プレイリストの種類からキャッシュ TTL(秒) を決める。
+
+    - EXT-X-ENDLIST / PLAYLIST-TYPE:VOD → 以後変化しないので長め (ttl_m3u8_vod)
+    - ライブ / EVENT のメディアプレイリスト → TARGETDURATION の半分
+      （RFC 8216 でクライアントの再取得間隔は TARGETDURATION 基準）
+    - マスタープレイリスト等 → ttl_m3u8
+    """
+    settings = config.CACHE_SETTINGS
+    m = PLAYLIST_TYPE_RE.search(text)
+    playlist_type = m.group(1).upper() if m else None
+    if "#EXT-X-ENDLIST" in text or playlist_type == "VOD":
+        return settings["ttl_m3u8_vod"]
+    m = TARGET_DURATION_RE.search(text)
+    if m:
+        half = int(float(m.group(1)) / 2)
+        return max(settings["ttl_m3u8_live_min"], min(half, settings["ttl_m3u8"]))
+    return settings["ttl_m3u8"]
+
+
+def live_token_ttl(text: str) -> int | None:
+    """
+    ライブ / EVENT のメディアプレイリストなら、トークングループの TTL 上限
+    （TARGETDURATION × token_live_ttl_factor）を返す。VOD / マスターは None。
+    ライブは TARGETDURATION/2 ごとの更新で URL 一覧が変わり毎回別グループになるので、
+    プレイリストの窓より長く共有キャッシュに残しても使われない。
+    """
+    m = PLAYLIST_TYPE_RE.search(text)
+    if "#EXT-X-ENDLIST" in text or (m and m.group(1).upper() == "VOD"):
+        return None
+    m = TARGET_DURATION_RE.search(text)
+    if not m:
+        return None
+    return max(1, int(float(m.group(1)) * config.PROXY_SETTINGS["token_live_ttl_factor"]))
+
+
+def rewrite_m3u8(text: str, base_url: str, proxy_base: str) -> str:
+    """m3u8 内の URL / KEY URI をプロキシ付きに書き換え + EXT-X-START 追加"""
+    with span("rewrite"):
+        return compile_m3u8(text, base_url).render(proxy_base)
+
+
+class TemplateCache:
+    """
+    上流 URL → コンパイル済みテンプレートの LRU。
+
+    - 件数 max_entries と合計サイズ max_bytes（M3U8Template.nbytes の概算）の両方で制限
+    - 巨大な VOD プレイリストは 1 件で数十 MB になるので、max_bytes を超える単体はキャッシュしない
+    - render で増えた分は、そのテンプレートを次に get したときに計上し直す
+    - keep_segments=False（先読み無効）ならセグメント URL 一覧を持たない
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, keep_segments: bool = True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.keep_segments = keep_segments
+        self._entries: "OrderedDict[str, tuple[M3U8Template, int]]" = OrderedDict()
+        self._size = 0
+        self.evictions = 0
+
+    def get(self, url: str, text: str) -> tuple[M3U8Template, bool]:
+        """(テンプレート, 今回コンパイルしたか) を返す。本文が変わっていれば作り直す"""
+        entry = self._entries.get(url)
+        if entry is not None and entry[0].source == text:
+            tpl = entry[0]
+            self._entries.move_to_end(url)
+            self._account(url, tpl)
+            return tpl, False
+        if entry is not None:
+            self._remove(url)
+        tpl = compile_m3u8(text, url, keep_segments=self.keep_segments)
+        if tpl.nbytes <= self.max_bytes:
+            self._account(url, tpl)
+        else:
+            logger.debug(f"m3u8 template too large to cache ({tpl.nbytes} bytes): {url}")
+        return tpl, True
+
+    def _account(self, url: str, tpl: M3U8Template) -> None:
+        entry = self._entries.get(url)
+        self._size += tpl.nbytes - (entry[1] if entry is not None else 0)
+        self._entries[url] = (tpl, tpl.nbytes)
+        self._evict(keep=url)
+
+    def _remove(self, url: str) -> None:
+        _, size = self._entries.pop(url)
+        self._size -= size
+
+    def _evict(self, keep: str) -> None:
+        while (len(self._entries) > self.max_entries or self._size > self.max_bytes) \
+                and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._remove(oldest)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+m3u8_templates = TemplateCache(
+    max_entries=config.CACHE_SETTINGS["m3u8_template_cache_size"],
+    max_bytes=config.CACHE_SETTINGS["m3u8_template_max_bytes"],
+    keep_segments=config.PROXY_SETTINGS["prefetch_enabled"] and config.PROXY_SETTINGS["prefetch_segments"] > 0,
+)
@@ -0,0 +1,259 @@
+# routers/metrics.py
+"""
+Prometheus テキスト形式 (/metrics) のメトリクス。
+
+外部ライブラリは使わず、ラベル付き Counter / Gauge / Histogram を最小限で実装する。
+値の更新はプールのスレッドからも呼ばれるのでロックで保護する（辞書 1 回の更新のみ）。
+各コンポーネントの stats() はスクレイプ時に gauge として展開する。
+
+注意: YTDLP_POOL_MODE=process のとき、子プロセス内で記録された値
+（yt-dlp の所要時間など）はここには集計されない。
+"""
+import time
+import threading
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+import config
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EXTRACT_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+_registry: List["_Metric"] = []
+_stats_sources: List[Tuple[str, Callable[[], dict]]] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    TYPE = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.TYPE}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    TYPE = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    TYPE = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # ラベル毎に [バケット毎の件数..., 合計, 件数]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def time(self, **labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, row in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                le = f'le="{_num(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(row[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {row[-1]}")
+        return lines
+
+
+class _Timer:
+    """with HISTOGRAM.time(label=...) で経過秒数を記録（例外時は outcome=error）"""
+
+    def __init__(self, hist: Histogram, labels: Dict[str, str]):
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        labels = self.labels
+        if "outcome" in self.hist.labelnames:
+            labels = {**labels, "outcome": "error" if exc_type else "ok"}
+        self.hist.observe(time.perf_counter() - self.start, **labels)
+        return False
+
+
+def register_stats(component: str, source: Callable[[], dict]) -> None:
+    """stats() の数値項目を oculora_<component>_<key> の gauge として公開する"""
+    _stats_sources.append((component, source))
+
+
+# ───────────────── 計測ポイント ─────────────────
+HTTP_REQUESTS = Counter(
+    "oculora_http_requests_total", "HTTP requests by route and status",
+    ("method", "route", "status"))
+HTTP_LATENCY = Histogram(
+    "oculora_http_request_duration_seconds",
+    "Time until response headers are sent, by route", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge(
+    "oculora_http_requests_in_flight", "Requests currently being handled")
+
+YTDLP_DURATION = Histogram(
+    "oculora_ytdlp_extract_duration_seconds", "Time spent inside yt-dlp per checkout",
+    ("outcome",), buckets=EXTRACT_BUCKETS)
+
+CACHE_LOOKUPS = Counter(
+    "oculora_cache_lookups_total", "Cache lookups by cache and result",
+    ("cache", "result"))
+
+UPSTREAM_RESPONSES = Counter(
+    "oculora_upstream_responses_total", "Upstream responses seen by /proxy by status",
+    ("kind", "status"))
+PROXY_BYTES = Counter(
+    "oculora_proxy_bytes_total", "Bytes moved by /proxy (in = from upstream, out = to clients)",
+    ("direction", "kind"))
+PROXY_STREAMS = Gauge(
+    "oculora_proxy_streams_in_flight", "Upstream passthrough streams currently open")
+
+
+# ───────────────── ASGI ミドルウェア ─────────────────
+class MetricsMiddleware:
+    """
+    ルート毎のリクエスト数とレイテンシを記録する。
+    ストリーミング応答でも本文の転送時間を含めないよう、ヘッダ送出までを計測する。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                HTTP_LATENCY.observe(time.perf_counter() - start,
+                                     method=method, route=_route_of(scope))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            HTTP_REQUESTS.inc(method=method, route=_route_of(scope), status=status["code"])
+
+
+def _route_of(scope) -> str:
+    # 生のパスではなくルートのテンプレートを使う（ラベル数を抑える）
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+# ───────────────── /metrics ─────────────────
+def _stats_lines() -> List[str]:
+    lines = []
+    for component, source in _stats_sources:
+        try:
+            stats = source()
+        except Exception:
+            continue
+        for key, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"oculora_{component}_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_num(value)}")
+    return lines
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    lines.extend(_stats_lines())
+    return "\n".join(lines) + "\n"
+
+
+@router.get(config.ENDPOINTS["metrics"])
+def metrics():
+    return Response(render(), media_type=CONTENT_TYPE)
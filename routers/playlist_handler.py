@@ -1,39 +1,129 @@
 # routers/playlist_handler.py
+import json
+import asyncio
 import logging
+from itertools import islice
+from typing import Callable, List
 from fastapi import APIRouter, HTTPException, Query
-from yt_dlp import YoutubeDL
-from aiocache import cached, SimpleMemoryCache 
+from fastapi.responses import JSONResponse, StreamingResponse
+from routers.ytdlp_handler import ydl_pool
+from routers.cache_backend import shared_cached
 
 import config
+from routers.extraction_pool import extraction_pool
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+_DONE = object()
+_PAGE_TTL = 600
 
-@cached(ttl=600, cache=SimpleMemoryCache, key_builder=lambda f, playlist_url: f"pl:{playlist_url}")
-def playlist_info(
-    playlist_url: str = Query(..., description="https://www.youtube.com/playlist?list=...")
-):
+
+def _to_item(e: dict) -> dict:
+    thumbnails = e.get("thumbnails") or [{}]
+    return {
+        "id": e["id"],
+        "title": e.get("title"),
+        "duration": e.get("duration_string") or e.get("duration"),
+        "thumbnail": e.get("thumbnail") or thumbnails[-1].get("url"),
+        "url": f"https://www.youtube.com/watch?v={e['id']}"
+    }
+
+
+def _enumerate_playlist(playlist_url: str, offset: int, limit: int,
+                        emit: Callable[[dict], None]) -> None:
     """
-    プレイリスト内の各動画メタをフラット抽出して返す。
+    プレイリストを遅延列挙し、offset から limit 件だけフラットメタを emit する。
+    process=False で entries をジェネレータのまま受け取るため、
+    必要なページ分しか上流に問い合わせない。
     """
     ydl_opts = {
         "extract_flat": "in_playlist",
+        "lazy_playlist": True,
         "skip_download": True,
         "quiet": True,
     }
-    with YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(playlist_url, download=False)
+    with ydl_pool.checkout(ydl_opts) as ydl:
+        info = ydl.extract_info(playlist_url, download=False, process=False)
+        if not info or "entries" not in info:
+            raise HTTPException(404, "playlist not found")
+        for e in islice(info["entries"], offset, offset + limit):
+            if e and e.get("id"):
+                emit(_to_item(e))
 
-    if "entries" not in info:
-        raise HTTPException(404, "playlist not found")
-
-    items = [{
-        "id": e["id"],
-        "title": e.get("title"),
-        "duration": e.get("duration_string") or e.get("duration"),
-        "thumbnail": e.get("thumbnail"),
-        "url": f"https://www.youtube.com/watch?v={e['id']}"
-    } for e in info["entries"]]
 
+@shared_cached(ttl=_PAGE_TTL, key_builder=lambda f, playlist_url, offset, limit: f"pl:{playlist_url}:{offset}:{limit}")
+async def playlist_page(playlist_url: str, offset: int, limit: int) -> List[dict]:
+    """1 ページ分のフラットメタ（ページ単位でキャッシュ）"""
+    items: List[dict] = []
+    await extraction_pool.run(_enumerate_playlist, playlist_url, offset, limit, items.append)
     return items
+
+
+def _page_body(items: List[dict], offset: int, limit: int) -> dict:
+    return {
+        "offset": offset,
+        "limit": limit,
+        "items": items,
+        "next_offset": offset + len(items) if len(items) == limit else None,
+    }
+
+
+@router.get(config.ENDPOINTS["playlist_info"])
+async def playlist_info(
+    playlist_url: str = Query(..., description="https://www.youtube.com/playlist?list=..."),
+    offset: int = Query(0, ge=0, description="先頭からのスキップ件数"),
+    limit: int = Query(config.PLAYLIST_SETTINGS["page_size"], ge=1,
+                       le=config.PLAYLIST_SETTINGS["max_page_size"], description="取得件数"),
+    stream: bool = Query(False, description="true なら列挙しながら NDJSON で逐次返す"),
+):
+    """
+    プレイリスト内の各動画メタをフラット抽出して返す。
+    """
+    if not stream:
+        items = await playlist_page(playlist_url, offset, limit)
+        return JSONResponse(_page_body(items, offset, limit))
+
+    key = f"pl:{playlist_url}:{offset}:{limit}"
+    cached_items = await playlist_page.cache.get(key)
+    if cached_items is not None:
+        async def replay():
+            for item in cached_items:
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        return StreamingResponse(replay(), media_type="application/x-ndjson")
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def emit(item: dict) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    async def run():
+        try:
+            await extraction_pool.run(_enumerate_playlist, playlist_url, offset, limit, emit)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _DONE)
+
+    task = asyncio.create_task(run())
+
+    async def generate():
+        items: List[dict] = []
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                items.append(item)
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+            await task  # 列挙中の例外はここで送出
+            await playlist_page.cache.set(key, items, ttl=_PAGE_TTL)
+        except HTTPException as e:
+            yield json.dumps({"error": e.detail, "code": e.status_code}, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error(f"/playlist-info stream error: {e}")
+            yield json.dumps({"error": "playlist extraction failed", "code": 500}) + "\n"
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
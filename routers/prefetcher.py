@@ -0,0 +1,168 @@
+# routers/prefetcher.py
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Set, Tuple
+
+import config
+from routers.http_client import send
+from routers.segment_cache import segment_cache, lookup_segment, store_segment
+from routers.singleflight import inflight
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentPrefetcher:
+    """
+    HLS メディアプレイリストのセグメント順を覚えておき、
+    セグメント N が要求されたら N+1..N+k をバックグラウンドで segment_cache に温める。
+
+    - 同時実行数は concurrency で制限
+    - max_inflight_bytes は「受信済みバイト数 + 待機中の本数 × 直近の平均セグメントサイズ」
+      の見積もりに対する上限（サイズは受信するまで分からないので、待機中は平均で数える）
+    - 覚えるプレイリスト数は max_playlists（LRU）で制限
+    - seg:<URL> の single-flight は起動時点（同時実行数の空き待ちより前）に登録するので、
+      待機中・取得中どちらのセグメントを要求したクライアントも inflight.wait で完了を待てる
+    """
+
+    def __init__(self, depth: int, concurrency: int, max_inflight_bytes: int,
+                 max_playlists: int, enabled: bool = True):
+        self.depth = depth
+        self.max_inflight_bytes = max_inflight_bytes
+        self.max_playlists = max_playlists
+        self.enabled = enabled and depth > 0
+        self._sem = asyncio.Semaphore(concurrency)
+        self._playlists: "OrderedDict[str, list[str]]" = OrderedDict()
+        self._index: Dict[str, Tuple[str, int]] = {}
+        self._pending: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._inflight_bytes = 0
+        self._queued = 0
+        self._avg_bytes = 0.0
+        self.prefetched = 0
+        self.skipped = 0
+        self.failed = 0
+
+    # ── プレイリスト学習 ──────────────────
+    def learn(self, playlist_url: str, segment_urls: list[str]) -> None:
+        if not self.enabled or not segment_urls:
+            return
+        self._forget(playlist_url)
+        self._playlists[playlist_url] = segment_urls
+        for i, seg_url in enumerate(segment_urls):
+            self._index[seg_url] = (playlist_url, i)
+        while len(self._playlists) > self.max_playlists:
+            self._forget(next(iter(self._playlists)))
+
+    def _forget(self, playlist_url: str) -> None:
+        old = self._playlists.pop(playlist_url, None)
+        if not old:
+            return
+        for seg_url in old:
+            if self._index.get(seg_url, (None,))[0] == playlist_url:
+                del self._index[seg_url]
+
+    # ── 先読み ──────────────────────────
+    def schedule(self, seg_url: str) -> None:
+        """seg_url の後続セグメントの先読みを起動（待たない）"""
+        if not self.enabled:
+            return
+        pos = self._index.get(seg_url)
+        if pos is None:
+            return
+        playlist_url, i = pos
+        self._playlists.move_to_end(playlist_url)
+        for next_url in self._playlists[playlist_url][i + 1:i + 1 + self.depth]:
+            if next_url in self._pending or next_url in segment_cache:
+                continue
+            if self._estimated_bytes() >= self.max_inflight_bytes:
+                self.skipped += 1
+                break
+            self._pending.add(next_url)
+            task = asyncio.create_task(self._warm(next_url))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _estimated_bytes(self) -> float:
+        return self._inflight_bytes + self._queued * self._avg_bytes
+
+    async def _warm(self, seg_url: str) -> None:
+        try:
+            await inflight.do(f"seg:{seg_url}", lambda: self._guarded_download(seg_url))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.debug(f"prefetch failed: {seg_url}: {type(e).__name__}: {e}")
+        finally:
+            self._pending.discard(seg_url)
+
+    async def _guarded_download(self, seg_url: str) -> None:
+        # single-flight の Task は _warm のキャンセルでは止まらないので、close() 用に自分で登録する
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        queued = True
+        self._queued += 1
+        try:
+            async with self._sem:
+                self._queued -= 1
+                queued = False
+                # 待っている間にクライアント経由で入った分や、他ワーカーが共有した分（L2）は取らない
+                if seg_url in segment_cache or await lookup_segment(seg_url) is not None:
+                    return
+                await self._download(seg_url)
+        finally:
+            if queued:
+                self._queued -= 1
+
+    async def _download(self, seg_url: str) -> None:
+        received = 0
+        chunks: list[bytes] = []
+        try:
+            r = await send("GET", seg_url, stream=True, headers={"Accept-Encoding": "identity"})
+            try:
+                if r.status_code != 200:
+                    self.failed += 1
+                    return
+                async for chunk in r.aiter_raw():
+                    chunks.append(chunk)
+                    received += len(chunk)
+                    self._inflight_bytes += len(chunk)
+                    # 上限を超える巨大レスポンスは先読みしない
+                    if received > segment_cache.max_entry_bytes:
+                        self.skipped += 1
+                        return
+            finally:
+                await r.aclose()
+            await store_segment(seg_url, b"".join(chunks), r.headers.get("content-type"))
+            self.prefetched += 1
+            self._avg_bytes = received if not self._avg_bytes else 0.8 * self._avg_bytes + 0.2 * received
+        finally:
+            self._inflight_bytes -= received
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "playlists": len(self._playlists),
+            "pending": len(self._pending),
+            "queued": self._queued,
+            "inflight_bytes": self._inflight_bytes,
+            "prefetched": self.prefetched,
+            "skipped": self.skipped,
+            "failed": self.failed,
+        }
+
+
+prefetcher = SegmentPrefetcher(
+    depth=config.PROXY_SETTINGS["prefetch_segments"],
+    concurrency=config.PROXY_SETTINGS["prefetch_concurrency"],
+    max_inflight_bytes=config.PROXY_SETTINGS["prefetch_max_inflight_bytes"],
+    max_playlists=config.PROXY_SETTINGS["prefetch_max_playlists"],
+    enabled=config.PROXY_SETTINGS["prefetch_enabled"],
+)
@@ -1,37 +1,46 @@
-import re
+import math
+import time
 import asyncio
 import logging
-from urllib.parse import urljoin, quote
+from contextlib import AsyncExitStack
 
 import httpx
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import StreamingResponse, Response
-from aiocache import Cache, SimpleMemoryCache
+from starlette.background import BackgroundTask
 
 import config
+from routers.http_client import send
+from routers.segment_cache import segment_cache, lookup_segment, store_segment
+from routers.singleflight import inflight
+from routers.prefetcher import prefetcher
+from routers.cache_backend import get_cache
+from routers.m3u8_rewriter import m3u8_templates, playlist_ttl
+from routers.metrics import CACHE_LOOKUPS, UPSTREAM_RESPONSES, PROXY_BYTES, PROXY_STREAMS
+from routers.tracing import span
+from routers import proxy_tokens
 
 logger = logging.getLogger(__name__)
 
 # ───────────────── 共通設定 ─────────────────
-URI_RE = re.compile(config.REGEX_PATTERNS["uri_pattern"])
 router = APIRouter()
 
 # ───────────────── 内部 util ─────────────────
 async def _http_get(url: str, headers: dict):
-    async with httpx.AsyncClient(http2=True, timeout=config.HTTP_SETTINGS["timeout"]) as client:
-        return await client.get(url, headers=headers, follow_redirects=True)
-
-def _cache_key(url: str) -> str:
-    return f"{config.CACHE_SETTINGS['namespace']}:{url}"
+    r = await send("GET", url, headers=headers)
+    UPSTREAM_RESPONSES.inc(kind="playlist", status=r.status_code)
+    return r
 
 def _cache_key_m3u8(url: str) -> str:
-    return f"{config.CACHE_SETTINGS['namespace']}:rewritten:{url}"
+    # 書き換え前の上流本文を保存する（ホスト名に依存しない）
+    return f"{config.CACHE_SETTINGS['namespace']}:m3u8:{url}"
 
 async def fetch_with_retry(url: str, headers: dict, retries: int = None):
     retries = retries if retries is not None else config.HTTP_SETTINGS["retries"]
     for attempt in range(retries + 1):
         try:
-            r = await _http_get(url, headers)
+            with span("upstream"):
+                r = await _http_get(url, headers)
             if r.status_code >= 400:
                 raise HTTPException(r.status_code, f"Upstream returned {r.status_code}")
             return r
@@ -41,90 +50,164 @@ async def fetch_with_retry(url: str, headers: dict, retries: int = None):
             logger.warning(f"Timeout {attempt+1}/{retries} → retry: {url}")
             await asyncio.sleep(1)
 
-def rewrite_m3u8(text: str, base_url: str, proxy_base: str) -> str:
-    """m3u8 内の URL / KEY URI をプロキシ付きに書き換え + EXT-X-START 追加"""
-    out = []
+# ───────────────── m3u8 取得（TTL 判定 + 条件付き再検証） ─────────────────
+async def _fetch_playlist(url: str, headers: dict, stale: dict | None) -> dict:
+    """
+    上流から m3u8 を取得してキャッシュエントリを作る。
+    stale に ETag / Last-Modified があれば条件付きリクエストで再検証し、304 なら本文を再利用。
+    """
+    req_headers = dict(headers)
+    if stale:
+        if stale.get("etag"):
+            req_headers["If-None-Match"] = stale["etag"]
+        if stale.get("last_modified"):
+            req_headers["If-Modified-Since"] = stale["last_modified"]
+    r = await fetch_with_retry(url, req_headers)
+    if r.status_code == 304 and stale:
+        logger.debug(f"m3u8 revalidated (304): {url}")
+        text = stale["text"]
+        etag = r.headers.get("etag") or stale.get("etag")
+        last_modified = r.headers.get("last-modified") or stale.get("last_modified")
+    else:
+        text = r.text
+        PROXY_BYTES.inc(len(r.content), direction="in", kind="playlist")
+        etag = r.headers.get("etag")
+        last_modified = r.headers.get("last-modified")
+    ttl = playlist_ttl(text)
+    return {
+        "text": text,
+        "ttl": ttl,
+        "fresh_until": time.time() + ttl,
+        "etag": etag,
+        "last_modified": last_modified,
+    }
 
-    # 冒頭に EXT-X-START を挿入（存在しない場合のみ）
-    if "#EXT-X-START" not in text:
-        out.append("#EXT-X-START:TIME-OFFSET=0,PRECISE=YES")
+async def load_playlist(url: str, headers: dict) -> dict:
+    """
+    キャッシュから m3u8 エントリを返す。期限切れなら（可能なら条件付きで）取り直す。
+    検証子を持つエントリは再検証用に m3u8_revalidate_window だけ長く保持する。
+    """
+    cache = get_cache()
+    cache_key = _cache_key_m3u8(url)
+    entry = await cache.get(cache_key)
+    if entry is not None and entry["fresh_until"] > time.time():
+        logger.debug(f"m3u8 cache hit: {url}")
+        CACHE_LOOKUPS.inc(cache="m3u8", result="hit")
+        return entry
+    CACHE_LOOKUPS.inc(cache="m3u8", result="miss")
+
+    # 同一 m3u8 への同時ミスは上流フェッチを 1 回に集約
+    async def _refresh():
+        fresh = await _fetch_playlist(url, headers, entry)
+        keep = fresh["ttl"]
+        if fresh["etag"] or fresh["last_modified"]:
+            keep += config.CACHE_SETTINGS["m3u8_revalidate_window"]
+        await cache.set(cache_key, fresh, ttl=keep)
+        logger.debug(f"m3u8 cached ({fresh['ttl']}s): {url}")
+        return fresh
+    return await inflight.do(f"fetch:{url}", _refresh)
 
-    def proxify(u: str) -> str:
-        full = urljoin(base_url, u)
-        return proxy_base + quote(full, safe=config.PROXY_SETTINGS["url_safe_chars"])
+# ───────────────── Range 対応パススルー ─────────────────
+# 上流レスポンスからそのまま中継するヘッダ
+PASSTHROUGH_HEADERS = ("content-type", "content-length", "content-range",
+                       "accept-ranges", "last-modified", "etag")
 
-    for line in text.splitlines():
-        if line.startswith("#"):
-            line = URI_RE.sub(lambda m: f'URI="{proxify(m.group(1))}"', line)
-            out.append(line)
-        elif line.strip():
-            out.append(proxify(line.strip()))
+def parse_range(range_header: str, size: int) -> tuple[int, int] | None:
+    """
+    "bytes=a-b" / "bytes=a-" / "bytes=-n" を (start, end) に変換（end は含む）。
+    複数レンジ等の非対応形式は None（全体を 200 で返す）。
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
         else:
-            out.append(line)
-    return "\n".join(out)
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(416, "range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
 
-# ───────────────── TS 先読み + メモリキャッシュ ─────────────────
-ts_memory_cache = {}  # {url: bytes}
+def serve_cached_segment(data: bytes, media_type: str | None, range_header: str | None) -> Response:
+    """キャッシュ済みセグメントを memoryview のスライスで返す（コピーなし）"""
+    size = len(data)
+    media_type = media_type or config.RESPONSE_SETTINGS["default_media_type"]
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Cache-Control": f"public, max-age={config.CACHE_SETTINGS['ttl_segment']}",
+    }
+    byte_range = parse_range(range_header, size) if range_header else None
+    if byte_range is None:
+        return Response(memoryview(data), media_type=media_type, headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(memoryview(data)[start:end + 1], status_code=206,
+                    media_type=media_type, headers=headers)
 
-async def stream_ts_cached(urls: list, headers: dict,
-                           init_chunk: int = 128*1024,
-                           max_chunk: int = 256*1024,
-                           prefetch_segments: int = 3):
+async def stream_passthrough(url: str, headers: dict) -> StreamingResponse:
     """
-    複数TSセグメントを同時に先読みしてバッファリング
-    urls: TS URL のリスト
+    上流のステータス / Content-Length / Content-Range / Accept-Ranges をそのまま中継し、
+    受け取ったチャンクをコピーせずに流す。Range なしの 200 応答のみキャッシュへ保存。
+    ホスト枠はヘッダ受信までしか持たないので、遅いクライアントや停止中の Range 読み出しが
+    同じホストへのプレイリスト取得を止めることはない。
     """
-    queue = asyncio.Queue(maxsize=prefetch_segments)
-    data_buffer = bytearray()
-
-    async def fetch_segment(seg_url: str):
-        # nonlocal queue, data_buffer
-        if seg_url in ts_memory_cache:
-            await queue.put(ts_memory_cache[seg_url])
-            return
-        async with httpx.AsyncClient(http2=True, timeout=None) as client:
-            async with client.stream("GET", seg_url, headers=headers) as r:
-                if r.status_code >= 400:
-                    await queue.put(HTTPException(r.status_code, f"Upstream returned {r.status_code}"))
-                    return
-                chunk_size = init_chunk
-                async for chunk in r.aiter_bytes(chunk_size=chunk_size):
-                    await queue.put(chunk)
-                    data_buffer.extend(chunk)
-        ts_memory_cache[seg_url] = bytes(data_buffer)
-
-    async def producer():
-        tasks = []
-        for i, seg_url in enumerate(urls[:prefetch_segments]):
-            tasks.append(asyncio.create_task(fetch_segment(seg_url)))
-        await asyncio.gather(*tasks)
-        # それ以降は順次取得
-        for seg_url in urls[prefetch_segments:]:
-            await fetch_segment(seg_url)
-        await queue.put(None)
-
-    async def consumer():
+    stack = AsyncExitStack()
+    with span("upstream_open"):
+        r = await send("GET", url, stream=True, headers={**headers, "Accept-Encoding": "identity"})
+    stack.push_async_callback(r.aclose)
+    UPSTREAM_RESPONSES.inc(kind="segment", status=r.status_code)
+    if r.status_code >= 400:
+        await stack.aclose()
+        raise HTTPException(r.status_code, f"Upstream returned {r.status_code}")
+    PROXY_STREAMS.inc()
+    stack.callback(PROXY_STREAMS.dec)
+
+    cacheable = r.status_code == 200 and "Range" not in headers
+
+    async def body():
+        chunks: list[bytes] | None = [] if cacheable else None
+        size = 0
         try:
-            while True:
-                chunk = await queue.get()
-                if chunk is None:
-                    break
-                if isinstance(chunk, Exception):
-                    raise chunk
+            async for chunk in r.aiter_raw():
+                PROXY_BYTES.inc(len(chunk), direction="in", kind="segment")
+                PROXY_BYTES.inc(len(chunk), direction="out", kind="segment")
+                if chunks is not None:
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    # 上限を超える巨大レスポンスはキャッシュ対象外
+                    if size > segment_cache.max_entry_bytes:
+                        chunks = None
                 yield chunk
+            if chunks is not None:
+                await store_segment(url, b"".join(chunks), r.headers.get("content-type"))
         finally:
-            if not producer_task.done():
-                producer_task.cancel()
+            await stack.aclose()
 
-    producer_task = asyncio.create_task(producer())
-    async for data in consumer():
-        yield data
+    out_headers = {k: r.headers[k] for k in PASSTHROUGH_HEADERS if k in r.headers}
+    out_headers["Cache-Control"] = f"public, max-age={config.CACHE_SETTINGS['ttl_segment']}"
+    media_type = out_headers.pop("content-type", config.RESPONSE_SETTINGS["default_media_type"])
+    # 途中切断でジェネレータが開始されなかった場合もコネクションを返却する
+    return StreamingResponse(body(), status_code=r.status_code, media_type=media_type,
+                             headers=out_headers, background=BackgroundTask(stack.aclose))
 
 # ───────────────── /proxy エンドポイント ─────────────────
 @router.get(config.ENDPOINTS["proxy"])
 async def proxy(url: str, request: Request):
     logger.debug(f"Proxy request: {url}")
     try:
+        if url.startswith(proxy_tokens.TOKEN_PREFIX):
+            url = await proxy_tokens.resolve(url)
+        elif config.PROXY_SETTINGS["tokens_required"]:
+            raise HTTPException(403, config.RESPONSE_SETTINGS["error_messages"]["token_required"])
         m3u8_mark = config.STREAM_EXTRACTION["m3u8_check_string"]
         is_m3u8 = url.endswith(m3u8_mark)
         headers = {}
@@ -134,34 +217,46 @@ async def proxy(url: str, request: Request):
         # ---------- m3u8 ----------
         m3u8_mt = config.RESPONSE_SETTINGS["m3u8_media_type"]
         if is_m3u8:
-            cache = Cache(SimpleMemoryCache)
-            cache_key = _cache_key_m3u8(url)
-            cached_txt = await cache.get(cache_key)
-            if cached_txt is None:
-                r = await fetch_with_retry(url, headers)
-                base_url = str(request.base_url).rstrip('/')
-                proxy_base = f"{base_url}/{config.PROXY_SETTINGS['base_path']}"
-                body = rewrite_m3u8(r.text, url, proxy_base)
-                await cache.set(cache_key, body, ttl=config.CACHE_SETTINGS["ttl_m3u8"])
-                logger.debug(f"m3u8 cached: {url}")
-            else:
-                body = cached_txt
-                logger.debug(f"m3u8 cache hit: {url}")
+            with span("playlist"):
+                entry = await load_playlist(url, headers)
+
+            # 書き換えはホスト名ごとにテンプレートからレンダリング
+            with span("compile"):
+                tpl, compiled = m3u8_templates.get(url, entry["text"])
+            if compiled:
+                # メディアプレイリストならセグメント順を覚えて先読みに使う
+                prefetcher.learn(url, tpl.segments)
+            if tpl.urls:
+                await proxy_tokens.register(tpl.urls, tpl.group, ttl=tpl.token_ttl)
+            base_url = str(request.base_url).rstrip('/')
+            proxy_base = f"{base_url}/{config.PROXY_SETTINGS['base_path']}"
+            with span("render"):
+                body = tpl.render(proxy_base)
+            PROXY_BYTES.inc(len(body), direction="out", kind="playlist")
             return Response(
                 body,
                 media_type=m3u8_mt,
-                headers={"Cache-Control": f"public, max-age={config.CACHE_SETTINGS['ttl_m3u8']}"}
+                headers={"Cache-Control": f"public, max-age={max(math.ceil(entry['fresh_until'] - time.time()), 0)}"}
             )
 
         # ---------- TS / KEY / その他 ----------
-        # 単一TSの場合もリスト化
-        ts_urls = [url] if url.endswith(".ts") else [url]
-        return StreamingResponse(
-            stream_ts_cached(ts_urls, headers, init_chunk=config.PROXY_SETTINGS["buffer_size"]),
-            media_type="application/octet-stream",
-            headers={"Cache-Control": f"public, max-age={config.CACHE_SETTINGS['ttl_segment']}"},
-        )
+        prefetcher.schedule(url)
+        with span("segment_cache"):
+            cached_seg = await lookup_segment(url)
+            # 先読み中なら二重に取りに行かず、完了を待ってから引き直す
+            if cached_seg is None and await inflight.wait(f"seg:{url}"):
+                cached_seg = await lookup_segment(url)
+        if cached_seg is not None:
+            CACHE_LOOKUPS.inc(cache="segment", result="hit")
+            data, media_type = cached_seg
+            resp = serve_cached_segment(data, media_type, headers.get("Range"))
+            PROXY_BYTES.inc(len(resp.body), direction="out", kind="segment")
+            return resp
+        CACHE_LOOKUPS.inc(cache="segment", result="miss")
+        return await stream_passthrough(url, headers)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Proxy error: {type(e).__name__}: {e}")
         raise HTTPException(
@@ -169,4 +264,3 @@ async def proxy(url: str, request: Request):
             config.RESPONSE_SETTINGS["error_messages"]["upstream_error"],
         )
 
-cache = Cache(SimpleMemoryCache)
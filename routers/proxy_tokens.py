@@ -0,0 +1,171 @@
+# routers/proxy_tokens.py
+"""
+/proxy 用の短縮トークン（PROXY_TOKENS_ENABLED=true のときだけ使う）。
+
+上流 URL をまとめて 1 つの「グループ」として共有キャッシュに登録し、
+個々の URL は「グループ ID + 署名 + 添字」の短いトークンで参照する。
+
+    ~<グループ ID 12 文字><署名 8 文字><添字>      例: ~q3Jx0bVfTQ2aLk9dP_3x41
+
+- グループ ID は URL 一覧の BLAKE2b（同じ一覧なら全ワーカーで同じ ID）
+- 署名はグループ ID の HMAC-SHA256。キャッシュを引く前に検証できるので、
+  偽造トークンは上流にもキャッシュにも触れずに 403 になる
+- 1 回の /extract 応答・1 つの m3u8 がそれぞれ 1 グループ（登録は 1 回の set）
+
+ワーカー間でトークンを通すには共有バックエンド（redis / disk）と共通の PROXY_TOKEN_SECRET が必要。
+"""
+import hmac
+import time
+import base64
+import hashlib
+import logging
+import secrets
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+import config
+from routers.cache_backend import get_cache, value_expiry
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PREFIX = "~"
+_ID_LEN = 12   # 9 byte → base64url 12 文字
+_TAG_LEN = 8   # 6 byte → base64url 8 文字
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _load_secret() -> bytes:
+    secret = config.PROXY_SETTINGS["token_secret"]
+    if secret:
+        return secret.encode("utf-8")
+    if config.PROXY_SETTINGS["tokens_enabled"]:
+        logger.warning("PROXY_TOKEN_SECRET is not set; using a per-process random secret "
+                       "(tokens will not work across workers or restarts)")
+    return secrets.token_bytes(32)
+
+
+_secret = _load_secret()
+
+
+def enabled() -> bool:
+    return config.PROXY_SETTINGS["tokens_enabled"]
+
+
+def group_id(urls: List[str]) -> str:
+    return _b64(hashlib.blake2b("\n".join(urls).encode("utf-8"), digest_size=9).digest())
+
+
+def _tag(gid: str) -> str:
+    return _b64(hmac.new(_secret, gid.encode("utf-8"), hashlib.sha256).digest()[:6])
+
+
+def _cache_key(gid: str) -> str:
+    return f"{config.CACHE_SETTINGS['namespace']}:ptok:{gid}"
+
+
+class TokenGroups:
+    """
+    登録済みグループのプロセス内 LRU。
+    gid → (URL 一覧, トークンとして有効な期限, このワーカーが共有キャッシュに set した期限)
+    set 期限が 0.0 なら、他のワーカーが登録したものを共有キャッシュから読んだだけ
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[List[str], float, float]]" = OrderedDict()
+
+    def get(self, gid: str) -> Optional[Tuple[List[str], float, float]]:
+        entry = self._entries.get(gid)
+        if entry is not None:
+            self._entries.move_to_end(gid)
+        return entry
+
+    def put(self, gid: str, urls: List[str], until: float, stored_until: float) -> None:
+        self._entries[gid] = (urls, until, stored_until)
+        self._entries.move_to_end(gid)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, gid: str) -> None:
+        self._entries.pop(gid, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+token_groups = TokenGroups(config.PROXY_SETTINGS["token_local_groups"])
+
+
+def _group_ttl(urls: List[str], ttl: Optional[int] = None) -> int:
+    """署名付き URL の expire を超えて残しても使えないので、そこで切る（期限切れなら 0）"""
+    ttl = config.PROXY_SETTINGS["token_ttl"] if ttl is None else min(ttl, config.PROXY_SETTINGS["token_ttl"])
+    expires = value_expiry(urls)
+    if expires is not None:
+        ttl = min(ttl, int(expires - time.time()))
+    return max(ttl, 0)
+
+
+def token_prefix(gid: str) -> str:
+    """トークンの共通部分（"~" + ID + 署名）。i 番目の URL のトークンはこれ + str(i)"""
+    return TOKEN_PREFIX + gid + _tag(gid)
+
+
+async def register(urls: List[str], gid: Optional[str] = None, ttl: Optional[int] = None) -> str:
+    """
+    URL 一覧を共有キャッシュに登録し、token_prefix を返す。
+    ttl を渡すとグループの TTL をそれ以下に抑える（ライブの m3u8 など、すぐ使われなくなる一覧）。
+    同じ一覧を TTL の半分以内に登録済みなら set は省く。
+    URL の expire を過ぎた一覧は登録しない（そのトークンは 404 になる）。
+    """
+    gid = gid or group_id(urls)
+    now = time.time()
+    entry = token_groups.get(gid)
+    limit = config.PROXY_SETTINGS["token_ttl"] if ttl is None else ttl
+    if entry is None or entry[2] - now < limit / 2:
+        ttl = _group_ttl(urls, ttl)
+        if ttl <= 0:
+            logger.debug(f"not registering expired token group {gid}")
+            token_groups.discard(gid)
+            return token_prefix(gid)
+        await get_cache().set(_cache_key(gid), "\n".join(urls), ttl=ttl)
+        token_groups.put(gid, urls, now + ttl, now + ttl)
+    return token_prefix(gid)
+
+
+async def resolve(token: str) -> str:
+    """トークンを上流 URL に戻す。署名不正は 403、未登録・期限切れ・範囲外は 404"""
+    messages = config.RESPONSE_SETTINGS["error_messages"]
+    body = token[len(TOKEN_PREFIX):]
+    gid, tag, index = body[:_ID_LEN], body[_ID_LEN:_ID_LEN + _TAG_LEN], body[_ID_LEN + _TAG_LEN:]
+    valid = hmac.compare_digest(tag.encode("utf-8"), _tag(gid).encode("ascii"))
+    if not valid or not (index.isascii() and index.isdigit()):
+        raise HTTPException(403, messages["invalid_token"])
+
+    now = time.time()
+    entry = token_groups.get(gid)
+    if entry is not None and entry[1] <= now:
+        token_groups.discard(gid)
+        raise HTTPException(404, messages["token_expired"])
+    if entry is not None:
+        urls = entry[0]
+    else:
+        stored = await get_cache().get(_cache_key(gid))
+        # 共有キャッシュの中身が ID と一致することも確かめる
+        urls = stored.split("\n") if isinstance(stored, str) else None
+        if urls is None or group_id(urls) != gid:
+            raise HTTPException(404, messages["token_expired"])
+        ttl = _group_ttl(urls)
+        if ttl <= 0:
+            raise HTTPException(404, messages["token_expired"])
+        # 共有キャッシュ側の残り時間は分からないので、このワーカーで登録する時は set し直す
+        token_groups.put(gid, urls, now + ttl, 0.0)
+
+    n = int(index)
+    if n >= len(urls):
+        raise HTTPException(404, messages["token_expired"])
+    return urls[n]
@@ -1,19 +1,19 @@
 import re, collections, logging
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import JSONResponse
-from yt_dlp import YoutubeDL
-from aiocache import cached, SimpleMemoryCache
-import asyncio
+from routers.ytdlp_handler import ydl_pool
+from routers.cache_backend import shared_cached
 import config
+from routers.extraction_pool import extraction_pool
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get(config.ENDPOINTS["related_videos"])
-@cached(
+@shared_cached(
     ttl=600,
-    cache=SimpleMemoryCache,
-    key_builder=lambda f, url, limit: f"rel:{url}:{limit}"
+    key_builder=lambda f, url, limit: f"rel:{url}:{limit}",
+    swr=True,
 )
 async def related_videos(url: str = Query(..., description="https://www.youtube.com/watch?v=..."),
                          limit: int = Query(10, ge=1, le=50)):
@@ -22,9 +22,9 @@ async def related_videos(url: str = Query(..., description="https://www.youtube.
 
     # Inner sync function for running blocking extraction
     def run_yt_dl_extract_1():
-        with YoutubeDL(config.YTDLP_OPTIONS | {"skip_download": True, "quiet": True}) as ydl:
+        with ydl_pool.checkout(config.YTDLP_OPTIONS | {"skip_download": True, "quiet": True}) as ydl:
             return ydl.extract_info(url)
-    info = await asyncio.to_thread(run_yt_dl_extract_1)
+    info = await extraction_pool.run(run_yt_dl_extract_1)
 
     text = (info.get("title", "") + " " + (info.get("description") or "")).lower()
     words = re.findall(r"[A-Za-z0-9\u3040-\u30ff\u9fff]+", text)
@@ -41,9 +41,9 @@ async def related_videos(url: str = Query(..., description="https://www.youtube.
             "quiet": True,
             "default_search": f"ytsearch{limit}",
         }
-        with YoutubeDL(search_opts) as ydl:
+        with ydl_pool.checkout(search_opts) as ydl:
             return ydl.extract_info(query)
-    res = await asyncio.to_thread(run_yt_dl_extract_2)
+    res = await extraction_pool.run(run_yt_dl_extract_2)
 
     entries = []
     for e in res.get("entries", []):
@@ -1,12 +1,13 @@
 import logging
 from typing import List, Dict
 from fastapi import APIRouter, Query, HTTPException
-from yt_dlp import YoutubeDL
-import asyncio
+from routers.ytdlp_handler import ydl_pool
+from routers.extraction_pool import extraction_pool, process_safe
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+@process_safe
 def _search_with_ytdlp(query: str, limit: int) -> List[Dict]:
     ydl_opts = {
         "quiet": True,
@@ -15,7 +16,7 @@ def _search_with_ytdlp(query: str, limit: int) -> List[Dict]:
     }
 
     results = []
-    with YoutubeDL(ydl_opts) as ydl:
+    with ydl_pool.checkout(ydl_opts) as ydl:
         search_query = f"ytsearch{limit}:{query}"
         info = ydl.extract_info(search_query, download=False)
         entries = info.get("entries", [])
@@ -48,10 +49,12 @@ async def search(
     検索ワードに対する動画情報を取得して返します。
     """
     try:
-        # yt-dlpはブロッキングI/Oなのでasyncio.to_threadで非同期化
-        results = await asyncio.to_thread(_search_with_ytdlp, q, limit)
+        # yt-dlpはブロッキングI/Oなので専用プールで実行
+        results = await extraction_pool.run(_search_with_ytdlp, q, limit)
         return results
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"/search error: {e}", exc_info=True)
         raise HTTPException(500, "search operation failed")
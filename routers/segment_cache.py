@@ -0,0 +1,133 @@
+# routers/segment_cache.py
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import config
+from routers.cache_backend import get_cache, is_shared
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentCache:
+    """
+    TS セグメント用のバイト数上限付き LRU キャッシュ。
+
+    - 合計バイト数が max_bytes を超えたら古いものから追い出す
+    - エントリごとに TTL を持ち、期限切れは参照時に破棄
+    - max_entry_bytes を超える単一セグメントは保存しない
+    - 上流の Content-Type も一緒に持ち、ヒット時にミス時と同じ型で返せるようにする
+    """
+
+    def __init__(self, max_bytes: int, ttl: int, max_entry_bytes: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: "OrderedDict[str, tuple[bytes, float, Optional[str]]]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Optional[str]]]:
+        """(本文, Content-Type) を返す"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        data, expires_at, media_type = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return data, media_type
+
+    def set(self, key: str, data: bytes, media_type: Optional[str] = None,
+            ttl: Optional[int] = None) -> bool:
+        size = len(data)
+        if size > self.max_entry_bytes or size > self.max_bytes:
+            logger.debug(f"segment too large to cache ({size} bytes): {key}")
+            return False
+        if key in self._entries:
+            self._remove(key)
+        ttl = self.ttl if ttl is None else ttl
+        self._entries[key] = (data, time.monotonic() + ttl, media_type)
+        self._size += size
+        self._evict()
+        return True
+
+    def _remove(self, key: str) -> None:
+        data, _, _ = self._entries.pop(key)
+        self._size -= len(data)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        # 先に期限切れを掃除し、それでも超過していれば LRU 順に追い出す
+        if self._size > self.max_bytes:
+            for key in [k for k, (_, exp, _) in self._entries.items() if exp <= now]:
+                self._remove(key)
+                self.evictions += 1
+        while self._size > self.max_bytes and self._entries:
+            key, (data, _, _) = self._entries.popitem(last=False)
+            self._size -= len(data)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+segment_cache = SegmentCache(
+    max_bytes=config.CACHE_SETTINGS["segment_max_bytes"],
+    ttl=config.CACHE_SETTINGS["ttl_segment"],
+    max_entry_bytes=config.CACHE_SETTINGS["segment_max_entry_bytes"],
+)
+
+
+# ───────────────── L1: LRU / L2: 共有バックエンド ─────────────────
+def _cache_key(url: str) -> str:
+    return f"{config.CACHE_SETTINGS['namespace']}:{url}"
+
+
+def _share_segments() -> bool:
+    return is_shared() and config.CACHE_SETTINGS["share_segments"]
+
+
+async def lookup_segment(seg_url: str) -> Optional[Tuple[bytes, Optional[str]]]:
+    """(本文, Content-Type) を返す"""
+    cached_seg = segment_cache.get(seg_url)
+    if cached_seg is None and _share_segments():
+        # ワーカー間共有キャッシュ (L2) を確認し、あればローカル LRU に載せる
+        cached_seg = await get_cache().get(_cache_key(seg_url))
+        if isinstance(cached_seg, (bytes, bytearray)):  # 型を持たない旧形式
+            cached_seg = (cached_seg, None)
+        if cached_seg is not None:
+            segment_cache.set(seg_url, *cached_seg)
+    return cached_seg
+
+
+async def store_segment(seg_url: str, seg: bytes, media_type: Optional[str] = None) -> None:
+    segment_cache.set(seg_url, seg, media_type)
+    if _share_segments():
+        await get_cache().set(_cache_key(seg_url), (seg, media_type),
+                              ttl=config.CACHE_SETTINGS["ttl_segment"])
@@ -0,0 +1,70 @@
+# routers/singleflight.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    同一キーの同時実行を 1 本にまとめる（single-flight）。
+
+    最初の呼び出しだけが fn() を実行し、処理中に来た同じキーの呼び出しは
+    その結果（または例外）を共有する。計算は独立した Task で動くため、
+    先頭の呼び出し元がキャンセルされても他の待機者には影響しない。
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self.executed += 1
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        else:
+            self.coalesced += 1
+            logger.debug(f"single-flight join: {key}")
+        return await asyncio.shield(task)
+
+    async def wait(self, key: str) -> bool:
+        """
+        key が処理中なら完了まで待って True を返す（結果・例外は捨てる）。
+        処理中でなければ何もせず False。別経路（先読みなど）の完了を待ってから
+        キャッシュを引き直したいときに使う。
+        """
+        task = self._calls.get(key)
+        if task is None:
+            return False
+        self.coalesced += 1
+        try:
+            await asyncio.shield(task)
+        except Exception:
+            pass
+        return True
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 待機者が全員いなくなっても "exception never retrieved" を出さない
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+        }
+
+
+# アプリ共通インスタンス（キーは "extract:", "m3u8:" 等で名前空間を分ける）
+inflight = SingleFlight()
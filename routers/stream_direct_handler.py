@@ -1,18 +1,19 @@
-import asyncio
 import logging
 
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import JSONResponse
-from aiocache import cached, SimpleMemoryCache
+from routers.cache_backend import shared_cached
 
-from routers.ytdlp_handler import run_ydl
+from routers.extractor_util import extract_hls_manifest
+from routers.singleflight import inflight
+from routers.extraction_pool import extraction_pool
 import config
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get(config.ENDPOINTS["stream_direct"])
-@cached(ttl=1800, cache=SimpleMemoryCache, key_builder=lambda f, video_url: f"m3u8:{video_url}")
+@shared_cached(ttl=1800, key_builder=lambda f, video_url: f"m3u8:{video_url}", expiry_aware=True)
 async def stream_direct(
     video_url: str = Query(..., description="YouTube 動画 URL")
 ):
@@ -24,17 +25,13 @@ async def stream_direct(
       → { "url": "https://...index.m3u8" }
     """
     try:
-        # yt-dlpは同期 I/O 処理なので非同期化
-        info = await asyncio.to_thread(run_ydl, video_url, custom={
-            "skip_download": True,
-            "quiet": True,
-            "allow_unplayable_formats": True
-        })
-
-        for fmt in info.get("formats", []):
-            m3u8_url = fmt.get("url") or ""
-            if ".m3u8" in m3u8_url:
-                return JSONResponse({"url": m3u8_url})
+        # yt-dlpは同期 I/O 処理なので専用プールで実行
+        m3u8_url = await inflight.do(
+            f"m3u8:{video_url}",
+            lambda: extraction_pool.run(extract_hls_manifest, video_url),
+        )
+        if m3u8_url:
+            return JSONResponse({"url": m3u8_url})
 
         raise HTTPException(404, "no m3u8 manifest found")
 
@@ -0,0 +1,110 @@
+# routers/tracing.py
+"""
+リクエスト単位の区間計測（Server-Timing）。
+
+TRACING_ENABLED=true のときだけミドルウェアを登録し、TRACING_SAMPLE_RATE の割合
+（またはヘッダ X-Oculora-Trace: 1 を付けたリクエスト）で計測する。
+計測対象外のリクエストでは span() は ContextVar を 1 回読むだけで何もしない。
+
+    with span("ydl"):
+        info = ydl.extract_info(...)
+
+区間は Server-Timing レスポンスヘッダと、完了時の debug ログ（JSON 1 行）に出力する。
+ヘッダ送出後に終わった区間（ストリーミング本文など）はログにのみ現れる。
+抽出プールのスレッドには contextvars がコピーされるので、その中の区間も記録される
+（YTDLP_POOL_MODE=process の子プロセス内は対象外）。
+"""
+import json
+import time
+import random
+import logging
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class Trace:
+    __slots__ = ("spans", "start")
+
+    def __init__(self):
+        self.spans: List[Tuple[str, float]] = []
+        self.start = time.perf_counter()
+
+    def add(self, name: str, seconds: float) -> None:
+        # list.append は GIL 下でアトミックなのでスレッドからも呼べる
+        self.spans.append((name, seconds))
+
+    def header(self) -> str:
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans]
+        parts.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("oculora_trace", default=None)
+
+
+class span:
+    """計測中のリクエストなら with ブロックの所要時間を記録する"""
+
+    __slots__ = ("name", "trace", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace = _current.get()
+
+    def __enter__(self):
+        if self.trace is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is not None:
+            self.trace.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class TracingMiddleware:
+    """サンプリングされたリクエストで Trace を開始し、Server-Timing を付与する"""
+
+    def __init__(self, app):
+        self.app = app
+        settings = config.TRACING_SETTINGS
+        self.sample_rate = settings["sample_rate"]
+        self.force_header = settings["force_header"].lower().encode("latin-1")
+
+    def _sampled(self, scope) -> bool:
+        for name, value in scope.get("headers", ()):
+            if name == self.force_header:
+                return value == b"1"
+        return random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._sampled(scope):
+            return await self.app(scope, receive, send)
+
+        trace = Trace()
+        token = _current.set(trace)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            logger.debug("trace " + json.dumps({
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status["code"],
+                "total_ms": round((time.perf_counter() - trace.start) * 1000, 1),
+                "spans": [[name, round(seconds * 1000, 1)] for name, seconds in trace.spans],
+            }, ensure_ascii=False))
@@ -1,7 +1,11 @@
 import logging
-from typing import Any, Dict
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
 from yt_dlp import YoutubeDL
 import config
+from routers.metrics import YTDLP_DURATION
 
 logger = logging.getLogger(__name__)
 
@@ -11,7 +15,16 @@ _SEC_WARN = (
     "These options weaken HTTPS security."
 )
 
+_merged_opts: Dict[str, Any] | None = None
+
 def _merge_opts() -> Dict[str, Any]:
+    """config から yt-dlp 共通オプションを組み立てる（初回のみ計算し、以後はコピーを返す）"""
+    global _merged_opts
+    if _merged_opts is None:
+        _merged_opts = _build_opts()
+    return _merged_opts.copy()
+
+def _build_opts() -> Dict[str, Any]:
     base = config.YTDLP_OPTIONS.copy()
     extra = getattr(config, "YTDLP_EXTRA", {})
 
@@ -40,9 +53,105 @@ def _merge_opts() -> Dict[str, Any]:
 
     return base
 
+# ── 初期化済み YoutubeDL の使い回し ──────────────────
+class YoutubeDLPool:
+    """
+    オプション集合ごとに初期化済み YoutubeDL を保持するプール。
+
+    extractor 登録・cookie jar・player JS / 署名キャッシュを温めたまま再利用する。
+    YoutubeDL 自体はスレッド安全ではないため、1 インスタンスは同時に 1 スレッドだけが
+    checkout する。max_uses 回使ったインスタンスは破棄して作り直す。
+    """
+
+    def __init__(self, max_idle_per_key: int, max_keys: int, max_uses: int, enabled: bool = True):
+        self.max_idle_per_key = max_idle_per_key
+        self.max_keys = max_keys
+        self.max_uses = max_uses
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._idle: "OrderedDict[str, list[tuple[YoutubeDL, int]]]" = OrderedDict()
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def _key(opts: Dict[str, Any]) -> str:
+        return repr(sorted(opts.items(), key=lambda kv: kv[0]))
+
+    @staticmethod
+    def _close(ydl: YoutubeDL) -> None:
+        try:
+            ydl.close()
+        except Exception as e:
+            logger.debug(f"YoutubeDL close failed: {e}")
+
+    @contextmanager
+    def checkout(self, opts: Dict[str, Any]) -> Iterator[YoutubeDL]:
+        if not self.enabled:
+            with YoutubeDL(opts) as ydl, YTDLP_DURATION.time():
+                yield ydl
+            return
+
+        key = self._key(opts)
+        ydl, uses = None, 0
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                ydl, uses = idle.pop()
+                self._idle.move_to_end(key)
+                self.reused += 1
+        if ydl is None:
+            ydl = YoutubeDL(opts)
+            with self._lock:
+                self.created += 1
+
+        try:
+            with YTDLP_DURATION.time():
+                yield ydl
+        finally:
+            self._checkin(key, ydl, uses + 1)
+
+    def _checkin(self, key: str, ydl: YoutubeDL, uses: int) -> None:
+        evicted: list[YoutubeDL] = []
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            self._idle.move_to_end(key)
+            if uses < self.max_uses and len(idle) < self.max_idle_per_key:
+                idle.append((ydl, uses))
+            else:
+                evicted.append(ydl)
+            while len(self._idle) > self.max_keys:
+                _, old = self._idle.popitem(last=False)
+                evicted.extend(y for y, _ in old)
+        for old_ydl in evicted:
+            self._close(old_ydl)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, OrderedDict()
+        for entries in idle.values():
+            for ydl, _ in entries:
+                self._close(ydl)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "option_sets": len(self._idle),
+                "idle": sum(len(v) for v in self._idle.values()),
+                "created": self.created,
+                "reused": self.reused,
+            }
+
+
+ydl_pool = YoutubeDLPool(
+    max_idle_per_key=config.YTDLP_POOL_SETTINGS["instance_idle_per_key"],
+    max_keys=config.YTDLP_POOL_SETTINGS["instance_max_keys"],
+    max_uses=config.YTDLP_POOL_SETTINGS["instance_max_uses"],
+    enabled=config.YTDLP_POOL_SETTINGS["reuse_instances"],
+)
+
 def run_ydl(url: str, custom: Dict[str, Any] | None = None):
     opts = _merge_opts()
     if custom:
         opts |= custom
-    with YoutubeDL(opts) as ydl:
+    with ydl_pool.checkout(opts) as ydl:
         return ydl.extract_info(url, download=False)
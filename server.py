@@ -1,4 +1,5 @@
 import re, asyncio, logging
+from contextlib import asynccontextmanager
 
 import httpx
 from fastapi import FastAPI, HTTPException
@@ -15,6 +16,16 @@ from routers.health_handler import router as health_router
 from routers.comments_handler import router as comments_router
 from routers.search_handler import router as search_router
 from routers.download_handler import router as download_router
+from routers.http_client import start_http_client, close_http_client, send
+from routers.prefetcher import prefetcher
+from routers.extraction_pool import extraction_pool, download_pool
+from routers.ytdlp_handler import ydl_pool
+from routers.browser_pool import browser_pool
+from routers.cache_backend import warm_persistent_cache
+from routers.metrics import router as metrics_router, MetricsMiddleware, register_stats
+from routers.tracing import TracingMiddleware
+from routers.segment_cache import segment_cache
+from routers.singleflight import inflight
 
 import config
 
@@ -23,9 +34,28 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=config.LOGGING_SETTINGS["level"],
                     format=config.LOGGING_SETTINGS["format"])
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 上流向け HTTP コネクションプールはアプリ単位で共有
+    await start_http_client()
+    await extraction_pool.start()
+    await browser_pool.start()
+    # 永続キャッシュから頻出キーを先読み（再起動直後の抽出集中を避ける）
+    await warm_persistent_cache()
+    try:
+        yield
+    finally:
+        await prefetcher.close()
+        await close_http_client()
+        extraction_pool.shutdown()
+        download_pool.shutdown()
+        ydl_pool.close()
+        await browser_pool.close()
+
 app = FastAPI(title="Oculora Project",
               version="1.1.0",
-              debug=config.SERVER_SETTINGS["debug"])
+              debug=config.SERVER_SETTINGS["debug"],
+              lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,11 +64,20 @@ app.add_middleware(
     allow_headers=config.CORS_SETTINGS["allow_headers"],
     allow_credentials=config.CORS_SETTINGS["allow_credentials"]
 )
+app.add_middleware(MetricsMiddleware)
+if config.TRACING_SETTINGS["enabled"]:
+    app.add_middleware(TracingMiddleware)
+
+# /metrics に gauge として出すコンポーネント
+register_stats("segment_cache", segment_cache.stats)
+register_stats("single_flight", inflight.stats)
+register_stats("prefetch", prefetcher.stats)
+register_stats("extraction_pool", extraction_pool.stats)
+register_stats("download_pool", download_pool.stats)
+register_stats("ydl_instances", ydl_pool.stats)
+register_stats("browser_pool", browser_pool.stats)
 
 URI_RE = re.compile(config.REGEX_PATTERNS["uri_pattern"])
-http_limits = httpx.Limits(max_connections=config.HTTP_SETTINGS["max_connections"],
-                           max_keepalive_connections=config.HTTP_SETTINGS["max_keepalive_connections"],
-                           keepalive_expiry=config.HTTP_SETTINGS["keepalive_expiry"])
 
 # ──────────────────────
 # 汎用フェッチ
@@ -50,12 +89,11 @@ async def fetch(url: str, headers: dict):
     
     for attempt in range(retries + 1):
         try:
-            async with httpx.AsyncClient(limits=http_limits) as client:
-                r = await client.get(url, headers=headers, timeout=timeout)
-                if r.status_code != 200:
-                    error_msg = config.RESPONSE_SETTINGS["error_messages"]["upstream_error"]
-                    raise HTTPException(r.status_code, error_msg)
-                return r
+            r = await send("GET", url, headers=headers, timeout=timeout)
+            if r.status_code != 200:
+                error_msg = config.RESPONSE_SETTINGS["error_messages"]["upstream_error"]
+                raise HTTPException(r.status_code, error_msg)
+            return r
         except httpx.TimeoutException:
             if attempt == retries:
                 error_msg = config.RESPONSE_SETTINGS["error_messages"]["timeout_error"]
@@ -79,6 +117,7 @@ app.include_router(health_router)
 app.include_router(comments_router)
 app.include_router(search_router)
 app.include_router(download_router)
+app.include_router(metrics_router)
 
 
 # ──────────────────────
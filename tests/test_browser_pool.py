@@ -0,0 +1,32 @@
+# tests/test_browser_pool.py
+"""BrowserPool.start は COMMENTS_ENGINE=browser のときだけ ChromeDriver を解決する"""
+import pytest
+
+import config
+from routers.browser_pool import BrowserPool
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    p = BrowserPool(size=1, timeout=5, max_uses=1)
+    resolved = []
+    monkeypatch.setattr(p, "_resolve_driver_path", lambda: resolved.append(1) or "/bin/chromedriver")
+    yield p, resolved
+
+
+async def test_innertube_engine_skips_driver_resolution(pool, monkeypatch):
+    p, resolved = pool
+    monkeypatch.setitem(config.COMMENTS_SETTINGS, "engine", "innertube")
+    await p.start()
+    assert resolved == []
+    await p.close()
+
+
+async def test_browser_engine_resolves_driver_at_startup(pool, monkeypatch):
+    p, resolved = pool
+    monkeypatch.setitem(config.COMMENTS_SETTINGS, "engine", "browser")
+    await p.start()
+    assert resolved == [1]
+    await p.close()
@@ -0,0 +1,47 @@
+# tests/test_extraction_pool.py
+"""ExtractionExecutor の stats（running / queued）の数え方"""
+import asyncio
+import functools
+import time
+
+import pytest
+
+from routers.extraction_pool import ExtractionExecutor, process_safe
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _wait_until(predicate, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+
+
+async def test_thread_mode_counts_running_and_queued():
+    pool = ExtractionExecutor(workers=1, queue_size=4, timeout=None)
+    try:
+        jobs = [asyncio.create_task(pool.run(time.sleep, 0.2)) for _ in range(3)]
+        await _wait_until(lambda: pool.stats()["running"] == 1)
+        assert pool.stats()["queued"] == 2
+        await asyncio.gather(*jobs)
+        stats = pool.stats()
+        assert (stats["running"], stats["queued"], stats["completed"]) == (0, 0, 3)
+    finally:
+        pool.shutdown()
+
+
+async def test_process_mode_jobs_are_reported_as_running():
+    pool = ExtractionExecutor(workers=2, queue_size=4, timeout=None, mode="process", processes=1)
+    nap = process_safe(functools.partial(time.sleep, 0.5))
+    try:
+        await pool.start()
+        jobs = [asyncio.create_task(pool.run(nap)) for _ in range(3)]
+        await _wait_until(lambda: pool.stats()["running"] == 1)
+        # 子プロセスで実際に動いている 1 件だけが running、残りは queued
+        assert pool.stats()["queued"] == 2
+        await asyncio.gather(*jobs)
+        stats = pool.stats()
+        assert (stats["running"], stats["queued"], stats["completed"]) == (0, 0, 3)
+    finally:
+        pool.shutdown()
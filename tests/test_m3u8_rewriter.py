@@ -0,0 +1,95 @@
+# tests/test_m3u8_rewriter.py
+"""compile_m3u8 の出力が従来の行ごと urljoin + quote 実装と一致すること"""
+from urllib.parse import quote
+
+import pytest
+
+from bench.m3u8_rewrite import CASES, reference_rewrite
+from routers.m3u8_rewriter import EXT_X_START, compile_m3u8
+
+PROXY = "http://127.0.0.1:8000/proxy?url="
+BASE = "https://cdn.example.com/hls/v1/720p/index.m3u8?token=xyz"
+
+
+def _render(text: str, base: str) -> str:
+    return compile_m3u8(text, base, tokens=False).render(PROXY)
+
+
+def _proxied(url: str) -> str:
+    return PROXY + quote(url, safe="")
+
+
+MEDIA = "\n".join([
+    "#EXTM3U",
+    "#EXT-X-VERSION:7",
+    "#EXT-X-TARGETDURATION:6",
+    '#EXT-X-MAP:URI="init.mp4?range=0-999"',
+    '#EXT-X-KEY:METHOD=AES-128,URI="../keys/k1.bin?t=1&x=2",IV=0x0123',
+    "#EXTINF:6.0,",
+    "seg0.m4s",
+    "#EXTINF:6.0,",
+    "/abs/seg1.m4s?sq=1&sig=a/b",
+    "#EXTINF:6.0,",
+    "https://other.example.com/x/seg2.m4s?expire=1700000000",
+    "#EXTINF:6.0,",
+    "./sub/../seg3.m4s",
+    "#EXTINF:6.0,",
+    "//cdn2.example.com/seg4.m4s",
+    "",
+    "#EXTINF:6.0,",
+    "日本語 seg5.m4s",
+    "#EXT-X-ENDLIST",
+])
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+@pytest.mark.parametrize("n", [0, 1, 37])
+def test_matches_reference_on_bench_cases(name, n):
+    text, base = CASES[name](n)
+    assert _render(text, base) == reference_rewrite(text, base, PROXY)
+
+
+@pytest.mark.parametrize("base", [
+    BASE,
+    "https://cdn.example.com/a//b/./c/../index.m3u8",   # urljoin が正規化するベース（高速経路なし）
+    "https://cdn.example.com",                          # パスなし
+    "http://cdn.example.com:8080/live/index.m3u8#frag",
+])
+def test_matches_reference_on_mixed_uris(base):
+    assert _render(MEDIA, base) == reference_rewrite(MEDIA, base, PROXY)
+
+
+def test_uri_kinds_resolve_like_urljoin():
+    lines = _render(MEDIA, BASE).split("\n")
+    assert lines[0] == "#EXTM3U"
+    assert f'#EXT-X-MAP:URI="{_proxied("https://cdn.example.com/hls/v1/720p/init.mp4?range=0-999")}"' in lines
+    assert (f'#EXT-X-KEY:METHOD=AES-128,URI="{_proxied("https://cdn.example.com/hls/v1/keys/k1.bin?t=1&x=2")}"'
+            f",IV=0x0123") in lines
+    assert _proxied("https://cdn.example.com/hls/v1/720p/seg0.m4s") in lines
+    assert _proxied("https://cdn.example.com/abs/seg1.m4s?sq=1&sig=a/b") in lines
+    assert _proxied("https://other.example.com/x/seg2.m4s?expire=1700000000") in lines
+    assert _proxied("https://cdn.example.com/hls/v1/720p/seg3.m4s") in lines
+    assert _proxied("https://cdn2.example.com/seg4.m4s") in lines
+    assert _proxied("https://cdn.example.com/hls/v1/720p/日本語 seg5.m4s") in lines
+    assert "" in lines  # 空行はそのまま
+
+
+def test_ext_x_start_is_inserted_after_extm3u():
+    lines = _render(MEDIA, BASE).split("\n")
+    assert lines[:3] == ["#EXTM3U", EXT_X_START, "#EXT-X-VERSION:7"]
+
+
+def test_ext_x_start_without_extm3u_goes_first():
+    assert _render("#EXTINF:6.0,\nseg0.ts", BASE).split("\n")[0] == EXT_X_START
+
+
+def test_existing_ext_x_start_is_kept():
+    text = "#EXTM3U\n#EXT-X-START:TIME-OFFSET=-12\n#EXTINF:6.0,\nseg0.ts"
+    out = _render(text, BASE)
+    assert EXT_X_START not in out
+    assert out.split("\n")[1] == "#EXT-X-START:TIME-OFFSET=-12"
+
+
+def test_trailing_newline_matches_reference():
+    # 従来実装と同じく splitlines → join なので末尾の改行は落ちる
+    assert _render("#EXTM3U\nseg0.ts\n", BASE) == reference_rewrite("#EXTM3U\nseg0.ts\n", BASE, PROXY)
@@ -0,0 +1,84 @@
+# tests/test_prefetcher.py
+"""SegmentPrefetcher と single-flight の連携（上流は偽の send で置き換える）"""
+import asyncio
+
+import pytest
+
+import config
+from routers import cache_backend, prefetcher as prefetch_module
+from routers.prefetcher import SegmentPrefetcher
+from routers.segment_cache import segment_cache, lookup_segment
+from routers.singleflight import inflight
+
+pytestmark = pytest.mark.asyncio
+
+SEGMENTS = [f"https://cdn.example.com/live/seg{i}.ts" for i in range(4)]
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {"content-type": "video/mp2t"}
+
+    def __init__(self, body: bytes, gate: asyncio.Event):
+        self.body = body
+        self.gate = gate
+
+    async def aiter_raw(self):
+        await self.gate.wait()
+        yield self.body
+
+    async def aclose(self):
+        pass
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    monkeypatch.setitem(config.CACHE_SETTINGS, "backend", "memory")
+    monkeypatch.setattr(cache_backend, "_shared_cache", None)
+    segment_cache.clear()
+    calls = []
+    gate = asyncio.Event()
+
+    async def fake_send(method, url, *, stream=False, **kwargs):
+        calls.append(url)
+        return FakeResponse(url.encode(), gate)
+
+    monkeypatch.setattr(prefetch_module, "send", fake_send)
+    yield calls, gate
+    segment_cache.clear()
+
+
+async def test_queued_prefetch_is_joinable_and_fetched_once(upstream):
+    calls, gate = upstream
+    p = SegmentPrefetcher(depth=2, concurrency=1, max_inflight_bytes=1 << 20, max_playlists=4)
+    p.learn("https://cdn.example.com/live/index.m3u8", SEGMENTS)
+    p.schedule(SEGMENTS[0])
+    await _settle()
+
+    # seg2 は同時実行数の空き待ちだが、もう single-flight に載っている
+    assert p.stats()["queued"] == 1
+    waiter = asyncio.create_task(inflight.wait(f"seg:{SEGMENTS[2]}"))
+    await _settle()
+    gate.set()
+    assert await waiter is True
+    assert await lookup_segment(SEGMENTS[2]) == (SEGMENTS[2].encode(), "video/mp2t")
+
+    await p.close()
+    assert calls == SEGMENTS[1:3]
+    assert p.stats()["queued"] == 0
+
+
+async def test_cached_segment_is_not_prefetched_again(upstream):
+    calls, gate = upstream
+    gate.set()
+    segment_cache.set(SEGMENTS[1], b"already", "video/mp2t")
+    p = SegmentPrefetcher(depth=1, concurrency=1, max_inflight_bytes=1 << 20, max_playlists=4)
+    p.learn("https://cdn.example.com/live/index.m3u8", SEGMENTS)
+    p.schedule(SEGMENTS[0])
+    await asyncio.sleep(0.01)
+    assert calls == []
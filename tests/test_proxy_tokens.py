@@ -0,0 +1,94 @@
+# tests/test_proxy_tokens.py
+"""proxy_tokens の期限の扱い（memory バックエンド）"""
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import config
+from routers import cache_backend, proxy_tokens
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def tokens(monkeypatch):
+    monkeypatch.setitem(config.CACHE_SETTINGS, "backend", "memory")
+    monkeypatch.setattr(cache_backend, "_shared_cache", None)
+    monkeypatch.setattr(proxy_tokens, "token_groups", proxy_tokens.TokenGroups(8))
+    return proxy_tokens
+
+
+def _urls(expire: int) -> list:
+    return [f"https://rr1.googlevideo.com/videoplayback?expire={expire}&itag={i}" for i in (18, 22)]
+
+
+async def test_resolve_rejects_locally_expired_group(tokens, monkeypatch):
+    urls = _urls(int(time.time()) + 3600)
+    prefix = await tokens.register(urls)
+    assert await tokens.resolve(prefix + "0") == urls[0]
+
+    # ローカル LRU に残っていても期限を過ぎたら 404
+    monkeypatch.setattr(time, "time", lambda real=time.time: real() + 7200)
+    with pytest.raises(HTTPException) as e:
+        await tokens.resolve(prefix + "0")
+    assert e.value.status_code == 404
+
+
+async def test_expired_urls_are_not_registered(tokens):
+    urls = _urls(int(time.time()) - 10)
+    prefix = await tokens.register(urls)
+    assert len(tokens.token_groups) == 0
+    assert await cache_backend.get_cache().get(tokens._cache_key(tokens.group_id(urls))) is None
+    with pytest.raises(HTTPException) as e:
+        await tokens.resolve(prefix + "0")
+    assert e.value.status_code == 404
+
+
+def _live_playlist(seq: int, target: int = 4) -> str:
+    lines = ["#EXTM3U", f"#EXT-X-TARGETDURATION:{target}", f"#EXT-X-MEDIA-SEQUENCE:{seq}"]
+    for i in range(seq, seq + 5):
+        lines += [f"#EXTINF:{target}.0,", f"https://cdn.example.com/live/seg{i}.ts"]
+    return "\n".join(lines) + "\n"
+
+
+async def test_live_playlist_refreshes_do_not_pile_up_long_lived_groups(tokens, monkeypatch):
+    from routers.m3u8_rewriter import compile_m3u8
+
+    cache = cache_backend.get_cache()
+    ttls = []
+    real_set = cache.set
+
+    async def spy(key, value, ttl=None, **kwargs):
+        ttls.append(ttl)
+        return await real_set(key, value, ttl=ttl, **kwargs)
+
+    monkeypatch.setattr(cache, "set", spy)
+    base = "https://cdn.example.com/live/index.m3u8"
+    prefixes = []
+    for seq in range(20):  # 更新ごとに URL 一覧が 1 つずれて別グループになる
+        tpl = compile_m3u8(_live_playlist(seq), base, tokens=True)
+        prefixes.append(await tokens.register(tpl.urls, tpl.group, ttl=tpl.token_ttl))
+
+    limit = 4 * config.PROXY_SETTINGS["token_live_ttl_factor"]
+    assert len(set(prefixes)) == 20
+    assert len(ttls) == 20 and max(ttls) <= limit
+
+    # 窓を過ぎればローカルに残っているグループのトークンも 404
+    # （共有キャッシュ側は set した TTL で消える）
+    monkeypatch.setattr(time, "time", lambda real=time.time: real() + limit + 1)
+    for prefix in prefixes[-3:]:
+        with pytest.raises(HTTPException) as e:
+            await tokens.resolve(prefix + "0")
+        assert e.value.status_code == 404
+
+
+async def test_vod_playlist_keeps_the_configured_ttl(tokens):
+    from routers.m3u8_rewriter import compile_m3u8
+
+    tpl = compile_m3u8(_live_playlist(0) + "#EXT-X-ENDLIST\n", "https://cdn.example.com/vod/index.m3u8",
+                       tokens=True)
+    assert tpl.token_ttl is None
+    await tokens.register(tpl.urls, tpl.group, ttl=tpl.token_ttl)
+    _, until, _ = tokens.token_groups.get(tpl.group)
+    assert until - time.time() > config.PROXY_SETTINGS["token_ttl"] - 5
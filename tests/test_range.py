@@ -0,0 +1,69 @@
+# tests/test_range.py
+"""キャッシュ済みセグメントの Range 応答（parse_range / serve_cached_segment）"""
+import pytest
+from fastapi import HTTPException
+
+from routers.proxy_handler import parse_range, serve_cached_segment
+
+DATA = bytes(range(100))
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=90-", (90, 99)),           # 末尾まで
+    ("bytes=-10", (90, 99)),           # 末尾 n バイト
+    ("bytes=-500", (0, 99)),           # 全体より長い suffix は全体
+    ("bytes=50-1000", (50, 99)),       # end は size - 1 に丸める
+    ("bytes=99-99", (99, 99)),
+    (" Bytes = 5-6", (5, 6)),          # 単位の大文字小文字・前後の空白は許す
+    ("bytes=0-1,5-6", None),           # 複数レンジは 200 で全体
+    ("items=0-1", None),
+    ("bytes=abc", None),
+    ("bytes=a-b", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, len(DATA)) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=200-300", "bytes=10-5", "bytes=-0"])
+def test_unsatisfiable_range_is_416(header):
+    with pytest.raises(HTTPException) as e:
+        parse_range(header, len(DATA))
+    assert e.value.status_code == 416
+    assert e.value.headers["Content-Range"] == "bytes */100"
+
+
+def test_serve_whole_segment():
+    r = serve_cached_segment(DATA, "video/mp2t", None)
+    assert r.status_code == 200
+    assert bytes(r.body) == DATA
+    assert r.media_type == "video/mp2t"
+    assert r.headers["accept-ranges"] == "bytes"
+    assert "content-range" not in r.headers
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=10-19", 10, 19),
+    ("bytes=95-", 95, 99),
+    ("bytes=-5", 95, 99),
+])
+def test_serve_partial_segment(header, start, end):
+    r = serve_cached_segment(DATA, "video/mp2t", header)
+    assert r.status_code == 206
+    assert bytes(r.body) == DATA[start:end + 1]
+    assert r.headers["content-range"] == f"bytes {start}-{end}/100"
+    assert r.headers["content-length"] == str(end - start + 1)
+
+
+def test_serve_unsupported_range_falls_back_to_200():
+    r = serve_cached_segment(DATA, None, "bytes=0-1,4-5")
+    assert r.status_code == 200
+    assert bytes(r.body) == DATA
+    assert r.media_type  # Content-Type 不明なら既定の型
+
+
+def test_serve_unsatisfiable_range():
+    with pytest.raises(HTTPException) as e:
+        serve_cached_segment(DATA, "video/mp2t", "bytes=100-")
+    assert e.value.status_code == 416
+    assert e.value.headers["Content-Range"] == "bytes */100"
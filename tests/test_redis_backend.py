@@ -0,0 +1,82 @@
+# tests/test_redis_backend.py
+"""
+CACHE_BACKEND=redis の経路を bench/redis_stub.py（ローカルの Redis 互換サーバー）で確かめる。
+redis パッケージが無ければスキップ。
+"""
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+pytest.importorskip("redis")
+
+import config
+from aiocache import RedisCache
+from bench.redis_stub import RedisStub
+from routers import cache_backend, proxy_tokens, segment_cache as segments
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest_asyncio.fixture
+async def redis_backend(monkeypatch):
+    stub = RedisStub()
+    server = await stub.start()
+    port = server.sockets[0].getsockname()[1]
+    monkeypatch.setitem(config.CACHE_SETTINGS, "backend", "redis")
+    monkeypatch.setitem(config.CACHE_SETTINGS, "redis_port", port)
+    monkeypatch.setitem(config.CACHE_SETTINGS, "persist_enabled", False)
+    monkeypatch.setattr(cache_backend, "_shared_cache", None)
+    try:
+        yield stub
+    finally:
+        if cache_backend._shared_cache is not None:
+            await cache_backend._shared_cache.close()
+        server.close()
+        await server.wait_closed()
+
+
+async def test_get_set_and_ttl(redis_backend):
+    cache = cache_backend.get_cache()
+    assert isinstance(cache, RedisCache)
+    assert cache_backend.is_shared()
+
+    await cache.set("k", {"text": "#EXTM3U", "n": 1})
+    assert await cache.get("k") == {"text": "#EXTM3U", "n": 1}
+    assert b"proxy:k" in redis_backend.store.data  # namespace 付きで保存される
+
+    await cache.set("short", "v", ttl=0.2)
+    assert await cache.get("short") == "v"
+    await asyncio.sleep(0.3)
+    assert await cache.get("short") is None
+
+
+async def test_shared_cached_round_trip(redis_backend):
+    calls = []
+
+    @cache_backend.shared_cached(ttl=60, key_builder=lambda f, n: f"square:{n}", swr=True)
+    async def square(n):
+        calls.append(n)
+        return n * n
+
+    assert await square(7) == 49
+    assert await square(7) == 49
+    assert calls == [7]
+    assert await square.peek("square:7") == 49
+
+
+async def test_shared_segments(redis_backend, monkeypatch):
+    monkeypatch.setitem(config.CACHE_SETTINGS, "share_segments", True)
+    url = "https://cdn.example.com/seg1.ts"
+    await segments.store_segment(url, b"\x47" * 188, "video/mp2t")
+    segments.segment_cache.clear()  # 別ワーカーを想定してローカル LRU を空にする
+    assert await segments.lookup_segment(url) == (b"\x47" * 188, "video/mp2t")
+
+
+async def test_proxy_tokens_resolve_across_workers(redis_backend, monkeypatch):
+    monkeypatch.setattr(proxy_tokens, "token_groups", proxy_tokens.TokenGroups(8))
+    urls = ["https://cdn.example.com/a.m3u8", "https://cdn.example.com/b.m3u8"]
+    prefix = await proxy_tokens.register(urls)
+
+    proxy_tokens.token_groups._entries.clear()  # 別ワーカー: 共有キャッシュからだけ引ける
+    assert await proxy_tokens.resolve(prefix + "1") == urls[1]
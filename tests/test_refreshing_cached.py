@@ -0,0 +1,166 @@
+# tests/test_refreshing_cached.py
+"""refreshing_cached（expiry_aware / swr）の TTL 計算と裏での取り直し。時計は偽物に差し替える"""
+import asyncio
+import time
+
+import pytest
+
+import config
+from routers import cache_backend
+
+pytestmark = pytest.mark.asyncio
+
+NOW = 1_700_000_000.0
+MARGIN, AHEAD, MAX_TTL, SWR = 300, 900, 6 * 3600, 120
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [NOW]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    for key, value in (("backend", "memory"), ("persist_enabled", False), ("expire_margin", MARGIN),
+                       ("expire_refresh_ahead", AHEAD), ("expire_max_ttl", MAX_TTL),
+                       ("swr_window", SWR)):
+        monkeypatch.setitem(config.CACHE_SETTINGS, key, value)
+    return now
+
+
+def _signed(expire: float, n: int = 0) -> dict:
+    return {"url": f"https://rr1.googlevideo.com/videoplayback?expire={int(expire)}&n={n}"}
+
+
+def _decorate(fn, **kwargs):
+    wrapped = cache_backend.shared_cached(ttl=600, key_builder=lambda f, k: f"t:{k}", **kwargs)(fn)
+    deco = wrapped.peek.__self__
+    stored = []
+    real_set = deco.cache.set
+
+    async def spy(key, value, ttl=None, **kw):
+        stored.append((value, ttl))
+        return await real_set(key, value, ttl=ttl, **kw)
+
+    deco.cache.set = spy
+    return wrapped, deco, stored
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_expiry_aware_ttl_stops_before_the_margin(clock):
+    calls = []
+
+    async def extract(k):
+        calls.append(k)
+        return _signed(NOW + 3600)
+
+    fn, deco, stored = _decorate(extract, expiry_aware=True)
+    assert deco.lifetimes(_signed(NOW + 3600)) == (3600 - MARGIN - AHEAD, 3600 - MARGIN)
+
+    await fn("v")
+    entry, ttl = stored[0]
+    assert ttl == 3600 - MARGIN
+    assert entry.fresh_until == NOW + 3600 - MARGIN - AHEAD
+    # 保存 TTL が切れる時点でも URL はまだ margin 秒有効
+    assert NOW + ttl + MARGIN <= NOW + 3600
+
+
+async def test_expiry_aware_ttl_is_capped_and_uses_earliest_expire(clock):
+    fn, deco, _ = _decorate(lambda k: None, expiry_aware=True)
+    far = NOW + 48 * 3600
+    assert deco.lifetimes(_signed(far)) == (MAX_TTL - AHEAD, MAX_TTL)
+    value = [_signed(far), _signed(NOW + 1800, 1)]
+    assert deco.lifetimes(value)[1] == 1800 - MARGIN
+
+
+async def test_urls_expiring_within_the_margin_are_not_cached(clock):
+    calls = []
+
+    async def extract(k):
+        calls.append(k)
+        return _signed(NOW + MARGIN)
+
+    fn, _, stored = _decorate(extract, expiry_aware=True)
+    await fn("v")
+    await fn("v")
+    assert stored == [] and calls == ["v", "v"]
+
+
+async def test_refresh_ahead_serves_cached_value_and_refreshes_once(clock):
+    calls = []
+
+    async def extract(k):
+        calls.append(time.time())
+        await asyncio.sleep(0)
+        return _signed(time.time() + 3600, len(calls))
+
+    fn, deco, stored = _decorate(extract, expiry_aware=True)
+    first = await fn("v")
+
+    clock[0] = NOW + 3600 - MARGIN - AHEAD - 1  # まだ新鮮
+    assert await fn("v") == first
+    await _settle()
+    assert len(calls) == 1
+
+    clock[0] = NOW + 3600 - MARGIN - AHEAD  # 先読み期限ちょうど
+    results = await asyncio.gather(*(fn("v") for _ in range(5)))
+    assert all(r == first for r in results)  # 取り直し中は古い値を返す
+    await _settle()
+    assert len(calls) == 2 and deco._refreshing == {}
+    refreshed, ttl = stored[-1]
+    assert refreshed.value == _signed(clock[0] + 3600, 2)
+    assert ttl == 3600 - MARGIN
+    assert await fn("v") == refreshed.value
+
+
+async def test_failed_background_refresh_keeps_old_value(clock):
+    calls = []
+
+    async def extract(k):
+        calls.append(k)
+        if len(calls) > 1:
+            raise RuntimeError("yt-dlp failed")
+        return _signed(NOW + 3600)
+
+    fn, deco, _ = _decorate(extract, expiry_aware=True)
+    first = await fn("v")
+    clock[0] = NOW + 3600 - MARGIN - AHEAD
+    assert await fn("v") == first
+    await _settle()
+    assert len(calls) == 2 and deco._refreshing == {}
+    assert await fn("v") == first
+
+
+async def test_swr_stores_ttl_plus_window_and_refreshes_after_ttl(clock):
+    calls = []
+
+    async def load(k):
+        calls.append(k)
+        return {"n": len(calls)}
+
+    fn, deco, stored = _decorate(load, swr=True)
+    assert deco.lifetimes({"n": 1}) == (600, 600 + SWR)
+    assert await fn("c") == {"n": 1}
+    entry, ttl = stored[0]
+    assert ttl == 600 + SWR and entry.fresh_until == NOW + 600
+
+    clock[0] = NOW + 599
+    assert await fn("c") == {"n": 1}
+    await _settle()
+    assert calls == ["c"]
+
+    clock[0] = NOW + 600
+    assert await fn("c") == {"n": 1}  # 窓の中は古い値
+    await _settle()
+    assert calls == ["c", "c"]
+    assert await fn("c") == {"n": 2}
+
+
+async def test_without_swr_window_values_are_never_refreshed(clock, monkeypatch):
+    monkeypatch.setitem(config.CACHE_SETTINGS, "swr_window", 0)
+    fn, deco, _ = _decorate(lambda k: None, swr=True)
+    assert deco.lifetimes({"n": 1}) == (None, 600)
+    # expiry_aware でも URL を含まない値は既定の ttl のまま
+    fn, deco, _ = _decorate(lambda k: None, expiry_aware=True)
+    assert deco.lifetimes({"title": "no urls"}) == (None, 600)
@@ -0,0 +1,77 @@
+# tests/test_segment_cache.py
+"""SegmentCache（バイト数上限付き LRU）のテスト"""
+import time
+
+from routers.segment_cache import SegmentCache
+
+
+def _clock(monkeypatch, start: float = 1000.0) -> list:
+    now = [start]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = SegmentCache(max_bytes=300, ttl=60, max_entry_bytes=200)
+    cache.set("a", b"a" * 100)
+    cache.set("b", b"b" * 100)
+    cache.set("c", b"c" * 100)
+    assert cache.get("a") == (b"a" * 100, None)  # a を最近使った側に移す
+
+    cache.set("d", b"d" * 100)
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache and "d" in cache
+    stats = cache.stats()
+    assert stats["bytes"] == 300 and stats["entries"] == 3 and stats["evictions"] == 1
+
+
+def test_replacing_a_key_updates_the_size():
+    cache = SegmentCache(max_bytes=300, ttl=60, max_entry_bytes=300)
+    cache.set("a", b"x" * 200, "video/mp2t")
+    cache.set("a", b"y" * 50, "video/mp4")
+    assert cache.get("a") == (b"y" * 50, "video/mp4")
+    assert cache.stats()["bytes"] == 50
+
+
+def test_entry_ttl_expires_on_lookup(monkeypatch):
+    now = _clock(monkeypatch)
+    cache = SegmentCache(max_bytes=1000, ttl=10, max_entry_bytes=1000)
+    cache.set("default", b"1")
+    cache.set("short", b"2", ttl=2)
+
+    now[0] += 3
+    assert "short" not in cache
+    assert cache.get("short") is None
+    assert cache.get("default") == (b"1", None)
+
+    now[0] += 8
+    assert cache.get("default") is None
+    assert len(cache) == 0 and cache.stats()["bytes"] == 0
+    assert cache.stats()["misses"] == 2
+
+
+def test_expired_entries_are_dropped_before_live_ones(monkeypatch):
+    now = _clock(monkeypatch)
+    cache = SegmentCache(max_bytes=200, ttl=60, max_entry_bytes=200)
+    cache.set("live", b"l" * 100)
+    cache.set("stale", b"s" * 100, ttl=1)
+    cache.get("live")  # LRU 順では stale の方が新しい
+    cache.get("stale")
+
+    now[0] += 2
+    cache.set("new", b"n" * 100)
+    assert "live" in cache and "new" in cache
+    assert "stale" not in cache
+
+
+def test_oversized_entries_are_rejected():
+    cache = SegmentCache(max_bytes=1000, ttl=60, max_entry_bytes=100)
+    assert cache.set("big", b"x" * 101) is False
+    assert "big" not in cache and cache.stats()["bytes"] == 0
+    assert cache.set("ok", b"x" * 100) is True
+
+    # 全体の上限を超える単体も保存しない（他のエントリを追い出さない）
+    tiny = SegmentCache(max_bytes=50, ttl=60, max_entry_bytes=100)
+    tiny.set("keep", b"k" * 10)
+    assert tiny.set("big", b"x" * 60) is False
+    assert "keep" in tiny
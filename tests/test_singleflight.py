@@ -0,0 +1,104 @@
+# tests/test_singleflight.py
+"""SingleFlight（同一キーの同時実行を 1 本にまとめる）のテスト"""
+import asyncio
+
+import pytest
+
+from routers.singleflight import SingleFlight
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_concurrent_calls_share_one_execution():
+    sf = SingleFlight()
+    calls = []
+    release = asyncio.Event()
+
+    async def fetch():
+        calls.append(1)
+        await release.wait()
+        return {"value": 42}
+
+    waiters = [asyncio.create_task(sf.do("k", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert sf.in_flight() == 1
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert calls == [1]
+    assert all(r is results[0] for r in results)
+    assert sf.stats() == {"in_flight": 0, "executed": 1, "coalesced": 4}
+
+
+async def test_exception_reaches_every_waiter_and_key_is_cleared():
+    sf = SingleFlight()
+    release = asyncio.Event()
+
+    async def boom():
+        await release.wait()
+        raise ValueError("upstream failed")
+
+    waiters = [asyncio.create_task(sf.do("k", boom)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert sf.in_flight() == 0
+
+    # 失敗後は同じキーで新しく実行される
+    async def ok():
+        return "ok"
+
+    assert await sf.do("k", ok) == "ok"
+    assert sf.stats()["executed"] == 2
+
+
+async def test_different_keys_run_separately():
+    sf = SingleFlight()
+
+    async def value(v):
+        await asyncio.sleep(0)
+        return v
+
+    assert await asyncio.gather(sf.do("a", lambda: value(1)), sf.do("b", lambda: value(2))) == [1, 2]
+    assert sf.stats()["executed"] == 2 and sf.stats()["coalesced"] == 0
+
+
+async def test_cancelled_caller_does_not_cancel_the_shared_call():
+    sf = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(sf.do("k", fetch))
+    second = asyncio.create_task(sf.do("k", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    assert await second == "done"
+    assert first.cancelled()
+    assert sf.in_flight() == 0
+
+
+async def test_wait_joins_only_in_flight_keys():
+    sf = SingleFlight()
+    assert await sf.wait("missing") is False
+
+    release = asyncio.Event()
+
+    async def boom():
+        await release.wait()
+        raise RuntimeError("x")
+
+    runner = asyncio.create_task(sf.do("k", boom))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(sf.wait("k"))
+    await asyncio.sleep(0)
+    release.set()
+    assert await waiter is True  # 例外は wait 側には伝えない
+    with pytest.raises(RuntimeError):
+        await runner
+    assert await sf.wait("k") is False